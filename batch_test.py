@@ -1,19 +1,29 @@
 import os
 import json
+import time
+import asyncio
 import requests
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
 # 从 main.py 导入可视化函数
 # 注意：如果 main.py 依赖相对路径的 utils，请确保运行此脚本时在根目录下
-from main import create_visualization, create_output_visualization
+from main import add_render_args, render_options, render_request
+from batch_viz import init_worker, render_task
+from utils.batch_pool import default_workers
+from utils.dispatch_client import DEFAULT_CONCURRENCY, DEFAULT_RETRIES, DEFAULT_TIMEOUT, DispatchClient
+from utils.latency_report import LatencyRecorder, print_summary
+from utils.station_catalog import DEFAULT_CATALOG_PATH, StationCatalog
 
-def run_batch(input_dir, output_base_dir, api_url):
+# 异步模式下排队等待渲染的任务数上限 = 渲染进程数 * RENDER_BACKLOG
+RENDER_BACKLOG = 2
+
+def run_batch(input_dir, output_base_dir, api_url, catalog_path=DEFAULT_CATALOG_PATH, render_opts=None, combined=False,
+              bench_out=None):
     # 1. 创建带有时间戳的输出目录，避免覆盖
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = os.path.join(output_base_dir, f"run_{timestamp}")
-    os.makedirs(output_dir, exist_ok=True)
+    output_dir = make_output_dir(output_base_dir)
     
     print(f"🚀 开始批量测试")
     print(f"📂 输入目录: {input_dir}")
@@ -27,6 +37,12 @@ def run_batch(input_dir, output_base_dir, api_url):
 
     success_count = 0
     fail_count = 0
+    render_opts = render_opts or {}
+
+    # 站点坐标/弹窗缓存 (catalog_path 为 None 时不使用)
+    catalog = StationCatalog(catalog_path) if catalog_path else None
+    # 接口耗时记录 (bench_out 为 None 时只打印不保存)
+    recorder = LatencyRecorder({"mode": "serial", "api_url": api_url, "input": input_dir})
 
     for filename in files:
         file_path = os.path.join(input_dir, filename)
@@ -38,6 +54,7 @@ def run_batch(input_dir, output_base_dir, api_url):
         current_res_file = os.path.join(output_dir, f"{base_name}_response.json")
         current_input_map = os.path.join(output_dir, f"{base_name}_input.html")
         current_output_map = os.path.join(output_dir, f"{base_name}_output.html")
+        current_combined_map = os.path.join(output_dir, f"{base_name}_combined.html")
 
         print(f"正在处理: {filename} ...", end=" ", flush=True)
 
@@ -47,6 +64,7 @@ def run_batch(input_dir, output_base_dir, api_url):
                 req_data = json.load(f)
 
             # 3. 发送请求 (替代 curl)
+            start = time.perf_counter()
             try:
                 response = requests.post(
                     api_url,
@@ -55,29 +73,39 @@ def run_batch(input_dir, output_base_dir, api_url):
                 )
                 response.raise_for_status() # 检查 HTTP 错误
                 res_json = response.json()
+                recorder.add(base_name, req_data, time.perf_counter() - start, True, response.status_code)
                 
                 # 保存响应数据
                 with open(current_res_file, 'w', encoding='utf-8') as f:
                     json.dump(res_json, f, indent=2, ensure_ascii=False)
 
             except requests.exceptions.RequestException as e:
+                status_code = e.response.status_code if e.response is not None else None
+                recorder.add(base_name, req_data, time.perf_counter() - start, False, status_code)
                 print(f"[API 错误] {e}")
                 fail_count += 1
                 continue
 
-            # 4. 生成可视化
-            # 生成输入地图
-            create_visualization(
-                data_file=current_req_file, 
-                output_file=current_input_map
-            )
-
-            # 生成结果地图
-            create_output_visualization(
-                req_file=current_req_file,
-                response_file=current_res_file,
-                output_file=current_output_map
-            )
+            # 4. 生成可视化 (直接使用内存中的请求/响应，不再重复读取文件)
+            if combined:
+                # 输入视图作为可切换图层合并进结果地图
+                render_request(
+                    req_data,
+                    res_json,
+                    combined_file=current_combined_map,
+                    catalog=catalog,
+                    **render_opts,
+                )
+            else:
+                # 输入地图 + 结果地图
+                render_request(
+                    req_data,
+                    res_json,
+                    input_file=current_input_map,
+                    output_file=current_output_map,
+                    catalog=catalog,
+                    **render_opts,
+                )
             
             print("✅ 完成")
             success_count += 1
@@ -86,16 +114,213 @@ def run_batch(input_dir, output_base_dir, api_url):
             print(f"❌ 失败: {str(e)}")
             fail_count += 1
 
+    if catalog is not None:
+        catalog.close()
+
     print("-" * 50)
     print(f"🎉 批量测试结束. 成功: {success_count}, 失败: {fail_count}")
     print(f"查看结果请访问: {output_dir}")
+    report_latency(recorder, bench_out)
+
+
+def report_latency(recorder, bench_out=None):
+    """打印接口耗时统计，指定 bench_out 时保存为 JSON (可用 dispatch_bench.py diff 对比)"""
+    recorder.stop()
+    if not recorder.records:
+        return
+    print("-" * 50)
+    print("⏱️ 接口耗时:")
+    print_summary(recorder.summary())
+    if bench_out:
+        recorder.save(bench_out)
+        print(f"📄 耗时记录已保存: {bench_out}")
+
+def make_output_dir(output_base_dir):
+    # 创建带有时间戳的输出目录，避免覆盖
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = os.path.join(output_base_dir, f"run_{timestamp}")
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _dump_json(obj, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False)
+
+
+async def _render_async(filename, task, render_pool, render_slots, latency):
+    """在渲染进程池中渲染 (任务只含文件路径，由 worker 自己读取)，结束后归还渲染名额；返回 True/False"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(render_pool, render_task, task)
+    except Exception as e:
+        print(f"❌ {filename} 失败: {str(e)}")
+        return False
+    finally:
+        render_slots.release()
+    print(f"✅ {filename} 完成 ({latency:.2f}s)")
+    return True
+
+
+async def _process_file_async(filename, input_dir, output_dir, client, render_pool, render_slots, combined, recorder):
+    """
+    单个文件: 异步请求 -> 保存响应 -> 交给渲染进程池
+    返回渲染任务 (asyncio.Task)，请求或保存失败时返回 None
+    """
+    base_name = os.path.splitext(filename)[0]
+    current_req_file = os.path.join(input_dir, filename)
+    current_res_file = os.path.join(output_dir, f"{base_name}_response.json")
+
+    try:
+        req_data = await asyncio.to_thread(_load_json, current_req_file)
+    except Exception as e:
+        print(f"❌ {filename} 失败: {e}")
+        return None
+
+    result = await client.post(req_data)
+    recorder.add(
+        base_name, req_data, result["latency"], result["ok"], result["status_code"], result["attempts"],
+        total_latency=result["total_latency"],
+    )
+    if not result["ok"]:
+        print(f"❌ {filename} [API 错误] {result['error']} (尝试 {result['attempts']} 次)")
+        return None
+
+    # 序列化和写文件放到线程中，不阻塞事件循环
+    try:
+        await asyncio.to_thread(_dump_json, result["data"], current_res_file)
+    except Exception as e:
+        print(f"❌ {filename} 失败: {e}")
+        return None
+
+    # 输出文件名与 run_batch 保持一致；只传文件路径，避免把请求/响应 pickle 给渲染进程
+    task = {"idx": base_name, "req": current_req_file, "rsp": current_res_file}
+    if combined:
+        task["combined_file"] = os.path.join(output_dir, f"{base_name}_combined.html")
+    else:
+        task["input_file"] = os.path.join(output_dir, f"{base_name}_input.html")
+        task["output_file"] = os.path.join(output_dir, f"{base_name}_output.html")
+
+    # 渲染名额用完时在这里等待，排队中的渲染任务数有上限
+    await render_slots.acquire()
+    return asyncio.create_task(_render_async(filename, task, render_pool, render_slots, result["latency"]))
+
+
+async def _consume_files(file_iter, input_dir, output_dir, client, render_pool, render_slots, combined, recorder,
+                         rendering, counts):
+    """从共享的文件迭代器中逐个取文件处理，直到取完"""
+    for filename in file_iter:
+        render = await _process_file_async(
+            filename, input_dir, output_dir, client, render_pool, render_slots, combined, recorder
+        )
+        if render is None:
+            counts[False] += 1
+            continue
+        rendering.add(render)
+
+        def on_rendered(t):
+            rendering.discard(t)
+            counts[t.result()] += 1
+
+        render.add_done_callback(on_rendered)
+
+
+async def run_batch_async(
+    input_dir,
+    output_base_dir,
+    api_url,
+    catalog_path=DEFAULT_CATALOG_PATH,
+    render_opts=None,
+    combined=False,
+    concurrency=DEFAULT_CONCURRENCY,
+    timeout=DEFAULT_TIMEOUT,
+    retries=DEFAULT_RETRIES,
+    render_workers=None,
+    bench_out=None,
+):
+    """
+    run_batch 的并发版本: 输出目录结构、文件名和汇总信息与 run_batch 相同
+    - concurrency 个协程从同一个文件迭代器中取文件，最多 concurrency 个请求同时在途
+      (keep-alive 连接池、超时、指数退避重试)，请求文件在取到时才读取
+    - 收到响应后交给渲染进程池，网络等待与地图渲染重叠进行；
+      排队的渲染任务最多为渲染进程数的 RENDER_BACKLOG 倍，渲染跟不上时暂停发送新请求
+    """
+    output_dir = make_output_dir(output_base_dir)
+    render_workers = render_workers or default_workers()
+
+    print(f"🚀 开始批量测试")
+    print(f"📂 输入目录: {input_dir}")
+    print(f"📂 输出目录: {output_dir}")
+    print(f"🔗 API 地址: {api_url}")
+    print(f"⚙️ 并发请求: {concurrency}, 渲染进程: {render_workers}")
+    print("-" * 50)
+
+    files = sorted(f for f in os.listdir(input_dir) if f.endswith('.json'))
+    recorder = LatencyRecorder(
+        {"mode": "async", "api_url": api_url, "input": input_dir, "concurrency": concurrency}
+    )
+
+    counts = {True: 0, False: 0}
+    rendering = set()
+    render_slots = asyncio.Semaphore(render_workers * RENDER_BACKLOG)
+    render_pool = ProcessPoolExecutor(
+        max_workers=render_workers,
+        initializer=init_worker,
+        initargs=(catalog_path, render_opts or {}),
+    )
+    try:
+        async with DispatchClient(api_url, concurrency, timeout, retries) as client:
+            file_iter = iter(files)
+            await asyncio.gather(
+                *(
+                    _consume_files(
+                        file_iter, input_dir, output_dir, client, render_pool, render_slots, combined, recorder,
+                        rendering, counts,
+                    )
+                    for _ in range(max(1, concurrency))
+                )
+            )
+        if rendering:
+            await asyncio.wait(set(rendering))
+    finally:
+        render_pool.shutdown()
+
+    success_count = counts[True]
+    fail_count = counts[False]
+
+    print("-" * 50)
+    print(f"🎉 批量测试结束. 成功: {success_count}, 失败: {fail_count}")
+    print(f"查看结果请访问: {output_dir}")
+    report_latency(recorder, bench_out)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="批量运行物流规划测试")
     parser.add_argument("--input", default="data", help="包含请求JSON的文件夹")
     parser.add_argument("--output", default="results", help="结果保存的基础文件夹")
     parser.add_argument("--url", default="http://localhost:8000/api/v1/dispatch", help="API 地址")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help="站点坐标缓存文件")
+    parser.add_argument("--no-catalog", action="store_true", help="不使用站点坐标缓存")
+    parser.add_argument("--combined", action="store_true", help="输入/结果合并为一张地图 (输入视图为可切换图层)")
+    parser.add_argument("--serial", action="store_true", help="使用原来的逐个请求、逐个渲染方式")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同时在途的最大请求数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个请求超时 (秒)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="连接错误/超时/5xx 的重试次数")
+    parser.add_argument("--render-workers", type=int, default=None, help="渲染进程数 (默认 CPU 核心数)")
+    parser.add_argument("--bench-out", default=None, help="保存每个请求的接口耗时 (JSON，可用 dispatch_bench.py diff 对比)")
+    add_render_args(parser)
     
     args = parser.parse_args()
+    catalog_path = None if args.no_catalog else args.catalog
     
-    run_batch(args.input, args.output, args.url)
\ No newline at end of file
+    if args.serial:
+        run_batch(args.input, args.output, args.url, catalog_path, render_options(args), args.combined, args.bench_out)
+    else:
+        asyncio.run(run_batch_async(
+            args.input, args.output, args.url, catalog_path, render_options(args), args.combined,
+            args.concurrency, args.timeout, args.retries, args.render_workers, args.bench_out,
+        ))
\ No newline at end of file
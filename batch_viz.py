@@ -1,52 +1,190 @@
-from main import create_output_visualization, create_visualization
+from main import add_render_args, install_viewer, render_options, render_request, renderer_version
+from utils.batch_pool import Progress, default_workers, run_tasks
+from utils.manifest import MANIFEST_NAME, RenderManifest
+from utils.station_catalog import DEFAULT_CATALOG_PATH, StationCatalog
+import argparse
 import os
 import re
 
-json_dir = "./4c1396ccc039445ea171519d811d85cc"
-html_dir = os.path.join(json_dir, "html")
-os.makedirs(html_dir, exist_ok=True)
+DEFAULT_JSON_DIR = "./4c1396ccc039445ea171519d811d85cc"
 
 # 用于匹配： 1-req.json / 1-rsp.json 这种格式
 req_pattern = re.compile(r"(\d+)-req\.json$")
 rsp_pattern = re.compile(r"(\d+)-rsp\.json$")
 
-# 收集所有 req / rsp
-req_files = {}
-rsp_files = {}
+# worker 进程内的共享状态 (由 init_worker 设置)
+_catalog = None
+_render_opts = {}
 
-for fname in os.listdir(json_dir):
-    full_path = os.path.join(json_dir, fname)
 
-    if match := req_pattern.match(fname):
-        idx = match.group(1)
-        req_files[idx] = full_path
+def collect_tasks(json_dir, html_dir, combined=False, data_only=False):
+    """
+    收集所有 req / rsp，每个编号一个任务: (idx, req_path, rsp_path, 输出文件...)
+    按编号数值排序，保证任务顺序与 worker 数无关
+    data_only: 每个编号只输出一个 N-map.json (用 map_viewer.html 查看)
+    """
+    req_files = {}
+    rsp_files = {}
 
-    elif match := rsp_pattern.match(fname):
-        idx = match.group(1)
-        rsp_files[idx] = full_path
+    for fname in os.listdir(json_dir):
+        full_path = os.path.join(json_dir, fname)
 
-# ---------- 处理 req，可单独生成 ----------
-for idx, req_path in req_files.items():
-    req_html = os.path.join(html_dir, f"{idx}-req.html")
+        if match := req_pattern.match(fname):
+            req_files[match.group(1)] = full_path
 
-    print(f"[REQ] {req_path} -> {req_html}")
+        elif match := rsp_pattern.match(fname):
+            rsp_files[match.group(1)] = full_path
 
-    create_visualization(
-        data_file=req_path,
-        output_file=req_html
+    tasks = []
+    for idx in sorted(req_files, key=int):
+        rsp_path = rsp_files.get(idx)
+        task = {"idx": idx, "req": req_files[idx], "rsp": rsp_path}
+        if data_only:
+            task["data_file"] = os.path.join(html_dir, f"{idx}-map.json")
+        elif combined:
+            task["combined_file"] = os.path.join(html_dir, f"{idx}-combined.html")
+        else:
+            task["input_file"] = os.path.join(html_dir, f"{idx}-req.html")
+            if rsp_path:
+                task["output_file"] = os.path.join(html_dir, f"{idx}-rsp.html")
+        tasks.append(task)
+    return tasks
+
+
+def task_outputs(task):
+    return [task[k] for k in ("input_file", "output_file", "combined_file", "data_file") if k in task]
+
+
+def init_worker(catalog_path, render_opts):
+    """每个 worker 进程打开自己的站点缓存连接 (sqlite WAL 支持多进程并发)"""
+    global _catalog, _render_opts
+    _catalog = StationCatalog(catalog_path) if catalog_path else None
+    _render_opts = render_opts
+
+
+def render_task(task):
+    """渲染一个编号的 req (+ rsp)，返回生成的地图数量"""
+    render_request(
+        task["req"],
+        task["rsp"],
+        input_file=task.get("input_file"),
+        output_file=task.get("output_file"),
+        combined_file=task.get("combined_file"),
+        data_file=task.get("data_file"),
+        catalog=_catalog,
+        verbose=False,
+        **_render_opts,
+    )
+    return len(task_outputs(task))
+
+
+def run_batch(
+    json_dir,
+    html_dir=None,
+    workers=None,
+    chunksize=None,
+    catalog_path=DEFAULT_CATALOG_PATH,
+    render_opts=None,
+    combined=False,
+    incremental=False,
+    prune=False,
+    data_only=False,
+):
+    """
+    并行批量渲染: 每个编号是一个独立任务，单个任务失败只记录不中断整批
+    输出文件名和内容只取决于输入 (元素 id 已固定)，与 worker 数和完成顺序无关
+    incremental: 根据 <html_dir>/.render_manifest.json 跳过输入、渲染器和参数都未变化的任务
+    prune: 删除输入已不存在 (或不再生成) 的旧输出
+    data_only: 只写 N-map.json 数据文件，并在 html_dir 中放一份查看页 map_viewer.html
+    """
+    html_dir = html_dir or os.path.join(json_dir, "html")
+    os.makedirs(html_dir, exist_ok=True)
+
+    tasks = collect_tasks(json_dir, html_dir, combined, data_only)
+    if data_only:
+        install_viewer(html_dir)
+    workers = default_workers() if workers is None else workers
+
+    manifest = None
+    options = {**(render_opts or {}), "combined": combined, "data_only": data_only}
+    if incremental or prune:
+        manifest = RenderManifest(os.path.join(html_dir, MANIFEST_NAME), renderer_version())
+    if prune:
+        removed = manifest.prune({manifest.relpath(t["req"]): task_outputs(t) for t in tasks})
+        for path in removed:
+            print(f"🧹 已删除过期输出: {path}")
+    if incremental:
+        total = len(tasks)
+        tasks = [
+            t
+            for t in tasks
+            if not manifest.is_fresh(manifest.relpath(t["req"]), [t["req"], t["rsp"]], task_outputs(t), options)
+        ]
+        print(f"♻️ 增量模式: {total - len(tasks)}/{total} 组未变化，跳过")
+
+    print(f"🚀 {json_dir}: {len(tasks)} 组 -> {html_dir} (workers={workers})")
+
+    progress = Progress(len(tasks))
+    failures = []
+    results = run_tasks(
+        render_task,
+        tasks,
+        workers=workers,
+        chunksize=chunksize,
+        initializer=init_worker,
+        initargs=(catalog_path, render_opts or {}),
     )
+    for task, ok, result in results:
+        if ok:
+            progress.update(True, result)
+            if manifest is not None:
+                manifest.record(
+                    manifest.relpath(task["req"]), [task["req"], task["rsp"]], task_outputs(task), options
+                )
+        else:
+            progress.update(False)
+            failures.append((task, result))
 
-# ---------- 处理 req + rsp 对 ----------
-for idx in req_files:
-    if idx in rsp_files:
-        req_path = req_files[idx]
-        rsp_path = rsp_files[idx]
-        rsp_html = os.path.join(html_dir, f"{idx}-rsp.html")
+    if manifest is not None:
+        manifest.save()
 
-        print(f"[RSP] {req_path} + {rsp_path} -> {rsp_html}")
+    print("-" * 50)
+    print(
+        f"🎉 完成 {len(tasks) - len(failures)}/{len(tasks)} 组, "
+        f"生成 {progress.units} 张地图, 用时 {progress.elapsed:.1f}s "
+        f"({progress.rate:.1f} maps/s)"
+    )
+    for task, error in sorted(failures, key=lambda f: int(f[0]["idx"])):
+        print(f"❌ [{task['idx']}] {task['req']}\n{error}")
+    return failures
 
-        create_output_visualization(
-            req_file=req_path,
-            response_file=rsp_path,
-            output_file=rsp_html,
-        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并行批量生成 N-req.json / N-rsp.json 的可视化地图")
+    parser.add_argument("json_dir", nargs="?", default=DEFAULT_JSON_DIR, help="包含 N-req.json / N-rsp.json 的目录")
+    parser.add_argument("--html-dir", default=None, help="输出目录 (默认 <json_dir>/html)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="worker 进程数 (1 为单进程顺序执行)")
+    parser.add_argument("--chunksize", type=int, default=None, help="每次派发给 worker 的任务数 (默认自动)")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help="站点坐标缓存文件")
+    parser.add_argument("--no-catalog", action="store_true", help="不使用站点坐标缓存")
+    parser.add_argument("--combined", action="store_true", help="输入/结果合并为一张地图 (输入视图为可切换图层)")
+    parser.add_argument("--incremental", action="store_true", help="跳过输入和渲染器都未变化的地图 (记录在 html 目录的清单文件中)")
+    parser.add_argument("--prune", action="store_true", help="删除输入已不存在的旧地图")
+    parser.add_argument("--data-only", action="store_true", help="只写 N-map.json 数据文件，用 html 目录中的 map_viewer.html 查看")
+    add_render_args(parser)
+
+    args = parser.parse_args()
+
+    failures = run_batch(
+        args.json_dir,
+        args.html_dir,
+        args.workers,
+        args.chunksize,
+        None if args.no_catalog else args.catalog,
+        render_options(args),
+        args.combined,
+        args.incremental,
+        args.prune,
+        args.data_only,
+    )
+    raise SystemExit(1 if failures else 0)
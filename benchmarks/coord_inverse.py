@@ -0,0 +1,85 @@
+"""
+逆向坐标转换基准: 在中国范围 (out_of_china 的边界框) 内均匀采样，
+统计 WGS84/GCJ-02 -> BD-09 反算的往返误差和吞吐量
+
+用法: uv run python -m benchmarks.coord_inverse --points 1000000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from utils.coord_transform import (
+    _bd09_to_wgs84_lonlat_array,
+    _gcj02_to_wgs84_lonlat_array,
+    bd09_to_gcj02_array,
+    gcj02_to_bd09_array,
+    wgs84_to_bd09_array,
+    wgs84_to_gcj02_array,
+)
+
+CHINA_BBOX = (73.66, 135.05, 3.86, 53.55)  # lon_min, lon_max, lat_min, lat_max
+# out_of_china 在边界处是不连续的，紧贴边界的一小条区域不存在反算解
+EDGE_MARGIN = 0.05
+
+
+def error_meters(lon, lat, back_lon, back_lat):
+    dx = (back_lon - lon) * 111320.0 * np.cos(np.radians(lat))
+    dy = (back_lat - lat) * 110540.0
+    return np.hypot(dx, dy)
+
+
+def run_case(name, inverse, forward, lon, lat, max_iter):
+    # 小 max_iter 和边界带的点本来就不会全部收敛，误差由下面的统计给出，不需要未收敛警告
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        start = time.perf_counter()
+        inv_lon, inv_lat = inverse(lon, lat, max_iter=max_iter)
+        elapsed = time.perf_counter() - start
+    back_lon, back_lat = forward(inv_lon, inv_lat)
+    err = error_meters(lon, lat, back_lon, back_lat)
+
+    lon_min, lon_max, lat_min, lat_max = CHINA_BBOX
+    interior = (
+        (lon > lon_min + EDGE_MARGIN)
+        & (lon < lon_max - EDGE_MARGIN)
+        & (lat > lat_min + EDGE_MARGIN)
+        & (lat < lat_max - EDGE_MARGIN)
+    )
+    inner = err[interior]
+    print(
+        f"{name:<16} iter<={max_iter:<3} {len(lon) / elapsed:>12,.0f} pts/s | "
+        f"内部 max {inner.max() * 100:>9.4f} cm  p99.99 {np.percentile(inner, 99.99) * 100:>9.4f} cm  "
+        f">1cm {int((inner > 0.01).sum()):>6} | "
+        f"边界带 >1cm {int((err[~interior] > 0.01).sum()):>6}/{int((~interior).sum())}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逆向坐标转换精度与吞吐量基准")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-iter", type=int, nargs="+", default=[1, 2, 3, 5, 10])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lon_min, lon_max, lat_min, lat_max = CHINA_BBOX
+    lon = rng.uniform(lon_min, lon_max, args.points)
+    lat = rng.uniform(lat_min, lat_max, args.points)
+
+    print(f"采样点数: {args.points:,}  范围: lon {lon_min}~{lon_max}, lat {lat_min}~{lat_max}")
+    print("-" * 120)
+    cases = [
+        ("wgs84 -> bd09", wgs84_to_bd09_array, _bd09_to_wgs84_lonlat_array),
+        ("wgs84 -> gcj02", wgs84_to_gcj02_array, _gcj02_to_wgs84_lonlat_array),
+        ("gcj02 -> bd09", gcj02_to_bd09_array, bd09_to_gcj02_array),
+    ]
+    for name, inverse, forward in cases:
+        for max_iter in args.max_iter:
+            run_case(name, inverse, forward, lon, lat, max_iter)
+        print("-" * 120)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+HTML 体积与生成耗时基准: 对典型站点规模生成输入/输出地图，统计文件大小和耗时，
+并与只写数据文件 (--data-only 的 *.map.json，用 static/map_viewer.html 查看) 对比
+
+用法: uv run python -m benchmarks.html_size --sizes 100 500 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from benchmarks.synthetic import make_request, make_response
+from main import (
+    add_render_args,
+    create_output_visualization,
+    create_visualization,
+    render_options,
+    render_request,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地图 HTML 体积与生成耗时基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    add_render_args(parser)
+    args = parser.parse_args()
+    opts = render_options(args)
+
+    print(f"渲染参数: {opts}")
+    print(
+        f"{'站点数':>6} | {'input.html':>12} {'耗时':>7} | {'output.html':>12} {'耗时':>7} | "
+        f"{'map.json':>12} {'耗时':>7} | {'体积':>6} {'耗时':>6}"
+    )
+    print("-" * 100)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            req = make_request(n, seed=n)
+            req_file = os.path.join(tmp, f"{n}_req.json")
+            rsp_file = os.path.join(tmp, f"{n}_rsp.json")
+            with open(req_file, "w", encoding="utf-8") as f:
+                json.dump(req, f, ensure_ascii=False)
+            with open(rsp_file, "w", encoding="utf-8") as f:
+                json.dump(make_response(req, seed=n), f, ensure_ascii=False)
+
+            input_html = os.path.join(tmp, f"{n}_input.html")
+            output_html = os.path.join(tmp, f"{n}_output.html")
+            data_file = os.path.join(tmp, f"{n}.map.json")
+            with redirect_stdout(StringIO()):
+                start = time.perf_counter()
+                create_visualization(req_file, input_html, **opts)
+                t_input = time.perf_counter() - start
+                start = time.perf_counter()
+                create_output_visualization(req_file, rsp_file, output_html, **opts)
+                t_output = time.perf_counter() - start
+                # 数据文件同时包含输入和结果视图，对比的是两张地图的合计
+                start = time.perf_counter()
+                render_request(req_file, rsp_file, data_file=data_file, **opts)
+                t_data = time.perf_counter() - start
+
+            html_size = os.path.getsize(input_html) + os.path.getsize(output_html)
+            data_size = os.path.getsize(data_file)
+            print(
+                f"{n:>6} | {os.path.getsize(input_html) / 1024:>9.1f} KB {t_input:>6.2f}s | "
+                f"{os.path.getsize(output_html) / 1024:>9.1f} KB {t_output:>6.2f}s | "
+                f"{data_size / 1024:>9.1f} KB {t_data:>6.2f}s | "
+                f"{html_size / data_size:>5.1f}x {(t_input + t_output) / t_data:>5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+viz_from_logs Java toString 解析基准: 原实现 (逐层截取子串、递归重新扫描、每个片段一次正则) 与单遍解析器对比，
+- 差分校验: 合成的 DispatchResponse(...) 和随机生成的畸形片段 (括号不配对、换行、重复等号、多余逗号、大小写 null ...)
+  上两个实现的结果必须完全一致 (包括键顺序、int / float / bool 类型)
+- 吞吐量: 不同停靠点数的 DispatchResponse 和深层嵌套对象上的 MB/s
+
+用法: uv run python -m benchmarks.java_parser --stops 100 1000 5000 --depth 50 200 --fuzz 20000
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from benchmarks.synthetic import make_request, make_response
+from viz_from_logs import parse_java_object_to_dict
+
+
+def legacy_parse(s, key_context=None):
+    """原实现 (viz_from_logs.parse_java_object_to_dict)"""
+    s = s.strip()
+
+    # 1. 处理列表 [...]
+    if s.startswith("[") and s.endswith("]"):
+        content = s[1:-1]
+        parts = []
+        depth = 0
+        start = 0
+        for i, char in enumerate(content):
+            if char in "([":
+                depth += 1
+            elif char in ")]":
+                depth -= 1
+            elif char == "," and depth == 0:
+                parts.append(content[start:i].strip())
+                start = i + 1
+        parts.append(content[start:].strip())
+        # 列表中的元素递归解析
+        return [legacy_parse(p) for p in parts if p]
+
+    # 2. 处理对象 ClassName(key=value)
+    obj_match = re.match(r"^[a-zA-Z0-9.]+\((.*)\)$", s)
+    if obj_match:
+        content = obj_match.group(1)
+        kv_pairs = {}
+        depth = 0
+        start = 0
+        current_key = None
+        for i, char in enumerate(content):
+            if char in "([":
+                depth += 1
+            elif char in ")]":
+                depth -= 1
+            elif char == "=" and depth == 0:
+                current_key = content[start:i].strip()
+                start = i + 1
+            elif char == "," and depth == 0:
+                if current_key:
+                    val_str = content[start:i].strip()
+                    parsed_val = legacy_parse(val_str, current_key)
+                    if parsed_val is not None:
+                        kv_pairs[current_key] = parsed_val
+                start = i + 1
+
+        if current_key:
+            val_str = content[start:].strip()
+            parsed_val = legacy_parse(val_str, current_key)
+            if parsed_val is not None:
+                kv_pairs[current_key] = parsed_val
+        return kv_pairs
+
+    # 3. 基础类型转换逻辑
+    if s.lower() == "null":
+        return None
+    if s.lower() == "true":
+        return True
+    if s.lower() == "false":
+        return False
+
+    force_str_keys = {
+        "location_id",
+        "trace_id",
+        "request_id",
+        "vehicle_id",
+        "node_index",
+    }
+
+    if key_context in force_str_keys:
+        return s
+
+    try:
+        if "." in s:
+            return float(s)
+        return int(s)
+    except ValueError:
+        return s
+
+
+def class_name(key):
+    """routes -> Route, unassigned_tasks -> UnassignedTask"""
+    name = "".join(part.capitalize() for part in key.split("_"))
+    return name[:-1] if name.endswith("s") else name
+
+
+def to_java_string(value, name="DispatchResponse"):
+    """dict -> Name(k=v, ...)，list -> [...]，None -> null (Lombok @Data toString 的格式)"""
+    if isinstance(value, dict):
+        fields = ", ".join(f"{k}={to_java_string(v, class_name(k))}" for k, v in value.items())
+        return f"{name}({fields})"
+    if isinstance(value, list):
+        return "[" + ", ".join(to_java_string(v, name) for v in value) + "]"
+    if value is None:
+        return "null"
+    return str(value)
+
+
+def make_dispatch_response(n_stops, seed=0):
+    """约 n_stops 个停靠点的 DispatchResponse toString (含 null 字段、数字形式的 id、浮点数、布尔值)"""
+    req = make_request(n_stops * 10, seed=seed)
+    rsp = make_response(req, seed=seed)
+    for i, stop in enumerate(rsp["data"]["routes"][0]["stops"]):
+        stop["node_index"] = f"{i:04d}"
+        stop["lat"] = 39.9 + i * 1e-4
+        stop["remark"] = None
+        stop["is_last"] = i == n_stops - 1
+        stop["window"] = {"start": "09:00", "end": "18:00", "soft": None}
+    rsp["trace_id"] = "000123"
+    rsp["cost"] = 1234.5
+    return to_java_string(rsp)
+
+
+def make_nested(depth):
+    """depth 层嵌套的对象 (原实现每一层都重新扫描并复制下面的全部内容)"""
+    return "Node(id=1, name=n, child=" * depth + "Leaf(id=2)" + ")" * depth
+
+
+FUZZ_TOKENS = [
+    "(", ")", "[", "]", ",", "=", ", ", " ", "\n", "\t", "Obj(", "A.b(", "[", "x", "key", "vehicle_id", "node_index",
+    "null", "NULL", "True", "false", "1", "007", "-3", "1.5", "1e5", "1.2.3", "1_000", "nan", "中文", "", "  ",
+]
+
+
+def fuzz_case(rng):
+    """随机片段: 以对象 / 列表 / 任意前缀开头，随后是随机 token"""
+    head = rng.choice(["Obj(", "[", "", "R(a=", "X.Y(k=[", " "])
+    body = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 25)))
+    tail = rng.choice([")", "]", "", "))", ")]", " "])
+    return head + body + tail
+
+
+def same(a, b):
+    """json 文本相同 (区分 1 / 1.0 / True，键顺序也必须相同)"""
+    return json.dumps(a, ensure_ascii=False) == json.dumps(b, ensure_ascii=False)
+
+
+def check(s, key_context=None):
+    old = legacy_parse(s, key_context)
+    new = parse_java_object_to_dict(s, key_context)
+    if not same(old, new):
+        raise SystemExit(f"❌ 结果不一致:\n输入: {s!r}\n原实现: {old!r}\n新实现: {new!r}")
+
+
+def throughput(func, s, min_time=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func(s)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return len(s.encode("utf-8")) * calls / elapsed / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Java toString 解析基准 (原实现 vs 单遍解析)")
+    parser.add_argument("--stops", type=int, nargs="+", default=[100, 1000, 5000], help="DispatchResponse 的停靠点数")
+    parser.add_argument("--depth", type=int, nargs="+", default=[50, 200], help="嵌套对象的层数")
+    parser.add_argument("--fuzz", type=int, default=20000, help="随机畸形片段的数量")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for _ in range(args.fuzz):
+        s = fuzz_case(rng)
+        check(s, rng.choice([None, "vehicle_id", "x"]))
+    cases = {f"{n} 停靠点": make_dispatch_response(n, seed=n) for n in args.stops}
+    cases.update({f"嵌套 {d} 层": make_nested(d) for d in args.depth})
+    for s in cases.values():
+        check(s)
+    print(f"✅ 差分校验通过: {args.fuzz} 个随机片段 + {len(cases)} 个完整结构")
+
+    print(f"{'输入':<12} {'大小':>10} {'原实现':>12} {'单遍解析':>12} {'加速':>8}")
+    print("-" * 60)
+    for name, s in cases.items():
+        old = throughput(legacy_parse, s)
+        new = throughput(parse_java_object_to_dict, s)
+        print(f"{name:<12} {len(s) / 1024:>8.1f}KB {old:>8.2f} MB/s {new:>8.2f} MB/s {new / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
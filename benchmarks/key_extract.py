@@ -0,0 +1,63 @@
+"""
+请求分类字段提取基准: 对每个键分别调用 find_key_recursive (原实现) 与 find_keys 一次遍历，
+在大请求的几种结构上对比单次耗时，并检查结果一致
+
+用法: uv run python -m benchmarks.key_extract --sizes 500 2000 5000
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_request
+from utils.json_keys import REQUEST_KEYS, find_key_recursive, find_keys
+
+
+def layouts(n):
+    """(名称, 请求): 标准结构 / stations 在 vehicle 之前 / 缺少 decision_type 和 plan_type"""
+    req = make_request(n, seed=n)
+    yield "标准", req
+
+    yield "stations 在前", {"stations": req["stations"], "depot": req["depot"], "vehicle": req["vehicle"]}
+
+    vehicle = {k: v for k, v in req["vehicle"].items() if k not in ("decision_type", "plan_type")}
+    yield "缺少字段", {**req, "vehicle": vehicle}
+
+
+def per_key(data):
+    return {k: find_key_recursive(data, k) for k in REQUEST_KEYS}
+
+
+def one_pass(data):
+    return find_keys(data, REQUEST_KEYS)
+
+
+def time_per_call(func, data, min_time=0.2):
+    """重复调用直到累计 min_time 秒，返回单次耗时 (秒)"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func(data)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求分类字段提取基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'站点数':>6} {'结构':<14} {'逐键 DFS':>12} {'一次遍历':>12} {'加速':>8}")
+    print("-" * 60)
+    for n in args.sizes:
+        for name, data in layouts(n):
+            if per_key(data) != one_pass(data):
+                raise SystemExit(f"❌ {n} 站点 {name}: 结果不一致")
+            t_old = time_per_call(per_key, data)
+            t_new = time_per_call(one_pass, data)
+            print(f"{n:>6} {name:<14} {t_old * 1e6:>9.1f} µs {t_new * 1e6:>9.1f} µs {t_old / t_new:>7.1f}x")
+    print("✅ 结果一致")
+
+
+if __name__ == "__main__":
+    main()
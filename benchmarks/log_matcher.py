@@ -0,0 +1,228 @@
+"""
+rid_log_matcher 扫描吞吐量基准: 合成日志上对比原始逐行正则实现、当前串行实现 (mmap / gzip 流式解压) 和多进程分块实现 (MB/s)，
+并检查各实现的统计结果和时间线完全一致 (只统计，不写 JSON 文件)
+
+用法: uv run python -m benchmarks.log_matcher --requests 2000 --stations 50 --noise 20
+      uv run python -m benchmarks.log_matcher --workers 8 --chunk-mb 4
+      uv run python -m benchmarks.log_matcher --log mylog_input/app_2026-01-21.log
+"""
+import argparse
+import gzip
+import json
+import shutil
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from functools import partial
+
+from benchmarks.synthetic import make_log
+from rid_log_matcher import (
+    MARKERS,
+    RidMatcher,
+    match_parallel,
+    new_vehicle_stats,
+    parse_log_time,
+    req_pattern,
+    rsp_pattern,
+    timeline_entry,
+)
+from utils.batch_pool import default_workers
+from utils.json_keys import find_key_recursive
+from utils.log_input import iter_log_lines
+
+
+def legacy_extract(log_file_path):
+    """原实现: 每行执行两次正则，请求 JSON 在入队和配对时各解析一次"""
+    pending_requests = {}
+    timeline = []
+    stats = {
+        "total_req_found": 0,
+        "success_pairs": 0,
+        "ignored_by_filter": 0,
+        "failed_json": 0,
+        "empty_routes": 0,
+        "algorithm_error": 0
+    }
+    combination_counts = defaultdict(int)
+    vehicle_stats = defaultdict(new_vehicle_stats)
+
+    with open(log_file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            req_match = re.search(req_pattern, line)
+            if req_match:
+                req_id_match = re.search(r"rid=([a-f0-9\-]+)", line)
+                if req_id_match:
+                    rid = req_id_match.group(1)
+                    req_content = line.split("接收到调度请求详情", 1)[1].strip()
+                    if req_content.startswith(":") or req_content.startswith("："):
+                        req_content = req_content[1:].strip()
+
+                    v_id = "unknown"
+                    d_type = None
+                    p_type = None
+                    try:
+                        req_data = json.loads(req_content)
+                        v_id = find_key_recursive(req_data, "vehicle_id") or "unknown"
+                        d_type = find_key_recursive(req_data, "decision_type")
+                        p_type = find_key_recursive(req_data, "plan_type")
+                    except:
+                        pass
+
+                    pending_requests[rid] = {
+                        "content": req_content,
+                        "v_id": v_id,
+                        "d_type": d_type,
+                        "p_type": p_type,
+                        "ts": parse_log_time(line)
+                    }
+                    vehicle_stats[v_id]["total_req"] += 1
+                    stats["total_req_found"] += 1
+                continue
+
+            rsp_match = re.search(rsp_pattern, line)
+            if rsp_match:
+                rid, rsp_json_str = rsp_match.groups()
+
+                if rid in pending_requests:
+                    req_info = pending_requests[rid]
+                    v_id = req_info["v_id"]
+                    d_type = req_info["d_type"]
+                    p_type = req_info["p_type"]
+
+                    combination_counts[(d_type, p_type)] += 1
+
+                    try:
+                        req_data = json.loads(req_info["content"])
+                        rsp_data = json.loads(rsp_json_str.strip())
+
+                        if d_type == 1 and p_type == 0:
+                            vehicle_stats[v_id]["target_req"] += 1
+                            if rsp_data.get("status") != "Success":
+                                status_label = "error"
+                                stats["algorithm_error"] += 1
+                                vehicle_stats[v_id]["error"] += 1
+                            else:
+                                routes = rsp_data.get("data", {}).get("routes", []) if "data" in rsp_data else rsp_data.get("routes", [])
+                                if not routes:
+                                    status_label = "empty"
+                                    stats["empty_routes"] += 1
+                                    vehicle_stats[v_id]["empty"] += 1
+                                else:
+                                    status_label = "normal"
+                                    stats["success_pairs"] += 1
+                                    vehicle_stats[v_id]["normal"] += 1
+                            timeline.append(timeline_entry(rid, req_info, v_id, status_label, parse_log_time(line)))
+                        else:
+                            stats["ignored_by_filter"] += 1
+                            vehicle_stats[v_id]["filtered"] += 1
+
+                    except json.JSONDecodeError:
+                        stats["failed_json"] += 1
+                        vehicle_stats[v_id]["failed_json"] += 1
+
+                    del pending_requests[rid]
+
+    for rid, req_info in pending_requests.items():
+        v_id = req_info["v_id"]
+        if req_info["d_type"] == 1 and req_info["p_type"] == 0:
+            vehicle_stats[v_id]["target_req"] += 1
+            vehicle_stats[v_id]["unmatched"] += 1
+            timeline.append(timeline_entry(rid, req_info, v_id, "unmatched", None))
+        else:
+            vehicle_stats[v_id]["filtered"] += 1
+
+    return (stats, combination_counts, len(pending_requests), vehicle_stats), timeline
+
+
+def current_extract(log_file_path, pending_ttl=None):
+    """当前实现: 未压缩文件 mmap 后只解码包含标记的行，压缩文件流式解压"""
+    matcher = RidMatcher(None, write_files=False, pending_ttl=pending_ttl)
+    for line in iter_log_lines(log_file_path, MARKERS):
+        matcher.feed(line)
+    return matcher.finish(), matcher.timeline
+
+
+def parallel_extract(workers, chunk_mb):
+    def run(log_file_path):
+        matcher = RidMatcher(None, write_files=False)
+        match_parallel(matcher, log_file_path, workers, chunk_mb)
+        return matcher.finish(), matcher.timeline
+    return run
+
+
+def best_of(func, path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def timeline_order(e):
+    return e["req_ts"] is None, e["req_ts"] or 0, e["rid"]
+
+
+def normalize(report, timeline):
+    stats, combos, unmatched, vehicles = report[:4]
+    return stats, dict(combos), unmatched, {k: dict(v) for k, v in vehicles.items()}, sorted(timeline, key=timeline_order)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rid_log_matcher 扫描吞吐量基准")
+    parser.add_argument("--log", default=None, help="使用已有日志文件 (默认生成合成日志)")
+    parser.add_argument("--requests", type=int, default=2000, help="合成日志的请求数")
+    parser.add_argument("--stations", type=int, default=50, help="每个请求的站点数")
+    parser.add_argument("--noise", type=int, default=20, help="每个请求之后最多的噪声行数")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="多进程实现的进程数")
+    parser.add_argument("--chunk-mb", type=float, default=4, help="多进程实现的分块大小 (MB)")
+    parser.add_argument("--pending-ttl", type=float, default=0.5, help="有界待配对表的 TTL (日志时间秒数)")
+    parser.add_argument("--repeat", type=int, default=3, help="每种实现运行次数 (取最快一次)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.log
+        if path is None:
+            path = os.path.join(tmp, "synthetic.log")
+            make_log(path, args.requests, args.stations, args.noise)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"日志: {path} ({size_mb:.1f} MB)")
+
+        t_legacy, legacy = best_of(legacy_extract, path, args.repeat)
+        t_current, current = best_of(current_extract, path, args.repeat)
+        t_parallel, parallel = best_of(parallel_extract(args.workers, args.chunk_mb), path, args.repeat)
+
+        gz_path = os.path.join(tmp, "synthetic.log.gz")
+        with open(path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+        t_gzip, gzipped = best_of(current_extract, gz_path, args.repeat)
+        t_ttl, bounded = best_of(partial(current_extract, pending_ttl=args.pending_ttl), path, args.repeat)
+
+    print(f"{'实现':<14} {'耗时':>8} {'吞吐量':>12}")
+    rows = (
+        ("legacy", t_legacy),
+        ("current", t_current),
+        (f"parallel x{args.workers}", t_parallel),
+        ("current .gz", t_gzip),
+        (f"ttl={args.pending_ttl:g}s", t_ttl),
+    )
+    for name, t in rows:
+        print(f"{name:<14} {t:>7.2f}s {size_mb / t:>8.1f} MB/s  ({t_legacy / t:.2f}x)")
+
+    expected = normalize(*legacy)
+    for name, result in (("current", current), ("parallel", parallel), ("current .gz", gzipped), ("ttl", bounded)):
+        if normalize(*result) != expected:
+            raise SystemExit(f"❌ {name} 与原实现的统计结果不一致")
+    stats = current[0][0]
+    print(f"✅ 统计结果一致: 请求 {stats['total_req_found']}, 正常 {stats['success_pairs']}, "
+          f"空路径 {stats['empty_routes']}, 报错 {stats['algorithm_error']}, "
+          f"过滤 {stats['ignored_by_filter']}, 解析失败 {stats['failed_json']}, 丢失 {current[0][2]}")
+    unbounded, memory = current[0][4], bounded[0][4]
+    print(f"待配对表峰值: 不设上限 {unbounded['peak_pending']} 条 / ttl={args.pending_ttl:g}s {memory['peak_pending']} 条 "
+          f"(淘汰 {memory['evictions']}, 淘汰后配对 {memory['late_responses']}, 磁盘中丢失 {memory['spilled_unmatched']})")
+
+if __name__ == "__main__":
+    main()
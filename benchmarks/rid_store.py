@@ -0,0 +1,107 @@
+"""
+rid 输出格式基准: 合成日志上对比目录格式 (每个请求/响应一个缩进 JSON 文件) 与打包格式 (rids.sqlite + rids-*.jsonl)
+的写入耗时、文件数、磁盘占用、列出全部 rid 和按状态过滤的耗时，并检查打包格式导出后与目录格式逐字节一致
+
+用法: uv run python -m benchmarks.rid_store --requests 5000 --stations 50
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import make_log
+from request_and_visualize import get_all_rids
+from rid_log_matcher import TIMELINE_NAME, extract_logs
+from utils.packed_store import RidStore
+
+
+def disk_usage(directory):
+    files = 0
+    size = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def same_tree(a, b):
+    """两个目录的文件列表和内容完全相同"""
+    cmp = filecmp.dircmp(a, b)
+    if cmp.left_only or cmp.right_only or cmp.funny_files:
+        return False
+    _, mismatch, errors = filecmp.cmpfiles(a, b, cmp.common_files, shallow=False)
+    if mismatch or errors:
+        return False
+    return all(same_tree(os.path.join(a, d), os.path.join(b, d)) for d in cmp.common_dirs)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def list_errors_dir(directory):
+    return [item for item in get_all_rids(directory) if item["status"] == "error"]
+
+
+def list_errors_packed(directory):
+    store = RidStore(directory)
+    records = store.query(status="error")
+    store.close()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rid 输出格式基准 (目录 vs 打包)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--noise", type=int, default=5, help="每个请求附带的噪声行数")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_rid_store_")
+    try:
+        log = os.path.join(work, "app.log")
+        make_log(log, args.requests, args.stations, args.noise)
+        dir_out = os.path.join(work, "dir")
+        packed_out = os.path.join(work, "packed")
+
+        rows = []
+        for name, out, fmt, list_errors in (
+            ("目录", dir_out, "dir", list_errors_dir),
+            ("打包", packed_out, "packed", list_errors_packed),
+        ):
+            t_write, _ = timed(extract_logs, [log], out, store_format=fmt)
+            # request_and_visualize 的入口: 目录格式 os.walk，打包格式查询索引
+            t_list, items = timed(get_all_rids, out)
+            t_filter, errors = timed(list_errors, out)
+            files, size = disk_usage(out)
+            rows.append((name, t_write, files, size, t_list, len(items), t_filter, len(errors)))
+
+        print(f"{'格式':<6} {'写入':>9} {'文件数':>8} {'磁盘占用':>10} {'列出全部':>10} {'按状态过滤':>12}")
+        print("-" * 64)
+        for name, t_write, files, size, t_list, n_items, t_filter, n_errors in rows:
+            print(
+                f"{name:<6} {t_write:>8.2f}s {files:>8} {size / 1024 / 1024:>8.2f}MB "
+                f"{t_list * 1000:>8.1f}ms {t_filter * 1000:>10.1f}ms"
+            )
+        if rows[0][5] != rows[1][5] or rows[0][7] != rows[1][7]:
+            raise SystemExit("❌ 两种格式的 rid 数量不一致")
+
+        export_dir = os.path.join(work, "export")
+        store = RidStore(packed_out)
+        store.export(export_dir)
+        store.close()
+        shutil.copy(os.path.join(packed_out, TIMELINE_NAME), export_dir)
+        if not same_tree(dir_out, export_dir):
+            raise SystemExit("❌ 打包格式导出结果与目录格式不一致")
+        print(f"✅ {rows[0][5]} 个 rid，导出结果与目录格式一致")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
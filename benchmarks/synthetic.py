@@ -0,0 +1,126 @@
+"""
+生成结构与线上 req.json / response.json 一致的合成数据，供各基准脚本使用
+"""
+import json
+import os
+import random
+import time
+
+from utils.synthetic_response import make_response  # noqa: F401 (基准脚本从这里导入)
+
+
+def make_request(n_stations, seed=0, vehicle_id="V0001"):
+    rng = random.Random(seed)
+    stations = []
+    for i in range(n_stations):
+        stations.append(
+            {
+                "station_id": f"ST{i:05d}",
+                "station_name": f"合成站点{i:05d}",
+                "longitude": round(116.30 + rng.random() * 0.25, 6),
+                "latitude": round(39.85 + rng.random() * 0.18, 6),
+                "demands": rng.randint(-12, 12),
+                "area": f"区域{i % 7}",
+                "location": f"测试路{i}号",
+                "available_nums": rng.randint(0, 20),
+                "locker_nums": 20,
+                "service_time": rng.choice([3, 5, 8]),
+                "priority": rng.randint(0, 3),
+                "demand_time": f"2026-01-21 {8 + i % 10:02d}:{i % 60:02d}:00",
+            }
+        )
+    return {
+        "depot": {
+            "station_id": "DEPOT01",
+            "station_name": "合成仓库",
+            "longitude": 116.404,
+            "latitude": 39.915,
+            "area": "区域0",
+            "location": "仓库路1号",
+        },
+        "vehicle": {
+            "vehicle_id": vehicle_id,
+            "vehicle_type": "电动三轮",
+            "current_load": 10,
+            "capacity": 60,
+            "work_hours": {"start": "08:00", "end": "20:00"},
+            "vehicle_status": "IDLE",
+            "longitude": 116.41,
+            "latitude": 39.92,
+            "decision_type": 1,
+            "plan_type": 0,
+        },
+        "stations": stations,
+    }
+
+
+LOG_NOISE = [
+    "INFO c.d.HealthCheck - heartbeat ok, active=12 idle=4",
+    "DEBUG c.d.Cache - rid={rid} cache hit key=vehicle:{vehicle}",
+    "INFO c.d.Svc - rid={rid} 开始处理调度请求 vehicle={vehicle}",
+    "WARN c.d.Geo - 坐标超出服务区域, 已忽略 station=ST00042",
+    "INFO c.d.Svc - rid={rid} 调度请求处理完成, 耗时 312ms",
+]
+
+
+def make_log(path, n_requests, n_stations=50, noise_per_request=20, seed=0):
+    """
+    生成与线上格式一致的调度日志 (rid_log_matcher 的输入)，包含:
+    噪声行、(1,0) 正常/空路径/报错响应、非目标组合、无响应的请求、
+    请求/响应 JSON 损坏、重复 rid、孤立响应、全角冒号与多余空白等边界情况
+    返回写入的字节数
+    """
+    rng = random.Random(seed)
+    t = 1768960800.0  # 2026-01-21 10:00:00
+    lines = []
+    answered = []
+
+    def stamp():
+        nonlocal t
+        t += rng.random() * 0.05
+        ms = int(t * 1000) % 1000
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)) + f".{ms:03d} [http-{rng.randint(1, 8)}]"
+
+    def emit(text):
+        lines.append(f"{stamp()} {text}")
+
+    for i in range(n_requests):
+        rid = f"{rng.getrandbits(128):032x}"
+        vehicle = f"V{rng.randint(0, 9):04d}"
+        req = make_request(n_stations, seed=i, vehicle_id=vehicle)
+        if rng.random() < 0.2:
+            req["vehicle"]["decision_type"], req["vehicle"]["plan_type"] = rng.choice([(0, 0), (1, 1), (2, 0)])
+        req_text = json.dumps(req, ensure_ascii=False)
+        kind = rng.random()
+        if 0.18 <= kind < 0.20:
+            req_text = req_text[: len(req_text) // 2]  # 截断的请求
+        sep = rng.choice([": ", ": ", "：", ":", " ", ":  "])
+        if kind < 0.03:
+            sep = ""  # 标记后没有分隔符，不是请求行
+        emit(f"INFO c.d.Svc - rid={rid} 接收到调度请求详情{sep}{req_text}")
+        for _ in range(rng.randint(0, noise_per_request)):
+            emit(rng.choice(LOG_NOISE).format(rid=rid, vehicle=vehicle))
+
+        if kind < 0.08:
+            continue  # 没有响应
+        rsp = make_response(req, seed=i)
+        if kind < 0.12:
+            rsp = {"status": "Error", "message": "算法超时"}
+        elif kind < 0.16:
+            rsp["data"]["routes"] = []
+        rsp_text = json.dumps(rsp, ensure_ascii=False)
+        if kind > 0.98:
+            rsp_text = rsp_text[:-3]  # 截断的响应
+        if 0.95 <= kind < 0.97 and answered:
+            # 响应的 rid 已经配对过 (孤立响应)，本次请求变为无响应
+            rid = answered[-1]
+        elif 0.16 < kind < 0.18:
+            # 重复 rid: 同一个请求被记录两次，只有后一次参与配对
+            emit(f"INFO c.d.Svc - rid={rid} 接收到调度请求详情: {json.dumps(req, ensure_ascii=False)}")
+        answered.append(rid)
+        lines.append(f"{stamp()} INFO c.d.Svc - rid={rid} 调度算法输出详情: {rsp_text}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+    return os.path.getsize(path)
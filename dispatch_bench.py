@@ -0,0 +1,392 @@
+"""
+调度接口性能基准工具
+
+    # 基准模式: 按并发数发送语料中的全部请求 (不渲染地图)，记录每个请求的耗时
+    python dispatch_bench.py run --input mylog_input/app_2026-01-21 --url http://localhost:8000/api/v1/dispatch --out bench/new.json
+
+    # 查看报告
+    python dispatch_bench.py report bench/new.json
+
+    # 对比两次运行，超过阈值的回退以非零退出码结束
+    python dispatch_bench.py diff bench/base.json bench/new.json --threshold 0.1
+
+    # 按日志中的原始时间间隔回放 (2 倍速)，或以固定 QPS 开环发送
+    python dispatch_bench.py replay --input mylog_input/app_2026-01-21 --speed 2 --out bench/replay.json
+    python dispatch_bench.py replay --input mylog_input/app_2026-01-21 --qps 5 --count 300
+
+    # 容量探测: AIMD 逐步调整并发数，找出饱和点和吞吐/延迟的最佳平衡点
+    python dispatch_bench.py capacity --input mylog_input/app_2026-01-21 --window 10 --steps 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from rid_log_matcher import TIMELINE_NAME
+from utils.capacity import DEFAULT_ERROR_BUDGET, DEFAULT_LATENCY_FACTOR, AimdController, analyze_capacity
+from utils.dispatch_client import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, DispatchClient
+from utils.latency_report import (
+    DEFAULT_REGRESSION_THRESHOLD,
+    LatencyRecorder,
+    _fmt,
+    diff_reports,
+    latency_stats,
+    load_report,
+    print_diff,
+    print_summary,
+)
+from utils.packed_store import RidStore, is_packed, read_record
+
+DEFAULT_API_URL = "http://localhost:8000/api/v1/dispatch"
+# 开环回放时允许同时在途的请求数 (足够大，避免客户端自身成为瓶颈)
+DEFAULT_REPLAY_CONCURRENCY = 256
+
+
+def find_requests(input_path):
+    """
+    收集请求语料，兼容两种目录结构 (打包格式由 load_corpus 直接读取):
+      - rid_log_matcher 输出: .../{vehicle_id}/{status}/{rid}_req.json (递归)
+      - batch_test 输入: 目录下的 *.json
+    也可以直接传单个文件。返回按路径排序的 [(name, path)]
+    """
+    if os.path.isfile(input_path):
+        return [(os.path.basename(input_path), input_path)]
+
+    found = []
+    for root, _, files in os.walk(input_path):
+        for fname in files:
+            if fname.endswith("_req.json"):
+                found.append((fname[: -len("_req.json")], os.path.join(root, fname)))
+    if found:
+        return sorted(found, key=lambda x: x[1])
+
+    return sorted(
+        (os.path.splitext(f)[0], os.path.join(input_path, f))
+        for f in os.listdir(input_path)
+        if f.endswith(".json")
+    )
+
+
+def load_corpus(input_path, max_count=None):
+    """读取请求语料 [(name, req_data)]，一个请求都没有时报错 (各模式都无法运行)"""
+    if os.path.isdir(input_path) and is_packed(input_path):
+        # rid_log_matcher --format packed 的输出，与目录格式一样按 vehicle_id/status/rid 排序
+        store = RidStore(input_path)
+        records = store.query(limit=max_count)
+        corpus = [(r["rid"], store.load(r)) for r in records]
+        store.close()
+    else:
+        corpus = []
+        for name, path in find_requests(input_path)[:max_count]:
+            with open(path, "r", encoding="utf-8") as f:
+                corpus.append((name, json.load(f)))
+    if not corpus:
+        raise ValueError(f"{input_path} 中没有找到请求 (*_req.json / *.json 或打包存储)")
+    return corpus
+
+
+def load_timeline(input_dir, max_count=None):
+    """
+    读取 rid_log_matcher 输出目录中的 timeline.jsonl，返回按日志时间排序的
+    [(name, req_data, req_ts, log_latency)]，跳过没有时间戳或请求文件缺失的 rid
+    """
+    path = os.path.join(input_dir, TIMELINE_NAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} 不存在，请先用 rid_log_matcher.py 重新匹配日志")
+
+    records = None
+    if is_packed(input_dir):
+        store = RidStore(input_dir)
+        records = {(r["vehicle_id"], r["status"], r["rid"]): r for r in store.query()}
+        store.close()
+
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            e = json.loads(line)
+            if records is not None:
+                source = records.get((str(e["vehicle_id"]), e["status"], e["rid"]))
+            else:
+                source = os.path.join(input_dir, str(e["vehicle_id"]), e["status"], f"{e['rid']}_req.json")
+                source = source if os.path.exists(source) else None
+            if e["req_ts"] is None or source is None:
+                continue
+            entries.append((e["rid"], source, e["req_ts"], e.get("log_latency")))
+    entries.sort(key=lambda x: x[2])
+
+    timeline = []
+    for rid, source, req_ts, log_latency in entries[:max_count]:
+        if records is not None:
+            req_data = read_record(input_dir, source)
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                req_data = json.load(f)
+        timeline.append((rid, req_data, req_ts, log_latency))
+    return timeline
+
+
+def timestamp_schedule(timeline, speed=1.0):
+    """按日志中的请求间隔生成发送计划 [(offset 秒, name, req_data, extra)]，speed > 1 为加速"""
+    if not timeline:
+        return []
+    t0 = timeline[0][2]
+    return [
+        ((ts - t0) / speed, name, req, {"log_latency": log_latency})
+        for name, req, ts, log_latency in timeline
+    ]
+
+
+def qps_schedule(corpus, qps, count=None):
+    """固定 QPS 的开环发送计划，语料不够时循环使用"""
+    if not corpus:
+        raise ValueError("没有找到请求，无法生成固定 QPS 的发送计划")
+    count = len(corpus) if count is None else count
+    return [(i / qps, *corpus[i % len(corpus)], {}) for i in range(count)]
+
+
+async def replay_run(schedule, api_url, concurrency, timeout, retries, meta=None):
+    """
+    开环回放: 每个请求在计划时间发出，不等待之前的请求完成
+    queue_delay = 实际发出时间 - 计划时间 (事件循环调度延迟 + 客户端并发限制导致的等待)
+    """
+    recorder = LatencyRecorder(
+        {"api_url": api_url, "concurrency": concurrency, "requests": len(schedule), **(meta or {})}
+    )
+
+    async def fire(due, offset, name, req_data, extra):
+        result = await client.post(req_data)
+        recorder.add(
+            name,
+            req_data,
+            result["latency"],
+            result["ok"],
+            result["status_code"],
+            result["attempts"],
+            total_latency=result["total_latency"],
+            scheduled_offset=offset,
+            queue_delay=max(0.0, result["started"] - due),
+            **extra,
+        )
+
+    async with DispatchClient(api_url, concurrency, timeout, retries) as client:
+        start = time.perf_counter()
+        tasks = []
+        for offset, name, req_data, extra in schedule:
+            due = start + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(due, offset, name, req_data, extra)))
+        await asyncio.gather(*tasks)
+    recorder.stop()
+    return recorder
+
+
+async def bench_run(corpus, api_url, concurrency, timeout, retries, repeat=1, meta=None):
+    """闭环基准: 最多 concurrency 个请求同时在途，全部发送完成后返回 LatencyRecorder"""
+    recorder = LatencyRecorder(
+        {"api_url": api_url, "concurrency": concurrency, "requests": len(corpus) * repeat, **(meta or {})}
+    )
+
+    async def one(name, req_data):
+        result = await client.post(req_data)
+        recorder.add(
+            name, req_data, result["latency"], result["ok"], result["status_code"], result["attempts"],
+            total_latency=result["total_latency"],
+        )
+
+    async with DispatchClient(api_url, concurrency, timeout, retries) as client:
+        await asyncio.gather(*(one(name, req) for _ in range(repeat) for name, req in corpus))
+    recorder.stop()
+    return recorder
+
+
+async def capacity_window(client, corpus, concurrency, window, cursor):
+    """
+    闭环观测窗口: concurrency 个并发循环不断发送请求 (语料循环使用)，持续 window 秒
+    返回本窗口的记录列表和实际耗时；cursor 为 [下一个语料下标]，跨窗口延续
+    """
+    records = []
+    deadline = time.perf_counter() + window
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name, req_data = corpus[cursor[0] % len(corpus)]
+            cursor[0] += 1
+            result = await client.post(req_data)
+            records.append({"name": name, **result, "data": None})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return records, time.perf_counter() - start
+
+
+async def capacity_run(corpus, api_url, controller, window, steps, timeout, max_congestion=3):
+    """
+    AIMD 容量探测: 每个窗口结束后由 controller 决定下一个窗口的并发数，
+    达到 steps 个窗口或拥塞 max_congestion 次后停止
+    """
+    cursor = [0]
+    async with DispatchClient(api_url, controller.max_concurrency, timeout, retries=0) as client:
+        for step in range(steps):
+            concurrency = controller.concurrency
+            records, elapsed = await capacity_window(client, corpus, concurrency, window, cursor)
+            stats = latency_stats(records, elapsed)
+            controller.update(stats)
+            print(
+                f"[{step + 1:>2}] 并发 {concurrency:>3} | {stats['throughput']:6.2f} req/s | "
+                f"p50 {_fmt(stats['p50'], 'p50')} p90 {_fmt(stats['p90'], 'p90')} p99 {_fmt(stats['p99'], 'p99')} | "
+                f"错误 {stats['error_rate'] * 100:.1f}%{' | ⚠️ 拥塞' if controller.history[-1]['congested'] else ''}"
+            )
+            if controller.congestion_events >= max_congestion:
+                break
+    return analyze_capacity(controller.history)
+
+
+def print_capacity(result, controller):
+    def describe(p):
+        if p is None:
+            return "-"
+        return f"并发 {p['concurrency']} ({p['throughput']:.2f} req/s, p90 {p['p90'] * 1000:.0f}ms)"
+
+    print("-" * 60)
+    limit = controller.latency_limit
+    if limit is not None:
+        print(f"延迟上限 (p90): {limit * 1000:.0f}ms, 错误率上限: {controller.error_budget:.1%}")
+    print(f"饱和点: 并发 {result['saturation'] if result['saturation'] is not None else '未达到'}")
+    print(f"最高吞吐: {describe(result['best_throughput'])}")
+    print(f"最佳平衡 (吞吐/p90 最大): {describe(result['best_tradeoff'])}")
+
+
+def add_run_args(p):
+    p.add_argument("--input", required=True, help="请求语料目录 (rid_log_matcher 输出或 batch_test 输入) 或单个文件")
+    p.add_argument("--url", default=DEFAULT_API_URL, help="API 地址")
+    p.add_argument("--max-count", type=int, default=None, help="最多使用的请求数")
+    p.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个请求超时 (秒)")
+    p.add_argument("--retries", type=int, default=0, help="重试次数 (默认 0: 重试会掩盖慢请求和错误)")
+    p.add_argument("--label", default=None, help="写入报告的标签 (如算法版本号)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="调度接口性能基准")
+    sub = parser.add_subparsers(dest="command")
+
+    run_p = sub.add_parser("run", help="按固定并发发送语料并记录耗时")
+    add_run_args(run_p)
+    run_p.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    run_p.add_argument("--repeat", type=int, default=1, help="语料重复发送的轮数")
+    run_p.add_argument("--out", default="bench_latency.json", help="结果文件 (JSON)")
+
+    replay_p = sub.add_parser("replay", help="按日志原始节奏或固定 QPS 开环回放")
+    add_run_args(replay_p)
+    replay_p.add_argument("--speed", type=float, default=1.0, help="回放速度倍数 (2 为两倍速，0.5 为半速)")
+    replay_p.add_argument("--qps", type=float, default=None, help="固定 QPS 开环模式 (不使用日志时间戳)")
+    replay_p.add_argument("--count", type=int, default=None, help="固定 QPS 模式下发送的请求总数 (默认语料数量)")
+    replay_p.add_argument("--concurrency", type=int, default=DEFAULT_REPLAY_CONCURRENCY, help="同时在途的最大请求数")
+    replay_p.add_argument("--out", default="bench_replay.json", help="结果文件 (JSON)")
+
+    cap_p = sub.add_parser("capacity", help="AIMD 容量探测")
+    add_run_args(cap_p)
+    cap_p.add_argument("--window", type=float, default=10.0, help="每个观测窗口的时长 (秒)")
+    cap_p.add_argument("--steps", type=int, default=30, help="最多观测窗口数")
+    cap_p.add_argument("--start", type=int, default=1, help="初始并发数")
+    cap_p.add_argument("--max-concurrency", type=int, default=64)
+    cap_p.add_argument("--increase", type=int, default=1, help="未拥塞时每个窗口增加的并发数")
+    cap_p.add_argument("--decrease", type=float, default=0.5, help="拥塞时并发数的缩减系数")
+    cap_p.add_argument("--error-budget", type=float, default=DEFAULT_ERROR_BUDGET, help="允许的错误率")
+    cap_p.add_argument("--latency-factor", type=float, default=DEFAULT_LATENCY_FACTOR, help="p90 超过基线多少倍视为拥塞")
+    cap_p.add_argument("--slo-ms", type=float, default=None, help="固定的 p90 延迟上限 (毫秒)，优先于 --latency-factor")
+    cap_p.add_argument("--max-congestion", type=int, default=3, help="拥塞次数达到该值后停止")
+    cap_p.add_argument("--out", default=None, help="保存各窗口结果和结论 (JSON)")
+
+    report_p = sub.add_parser("report", help="打印结果文件的统计")
+    report_p.add_argument("file")
+
+    diff_p = sub.add_parser("diff", help="对比两次运行并标记回退")
+    diff_p.add_argument("base")
+    diff_p.add_argument("new")
+    diff_p.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="回退阈值: 延迟相对变化 / 错误率绝对变化 (默认 0.1)",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        corpus = load_corpus(args.input, args.max_count)
+        print(f"🚀 {len(corpus)} 个请求 x {args.repeat} 轮 -> {args.url} (并发 {args.concurrency})")
+        recorder = asyncio.run(
+            bench_run(
+                corpus, args.url, args.concurrency, args.timeout, args.retries, args.repeat,
+                {"mode": "closed-loop", "input": args.input, "label": args.label},
+            )
+        )
+        recorder.save(args.out)
+        print_summary(recorder.summary())
+        print(f"📄 结果已保存: {args.out}")
+    elif args.command == "replay":
+        if args.qps:
+            corpus = load_corpus(args.input, args.max_count)
+            schedule = qps_schedule(corpus, args.qps, args.count)
+            meta = {"mode": "open-loop-qps", "qps": args.qps}
+            print(f"🚀 固定 QPS 回放: {len(schedule)} 个请求 @ {args.qps}/s -> {args.url}")
+        else:
+            timeline = load_timeline(args.input, args.max_count)
+            schedule = timestamp_schedule(timeline, args.speed)
+            meta = {"mode": "timestamp-replay", "speed": args.speed}
+            span = schedule[-1][0] if schedule else 0
+            print(f"🚀 按日志时间回放: {len(schedule)} 个请求, 预计 {span:.1f}s (x{args.speed}) -> {args.url}")
+        recorder = asyncio.run(
+            replay_run(
+                schedule, args.url, args.concurrency, args.timeout, args.retries,
+                {**meta, "input": args.input, "label": args.label},
+            )
+        )
+        recorder.save(args.out)
+        print_summary(recorder.summary())
+        print(f"📄 结果已保存: {args.out}")
+    elif args.command == "capacity":
+        corpus = load_corpus(args.input, args.max_count)
+        controller = AimdController(
+            start=args.start,
+            max_concurrency=args.max_concurrency,
+            increase=args.increase,
+            decrease=args.decrease,
+            error_budget=args.error_budget,
+            latency_factor=args.latency_factor,
+            latency_slo=args.slo_ms / 1000 if args.slo_ms else None,
+        )
+        print(f"🚀 容量探测: {len(corpus)} 个请求语料, 窗口 {args.window}s -> {args.url}")
+        result = asyncio.run(
+            capacity_run(corpus, args.url, controller, args.window, args.steps, args.timeout, args.max_congestion)
+        )
+        print_capacity(result, controller)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"meta": {"mode": "capacity", "input": args.input, "api_url": args.url, "label": args.label},
+                     "history": controller.history, **result},
+                    f, ensure_ascii=False, indent=2,
+                )
+            print(f"📄 结果已保存: {args.out}")
+    elif args.command == "report":
+        print_summary(load_report(args.file)["summary"])
+    elif args.command == "diff":
+        rows = diff_reports(load_report(args.base), load_report(args.new), args.threshold)
+        print_diff(rows)
+        regressions = [r for r in rows if r[-1]]
+        if regressions:
+            print(f"❌ {len(regressions)} 项指标回退超过 {args.threshold:.0%}")
+            return 1
+        print("✅ 没有超过阈值的回退")
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
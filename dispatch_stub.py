@@ -0,0 +1,245 @@
+"""
+调度接口的本地模拟服务 (不依赖真实算法服务)
+
+模拟一个只有 --workers 个处理槽位的服务: 同时到达的请求超过槽位数时排队，
+处理耗时 = --base-ms + --per-station-ms * 站点数 (带 ±--jitter 抖动)，
+排队超过 --queue-limit 时返回 503，并按 --error-rate 随机返回 500、按 --drop-rate 直接断开连接。
+用于测试 dispatch_bench.py 的容量探测 / 回放逻辑以及批量脚本的吞吐。
+
+    python dispatch_stub.py --port 8000 --workers 4 --base-ms 50 --per-station-ms 0.5
+
+回放模式: 索引 rid_log_matcher 输出的 {rid}_req.json / {rid}_rsp.json (以及 N-req.json / N-rsp.json，或 --format packed 的打包存储)，
+按请求的规范化哈希返回录制的响应；--recorded-latency 时按 timeline.jsonl 中的线上耗时延迟返回
+
+    python dispatch_stub.py --replay-dir mylog_input/app_2026-01-21 --recorded-latency
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rid_log_matcher import TIMELINE_NAME
+from utils.packed_store import RidStore, is_packed
+from utils.synthetic_response import make_response
+
+
+# rid_log_matcher 输出 ({rid}_req.json) 和 batch_viz 输入 (N-req.json) 两种命名
+pair_pattern = re.compile(r"^(.+?)[_-](req|rsp)\.json$")
+
+
+def request_hash(req_data):
+    """请求的规范化哈希: 与字段顺序、缩进和空白无关"""
+    canonical = json.dumps(req_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def index_recordings(replay_dir):
+    """
+    递归索引目录中的 req/rsp 对，返回 (hash -> 响应, hash -> 线上耗时秒数)
+    同一目录下同名前缀的 _req/_rsp (或 -req/-rsp) 视为一对；没有响应的请求忽略
+    目录中有打包存储 (rids.sqlite) 时改为从存储读取
+    """
+    log_latency = {}
+    timeline = os.path.join(replay_dir, TIMELINE_NAME)
+    if os.path.exists(timeline):
+        with open(timeline, "r", encoding="utf-8") as f:
+            for line in f:
+                e = json.loads(line)
+                log_latency[e["rid"]] = e.get("log_latency")
+
+    responses = {}
+    latencies = {}
+    if is_packed(replay_dir):
+        # rid_log_matcher --format packed 的输出: 从索引取出有响应的记录
+        store = RidStore(replay_dir)
+        for record in store.query():
+            if record["rsp_offset"] is None:
+                continue
+            h = request_hash(store.load(record, "req"))
+            responses[h] = store.load(record, "rsp")
+            if log_latency.get(record["rid"]) is not None:
+                latencies[h] = log_latency[record["rid"]]
+        store.close()
+        return responses, latencies
+
+    for root, _, files in os.walk(replay_dir):
+        pairs = {}
+        for fname in files:
+            if m := pair_pattern.match(fname):
+                pairs.setdefault(m.group(1), {})[m.group(2)] = os.path.join(root, fname)
+        for key, pair in pairs.items():
+            if "req" not in pair or "rsp" not in pair:
+                continue
+            with open(pair["req"], "r", encoding="utf-8") as f:
+                h = request_hash(json.load(f))
+            with open(pair["rsp"], "r", encoding="utf-8") as f:
+                responses[h] = json.load(f)
+            if log_latency.get(key) is not None:
+                latencies[h] = log_latency[key]
+    return responses, latencies
+
+
+class StubConfig:
+    def __init__(
+        self,
+        workers=4,
+        base_ms=50.0,
+        per_station_ms=0.5,
+        jitter=0.1,
+        error_rate=0.0,
+        queue_limit=None,
+        drop_rate=0.0,
+        responses=None,
+        latencies=None,
+        latency_scale=None,
+        fallback="synthetic",
+    ):
+        self.base_ms = base_ms
+        self.per_station_ms = per_station_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.queue_limit = queue_limit
+        self.drop_rate = drop_rate
+        # 回放模式: 请求哈希 -> 录制的响应 / 线上耗时
+        self.responses = responses
+        self.latencies = latencies or {}
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self.slots = threading.Semaphore(workers)
+        self.waiting = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def service_time(self, req_data, req_hash=None):
+        """latency_scale 不为 None 且有录制耗时时使用录制耗时 (乘以缩放系数)，否则使用耗时模型"""
+        if self.latency_scale is not None and req_hash in self.latencies:
+            return self.latencies[req_hash] * self.latency_scale
+        n = len(req_data.get("stations") or [])
+        ms = self.base_ms + self.per_station_ms * n
+        return ms * (1 + random.uniform(-self.jitter, self.jitter)) / 1000
+
+    def lookup(self, req_data):
+        """返回 (请求哈希, 响应)；回放模式下未命中且 fallback 不是 synthetic 时响应为 None"""
+        if self.responses is None:
+            return None, make_response(req_data)
+        req_hash = request_hash(req_data)
+        rsp = self.responses.get(req_hash)
+        with self.lock:
+            if rsp is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if rsp is None and self.fallback == "synthetic":
+            rsp = make_response(req_data)
+        return req_hash, rsp
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    config = None
+
+    def _send(self, code, payload=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            req_data = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send(400, {"status": "Error", "message": "invalid json"})
+            return
+
+        cfg = self.config
+        req_hash, rsp = cfg.lookup(req_data)
+        if rsp is None:
+            self._send(404, {"status": "Error", "message": "no recorded response for this request"})
+            return
+
+        with cfg.lock:
+            if cfg.queue_limit is not None and cfg.waiting >= cfg.queue_limit:
+                overloaded = True
+            else:
+                overloaded = False
+                cfg.waiting += 1
+        if overloaded:
+            self._send(503, {"status": "Error", "message": "overloaded"})
+            return
+
+        with cfg.slots:
+            with cfg.lock:
+                cfg.waiting -= 1
+            time.sleep(cfg.service_time(req_data, req_hash))
+
+        if random.random() < cfg.drop_rate:
+            # 模拟连接被重置: 不返回任何响应直接关闭
+            self.close_connection = True
+            return
+        if random.random() < cfg.error_rate:
+            self._send(500, {"status": "Error", "message": "injected error"})
+            return
+        self._send(200, rsp)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host, port, config):
+    handler = type("Handler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="调度接口本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="同时处理的请求数 (服务容量)")
+    parser.add_argument("--base-ms", type=float, default=50.0, help="每个请求的基础处理耗时 (毫秒)")
+    parser.add_argument("--per-station-ms", type=float, default=0.5, help="每个站点增加的处理耗时 (毫秒)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="处理耗时的相对抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 的比例")
+    parser.add_argument("--queue-limit", type=int, default=None, help="排队请求数上限，超过时返回 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="不返回响应直接断开连接的比例")
+    parser.add_argument("--replay-dir", default=None, help="回放模式: 含 _req.json/_rsp.json 对的目录 (递归)")
+    parser.add_argument("--recorded-latency", action="store_true", help="回放模式下按 timeline.jsonl 中的线上耗时延迟返回")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="录制耗时的缩放系数 (配合 --recorded-latency)")
+    parser.add_argument("--miss", choices=("synthetic", "404"), default="404", help="回放模式下未录制的请求: 生成模拟响应或返回 404")
+    args = parser.parse_args()
+
+    responses, latencies = (None, {})
+    if args.replay_dir:
+        responses, latencies = index_recordings(args.replay_dir)
+        print(f"📼 已索引 {len(responses)} 个录制响应 ({len(latencies)} 个带线上耗时): {args.replay_dir}")
+
+    config = StubConfig(
+        args.workers,
+        args.base_ms,
+        args.per_station_ms,
+        args.jitter,
+        args.error_rate,
+        args.queue_limit,
+        args.drop_rate,
+        responses,
+        latencies,
+        args.latency_scale if args.recorded_latency else None,
+        args.miss,
+    )
+    server = serve(args.host, args.port, config)
+    print(f"🧪 模拟调度服务: http://{args.host}:{args.port}/ (workers={args.workers})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        if responses is not None:
+            print(f"\n命中 {config.hits}, 未命中 {config.misses}")
@@ -1,19 +1,117 @@
+import hashlib
 import json
+import os
 
 import folium
-from folium.plugins import AntPath, BeautifyIcon, Fullscreen
+from branca.element import Element, Figure, MacroElement
+from folium.map import Layer
+from folium.plugins import AntPath, BeautifyIcon, Fullscreen, MarkerCluster
+from folium.template import Template
 
-from utils.coord_transform import bd09_to_wgs84
+from utils.coord_transform import bd09_to_wgs84, bd09_to_wgs84_array
+from utils.station_catalog import station_fingerprint
 
 COLOR_PICKUP = "#52c41a"  # 绿色
 COLOR_DELIVERY = "#fa8c16"  # 橙色
 COLOR_DEPOT = "#d9534f"  # 红色
 COLOR_VEHICLE = "#0275d8"  # 蓝色
 
+# 弹窗渲染方式: inline 在 Python 中预渲染每个弹窗; lazy 只嵌入一份数据，点击时由 JS 生成
+POPUP_MODES = ("inline", "lazy")
+POPUP_JS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "static", "map_popup.js"
+)
+
+# 数据文件 (--data-only) 的通用查看页，与 map_popup.js 一起复制到输出目录
+MAP_VIEWER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "static", "map_viewer.html"
+)
+MAP_DATA_VERSION = 1
+# 数据文件中保留的字段 (static/map_popup.js 生成弹窗和查看页区分取货/送货用到的全部字段)
+DEPOT_FIELDS = ("station_name", "station_id", "area", "location")
+VEHICLE_FIELDS = ("vehicle_id", "vehicle_type", "current_load", "capacity", "work_hours", "vehicle_status")
+STATION_FIELDS = (
+    "station_name", "station_id", "location", "address", "area", "demands", "available_nums",
+    "locker_nums", "service_time", "priority", "demand_time", "longitude", "latitude",
+)
+
+# 站点标记方式: marker 逐个 DOM 标记; cluster 聚合; canvas 单个 canvas 图层;
+# auto 在站点数超过 large_threshold 时切换为 canvas
+MARKER_MODES = ("auto", "marker", "cluster", "canvas")
+LARGE_STATION_THRESHOLD = 1000
+
+
+def renderer_version():
+    """
+    渲染器版本: 本文件、弹窗 JS、coord_transform 或 folium 版本任一变化都会改变，
+    增量渲染 (utils/manifest.py) 据此判断旧的 HTML 是否需要重新生成
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1(folium.__version__.encode("utf-8"))
+    for path in (
+        os.path.abspath(__file__),
+        POPUP_JS_PATH,
+        os.path.join(here, "utils", "coord_transform.py"),
+    ):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def stations_to_wgs84(stations):
+    """批量转换站点坐标 (BD-09 -> WGS84)，返回与 stations 一一对应的 (lat, lon) 列表"""
+    first, second = bd09_to_wgs84_array(
+        [st["longitude"] for st in stations], [st["latitude"] for st in stations]
+    )
+    return list(zip(first.tolist(), second.tolist()))
+
+
+def resolve_stations(stations, catalog=None, render_popups=True):
+    """
+    返回与 stations 一一对应的 (wgs 坐标, 静态弹窗片段) 列表
+    传入 StationCatalog 时优先复用缓存，只对新增/变化的站点做坐标转换和渲染
+    render_popups=False 且没有 catalog 时只转换坐标，静态片段为 None
+    """
+    if catalog is None:
+        wgs_list = stations_to_wgs84(stations)
+        if not render_popups:
+            return [(wgs, None) for wgs in wgs_list]
+        return [
+            (wgs, MapTemplate.render_station_static(st))
+            for st, wgs in zip(stations, wgs_list)
+        ]
+
+    resolved = [None] * len(stations)
+    fingerprints = [station_fingerprint(st, MapTemplate.VERSION) for st in stations]
+    need_coords = []  # 坐标未缓存或已变化
+    stale_popup = []  # 坐标有效但属性/模板已变化
+    for i, st in enumerate(stations):
+        entry = catalog.get(st)
+        if entry is None:
+            need_coords.append(i)
+        elif entry["fingerprint"] != fingerprints[i]:
+            stale_popup.append((i, entry["wgs"]))
+        else:
+            resolved[i] = (entry["wgs"], entry["popup"])
+
+    updates = []
+    converted = stations_to_wgs84([stations[i] for i in need_coords])
+    for i, wgs in list(zip(need_coords, converted)) + stale_popup:
+        st = stations[i]
+        static = MapTemplate.render_station_static(st)
+        resolved[i] = (wgs, static)
+        updates.append((st, wgs, fingerprints[i], static))
+
+    catalog.put_many(updates)
+    return resolved
+
 
 class MapTemplate:
     """管理所有地图弹窗的 HTML/CSS 模板"""
 
+    # 修改模板输出时递增，StationCatalog 中缓存的弹窗片段会随之失效
+    VERSION = "1"
+
     @staticmethod
     def get_base_style():
         return """
@@ -30,10 +128,16 @@ class MapTemplate:
         </style>
         """
 
+    @classmethod
+    def add_style_to_map(cls, m):
+        """弹窗样式只在地图 <head> 中注入一次，各弹窗模板只输出结构"""
+        m.get_root().header.add_child(
+            folium.Element(cls.get_base_style()), name="map_popup_style"
+        )
+
     @classmethod
     def render_depot(cls, depot):
         return f"""
-        {cls.get_base_style()}
         <div class="map-popup">
             <div class="map-header"><h3 style="color: #d9534f;">🏠 仓库信息</h3></div>
             <div class="info-row"><span class="info-label">名称:</span><span class="info-value">{depot['station_name']}</span></div>
@@ -46,7 +150,6 @@ class MapTemplate:
     @classmethod
     def render_vehicle(cls, v):
         return f"""
-        {cls.get_base_style()}
         <div class="map-popup">
             <div class="map-header"><h3 style="color: #0275d8;">🚚 车辆信息</h3></div>
             <div class="info-row"><span class="info-label">车牌:</span><span class="info-value">{v['vehicle_id']}</span></div>
@@ -59,17 +162,16 @@ class MapTemplate:
         """
 
     @classmethod
-    def render_station(
-        cls, st, stop_info=None, unassigned_reason=None, new_demand=None
-    ):
-        """通用站点模板：支持基础地图、已指派路径图、未指派图"""
+    def render_station_static(cls, st):
+        """
+        站点弹窗中只依赖站点自身属性的部分 (可被 StationCatalog 缓存)
+        返回 (head, tail) 两段 HTML，"新需求" 行插在两段之间
+        """
         d_val = st.get("demands", 0)
         d_color = "#52c41a" if d_val >= 0 else "#fa8c16"
         icon = "📈" if d_val >= 0 else "📉"
 
-        # 基础 HTML 结构
-        html = f"""
-        {cls.get_base_style()}
+        head = f"""
         <div class="map-popup">
             <div class="map-header"><h3 style="color: {d_color};">{icon} {st.get('station_name', '未知站点')}</h3></div>
             <div class="info-row"><span class="info-label">ID:</span><span class="info-value">{st.get('station_id', 'N/A')}</span></div>
@@ -77,6 +179,27 @@ class MapTemplate:
             <div class="info-row"><span class="info-label">区域:</span><span class="info-value">{st.get('area', 'N/A')}</span></div>
             <div class="info-row"><span class="info-label">需求量:</span><span class="info-value" style="color:{d_color}">{d_val:+} 箱</span></div>
         """
+        tail = f"""
+            <div class="info-row"><span class="info-label">锁柜(空闲/总数):</span><span class="info-value">{st.get('available_nums', 0)}/{st.get('locker_nums', 0)}</span></div>
+            <div class="info-row"><span class="info-label">服务耗时:</span><span class="info-value">{st.get('service_time', 0)} min</span></div>
+            <div class="info-row"><span class="info-label">优先级:</span><span class="info-value">{st.get('priority', 0)}</span></div>
+            <div class="info-row"><span class="info-label">需求时间:</span><span class="info-value" style="font-size:11px;">{st.get('demand_time', 'N/A')}</span></div>
+            <div class="info-row"><span class="info-label">原始坐标:</span><span class="info-value">{st.get('longitude')}, {st.get('latitude')}</span></div>
+        """
+        return head, tail
+
+    @classmethod
+    def render_station(
+        cls, st, stop_info=None, unassigned_reason=None, new_demand=None, static=None
+    ):
+        """
+        通用站点模板：支持基础地图、已指派路径图、未指派图
+        static: 预先渲染好的 render_station_static(st) 结果 (来自 StationCatalog)
+        """
+        head, tail = static if static is not None else cls.render_station_static(st)
+
+        # 基础 HTML 结构
+        html = head
 
         # --- 新增：如果传了 new_demand，就显示出来 ---
         if new_demand is not None:
@@ -84,13 +207,7 @@ class MapTemplate:
             html += f"""<div class="info-row"><span class="info-label" style="color:#096dd9;">新需求:</span><span class="info-value" style="color:#096dd9; font-weight:bold;">{nd_text} 箱</span></div>"""
         # ----------------------------------------
 
-        html += f"""
-            <div class="info-row"><span class="info-label">锁柜(空闲/总数):</span><span class="info-value">{st.get('available_nums', 0)}/{st.get('locker_nums', 0)}</span></div>
-            <div class="info-row"><span class="info-label">服务耗时:</span><span class="info-value">{st.get('service_time', 0)} min</span></div>
-            <div class="info-row"><span class="info-label">优先级:</span><span class="info-value">{st.get('priority', 0)}</span></div>
-            <div class="info-row"><span class="info-label">需求时间:</span><span class="info-value" style="font-size:11px;">{st.get('demand_time', 'N/A')}</span></div>
-            <div class="info-row"><span class="info-label">原始坐标:</span><span class="info-value">{st.get('longitude')}, {st.get('latitude')}</span></div>
-        """
+        html += tail
 
         if stop_info:
             html += f"""
@@ -107,210 +224,718 @@ class MapTemplate:
         return html
 
 
-def create_visualization(data_file="data/req.json", output_file="input_map.html"):
+class PopupStore(MacroElement):
     """
-    [升级版] 创建基础物流分布图
-    风格已与 create_output_visualization 统一，使用 BeautifyIcon 和 图层控制
+    地图级弹窗数据仓库: 请求/响应数据以紧凑 JSON 只嵌入一次，
+    并在 <head> 中引入 static/map_popup.js，弹窗在点击时才由 MapPopup 生成
     """
-    with open(data_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # 1. 地图初始化
-    depot_wgs = bd09_to_wgs84(data["depot"]["longitude"], data["depot"]["latitude"])
-    m = folium.Map(location=depot_wgs, zoom_start=14, tiles="CartoDB positron")
-    Fullscreen().add_to(m)
+    _template = Template(
+        """
+        {% macro header(this, kwargs) %}
+            <script>{{ this.library }}</script>
+        {% endmacro %}
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = {{ this.data_json }};
+        {% endmacro %}
+        """
+    )
+    _library = None
+
+    def __init__(self, data):
+        super().__init__()
+        self._name = "PopupStore"
+        self.data = data
 
-    # 2. 定义图层 (FeatureGroup) - 模仿第二个函数的图层管理
-    layer_base = folium.FeatureGroup(name="🏢 基础设置 (仓库/车辆)", show=True)
-    layer_pickup = folium.FeatureGroup(name="🟩 取货需求点 (Pickup)", show=True)
-    layer_delivery = folium.FeatureGroup(name="🟧 送货需求点 (Delivery)", show=True)
+    @property
+    def library(self):
+        if PopupStore._library is None:
+            with open(POPUP_JS_PATH, "r", encoding="utf-8") as f:
+                PopupStore._library = f.read()
+        return PopupStore._library
 
-    # 将图层添加到地图
-    layer_base.add_to(m)
-    layer_pickup.add_to(m)
-    layer_delivery.add_to(m)
+    @property
+    def data_json(self):
+        text = json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+        # 避免数据中的 "</script>" 提前结束脚本块
+        return text.replace("</", "<\\/")
 
-    # 3. 绘制仓库 (加入基础图层)
-    folium.Marker(
-        depot_wgs,
-        popup=folium.Popup(MapTemplate.render_depot(data["depot"]), max_width=350),
-        icon=folium.Icon(color="red", icon="home", prefix="fa"),
-    ).add_to(layer_base)
 
-    # 4. 绘制车辆 (加入基础图层)
-    vehicle_wgs = bd09_to_wgs84(
-        data["vehicle"]["longitude"], data["vehicle"]["latitude"]
+class LazyPopup(MacroElement):
+    """挂在 marker 下，只输出一行 bindPopup，弹窗内容在打开时生成"""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            {{ this._parent.get_name() }}.bindPopup(function () {
+                return MapPopup.render({{ this.store.get_name() }}, {{ this.ref_json }});
+            }, {"maxWidth": 350});
+        {% endmacro %}
+        """
     )
-    folium.Marker(
-        vehicle_wgs,
-        popup=folium.Popup(MapTemplate.render_vehicle(data["vehicle"]), max_width=350),
-        icon=folium.Icon(color="blue", icon="truck", prefix="fa"),
-    ).add_to(layer_base)
 
-    # 5. 绘制站点 - 使用 BeautifyIcon 替代 CircleMarker
-    for st in data["stations"]:
-        st_wgs = bd09_to_wgs84(st["longitude"], st["latitude"])
-        popup_content = MapTemplate.render_station(st)
+    def __init__(self, store, ref):
+        super().__init__()
+        self._name = "LazyPopup"
+        self.store = store
+        self.ref_json = json.dumps(list(ref), ensure_ascii=False)
 
-        # 判断类型
-        is_pickup = st["demands"] >= 0
-        color = COLOR_PICKUP if is_pickup else COLOR_DELIVERY
-        target_layer = layer_pickup if is_pickup else layer_delivery
 
-        # 使用与 output_map 相同风格的图标，但 icon 改为 'cube' 表示货物
-        icon = BeautifyIcon(
-            icon="cube",  # 盒子图标，表示这是一个任务点
-            icon_shape="circle",  # 圆形底座
-            background_color=color,
-            text_color="white",
-            border_color="white",
-            prefix="fa",  # FontAwesome
-        )
+class PopupBinder:
+    """
+    按 popup_mode 给 marker 绑定弹窗
+      inline: 调用 render() 生成 HTML，包进 folium.Popup
+      lazy:   只记录 ref，数据统一放在 PopupStore 中
+    store 结构: {"depot", "vehicle", "stations", "stops": [...], "unassigned": [...]}
+    stops / unassigned 中的 "station" 是 stations 列表的下标
+    """
 
-        folium.Marker(
-            location=st_wgs, popup=folium.Popup(popup_content, max_width=350), icon=icon
-        ).add_to(target_layer)
+    def __init__(self, m, popup_mode, req_data):
+        if popup_mode not in POPUP_MODES:
+            raise ValueError(f"未知的 popup_mode: {popup_mode}，可选 {POPUP_MODES}")
+        self.lazy = popup_mode == "lazy"
+        self.store = None
+        if self.lazy:
+            self.store = PopupStore(
+                {
+                    "depot": req_data["depot"],
+                    "vehicle": req_data["vehicle"],
+                    "stations": req_data["stations"],
+                    "stops": [],
+                    "unassigned": [],
+                }
+            )
+            self.store.add_to(m)
+
+    def bind(self, marker, ref, render):
+        if self.lazy:
+            marker.add_child(LazyPopup(self.store, ref))
+        else:
+            marker.add_child(folium.Popup(render(), max_width=350))
+        return marker
+
+    def payload(self, ref, render):
+        """CanvasPointLayer 使用: lazy 返回引用，inline 返回 HTML 字符串"""
+        return list(ref) if self.lazy else render()
+
+    def add_stop(self, station_index, stop_info, new_demand):
+        """登记一个已指派站点，返回 ("stop", k) 引用"""
+        if not self.lazy:
+            return None
+        stops = self.store.data["stops"]
+        stops.append({"station": station_index, **stop_info, "demand": new_demand})
+        return ("stop", len(stops) - 1)
+
+    def add_unassigned(self, station_index, reason):
+        """登记一个未指派站点，返回 ("unassigned", k) 引用"""
+        if not self.lazy:
+            return None
+        unassigned = self.store.data["unassigned"]
+        unassigned.append({"station": station_index, "reason": reason})
+        return ("unassigned", len(unassigned) - 1)
+
+
+def resolve_marker_mode(marker_mode, n_stations, large_threshold=LARGE_STATION_THRESHOLD):
+    if marker_mode not in MARKER_MODES:
+        raise ValueError(f"未知的 marker_mode: {marker_mode}，可选 {MARKER_MODES}")
+    if marker_mode == "auto":
+        return "canvas" if n_stations > large_threshold else "marker"
+    return marker_mode
+
+
+def task_icon(color):
+    """输入地图中的任务点图标 (与 output_map 风格一致，icon 为 'cube' 表示货物)"""
+    return BeautifyIcon(
+        icon="cube",  # 盒子图标，表示这是一个任务点
+        icon_shape="circle",  # 圆形底座
+        background_color=color,
+        text_color="white",
+        border_color="white",
+        prefix="fa",  # FontAwesome
+    )
 
-    # 6. 添加图层控制器
-    folium.LayerControl(collapsed=False).add_to(m)
 
-    m.save(output_file)
-    print(f"✅ 基础分布地图已生成 (样式已统一): {output_file}")
+class CanvasPointLayer(Layer):
+    """
+    大规模站点图层: 所有点以一个 JSON 数组嵌入页面，由一段 JS 在同一个 canvas 上
+    批量生成 L.circleMarker，避免上千个 DOM 标记和 folium 元素
+    每个点为 [lat, lon, color, popup]，popup 是 HTML 字符串 (inline) 或 MapPopup 引用 (lazy)
+    """
 
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup();
+            (function (layer, points) {
+                var renderer = L.canvas({padding: 0.5});
+                var style = {{ this.style|tojson }};
+                function lazy(ref) {
+                    return function () { return MapPopup.render({{ this.store_name }}, ref); };
+                }
+                for (var i = 0; i < points.length; i++) {
+                    var p = points[i];
+                    var options = Object.assign({renderer: renderer}, style);
+                    options[{{ this.color_option|tojson }}] = p[2];
+                    var marker = L.circleMarker([p[0], p[1]], options).addTo(layer);
+                    if (typeof p[3] === "string") {
+                        marker.bindPopup(p[3], {maxWidth: 350});
+                    } else if (p[3]) {
+                        marker.bindPopup(lazy(p[3]), {maxWidth: 350});
+                    }
+                }
+            })({{ this.get_name() }}, {{ this.points_json }});
+        {% endmacro %}
+        """
+    )
 
-def create_output_visualization(
-    req_file="data/req.json",
-    response_file="data/response.json",
-    output_file="output_map.html",
-):
-    with open(req_file, "r", encoding="utf-8") as f:
-        req_data = json.load(f)
-    with open(response_file, "r", encoding="utf-8") as f:
-        response_data = json.load(f)
-
-    # 地图初始化
-    depot_wgs = bd09_to_wgs84(
-        req_data["depot"]["longitude"], req_data["depot"]["latitude"]
+    def __init__(self, name, style, color_option, store=None, show=True):
+        super().__init__(name=name, overlay=True, control=True, show=show)
+        self._name = "CanvasPointLayer"
+        self.style = style
+        self.color_option = color_option
+        self.store = store
+        self.points = []
+
+    @property
+    def store_name(self):
+        return self.store.get_name() if self.store is not None else "null"
+
+    @property
+    def points_json(self):
+        text = json.dumps(self.points, ensure_ascii=False, separators=(",", ":"))
+        return text.replace("</", "<\\/")
+
+
+class StationLayer:
+    """
+    一组可在图层控制器中切换的站点，按 marker_mode 选择绘制方式
+      marker:  FeatureGroup + 逐个 Marker / CircleMarker (原有行为)
+      cluster: MarkerCluster 聚合图层，放大后展开为原样式的标记
+      canvas:  CanvasPointLayer，整组站点只生成一个 JS 数组
+    icon_factory(color) 给出 marker/cluster 模式下的图标；为 None 时画成圆点
+    """
+
+    def __init__(self, m, name, mode, popups, icon_factory=None, show=True):
+        self.mode = mode
+        self.popups = popups
+        self.icon_factory = icon_factory
+        if mode == "canvas":
+            if icon_factory is not None:
+                style = {"radius": 6, "color": "white", "weight": 1.5, "fill": True, "fillOpacity": 0.9}
+                color_option = "fillColor"
+            else:
+                style = {"radius": 7, "fill": True}
+                color_option = "color"
+            self.layer = CanvasPointLayer(name, style, color_option, popups.store, show=show)
+        elif mode == "cluster":
+            self.layer = MarkerCluster(name=name, show=show)
+        else:
+            self.layer = folium.FeatureGroup(name=name, show=show)
+        self.layer.add_to(m)
+
+    def add(self, location, color, ref, render):
+        if self.mode == "canvas":
+            self.layer.points.append(
+                [location[0], location[1], color, self.popups.payload(ref, render)]
+            )
+            return
+        if self.icon_factory is not None:
+            marker = folium.Marker(location=location, icon=self.icon_factory(color))
+        elif self.mode == "cluster":
+            # 聚合插件只接受 Marker，圆点改用同色的 circle-dot 图标
+            marker = folium.Marker(
+                location=location,
+                icon=BeautifyIcon(icon_shape="circle-dot", border_color=color, border_width=7),
+            )
+        else:
+            marker = folium.CircleMarker(location=location, radius=7, fill=True, color=color)
+        marker.add_to(self.layer)
+        self.popups.bind(marker, ref, render)
+
+
+def add_render_args(parser):
+    """命令行脚本共用的渲染参数"""
+    parser.add_argument(
+        "--popup-mode", choices=POPUP_MODES, default="inline",
+        help="弹窗渲染方式 (lazy: 数据只嵌入一次，点击时由浏览器生成)",
+    )
+    parser.add_argument(
+        "--marker-mode", choices=MARKER_MODES, default="auto",
+        help="站点标记方式 (auto: 超过 --large-threshold 个站点时使用 canvas)",
+    )
+    parser.add_argument(
+        "--large-threshold", type=int, default=LARGE_STATION_THRESHOLD,
+        help="auto 模式下切换为 canvas 的站点数阈值",
     )
-    m = folium.Map(location=depot_wgs, zoom_start=14, tiles="CartoDB positron")
-    Fullscreen().add_to(m)
 
-    # 图层定义
-    assigned_group = folium.FeatureGroup(name="✅ 已指派路线").add_to(m)
-    reason_colors = {
-        "为优化总成本而被放弃 (惩罚项生效)": "#dc3545",
-        "预剪枝: 需求为零的站点": "#fd7e14",
-        "预剪枝: 未启用储车区": "#6f42c1",
-        "引擎内部删除 / 未返回": "#000000",
-        "other": "#6c757d",
-    }
-    unassigned_layers = {
-        r: folium.FeatureGroup(name=f"❌ 未指派 - {r}").add_to(m) for r in reason_colors
+
+def render_options(args):
+    """把 add_render_args 解析出的参数转换为可视化函数的关键字参数"""
+    return {
+        "popup_mode": args.popup_mode,
+        "marker_mode": args.marker_mode,
+        "large_threshold": args.large_threshold,
     }
 
-    # 2. 绘制车辆起步点
-    vehicle_wgs = bd09_to_wgs84(
-        req_data["vehicle"]["longitude"], req_data["vehicle"]["latitude"]
+
+def load_json(src):
+    """src 可以是 JSON 文件路径，也可以是已经加载好的 dict"""
+    if isinstance(src, dict):
+        return src
+    with open(src, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def normalize_response(response_data):
+    """部分日志中的响应没有外层 {"data": ...}，统一补上"""
+    if "data" not in response_data:
+        return {"data": response_data}
+    return response_data
+
+
+class PreparedRequest:
+    """
+    一次请求的共享预计算状态: 请求只读取一次、坐标只转换一次，
+    输入地图、结果地图和合并地图都从这里取数据
+    """
+
+    def __init__(
+        self,
+        req_data,
+        catalog=None,
+        popup_mode="inline",
+        marker_mode="auto",
+        large_threshold=LARGE_STATION_THRESHOLD,
+    ):
+        self.data = req_data
+        self.popup_mode = popup_mode
+        self.mode = resolve_marker_mode(marker_mode, len(req_data["stations"]), large_threshold)
+        self.depot_wgs = bd09_to_wgs84(
+            req_data["depot"]["longitude"], req_data["depot"]["latitude"]
+        )
+        self.vehicle_wgs = bd09_to_wgs84(
+            req_data["vehicle"]["longitude"], req_data["vehicle"]["latitude"]
+        )
+        stations = req_data["stations"]
+        # 一次性批量转换所有站点坐标 (有 catalog 时直接复用缓存)
+        self.resolved = resolve_stations(
+            stations, catalog, render_popups=popup_mode != "lazy"
+        )
+        self.station_map = {s["station_id"]: s for s in stations}
+        self.station_index = {s["station_id"]: i for i, s in enumerate(stations)}
+        self.resolved_map = {s["station_id"]: r for s, r in zip(stations, self.resolved)}
+
+    def new_map(self):
+        """地图初始化，返回 (map, PopupBinder)"""
+        m = folium.Map(location=self.depot_wgs, zoom_start=14, tiles="CartoDB positron")
+        Fullscreen().add_to(m)
+        MapTemplate.add_style_to_map(m)
+        return m, PopupBinder(m, self.popup_mode, self.data)
+
+
+def draw_input_layers(m, popups, prep, name_prefix="", show=True):
+    """
+    基础物流分布图层: 仓库/车辆、取货需求点、送货需求点
+    合并地图中以 name_prefix 区分，并可默认隐藏 (show=False)
+    """
+    data = prep.data
+
+    # 定义图层 (FeatureGroup) - 模仿结果地图的图层管理
+    layer_base = folium.FeatureGroup(name=f"{name_prefix}🏢 基础设置 (仓库/车辆)", show=show)
+    layer_base.add_to(m)
+    layer_pickup = StationLayer(
+        m, f"{name_prefix}🟩 取货需求点 (Pickup)", prep.mode, popups, task_icon, show=show
     )
-    folium.Marker(
-        vehicle_wgs,
-        popup=folium.Popup(
-            MapTemplate.render_vehicle(req_data["vehicle"]), max_width=350
-        ),
+    layer_delivery = StationLayer(
+        m, f"{name_prefix}🟧 送货需求点 (Delivery)", prep.mode, popups, task_icon, show=show
+    )
+
+    # 绘制仓库 (加入基础图层)
+    depot_marker = folium.Marker(
+        prep.depot_wgs,
+        icon=folium.Icon(color="red", icon="home", prefix="fa"),
+    ).add_to(layer_base)
+    popups.bind(depot_marker, ("depot",), lambda: MapTemplate.render_depot(data["depot"]))
+
+    # 绘制车辆 (加入基础图层)
+    vehicle_marker = folium.Marker(
+        prep.vehicle_wgs,
         icon=folium.Icon(color="blue", icon="truck", prefix="fa"),
-    ).add_to(assigned_group)
+    ).add_to(layer_base)
+    popups.bind(
+        vehicle_marker, ("vehicle",), lambda: MapTemplate.render_vehicle(data["vehicle"])
+    )
 
-    # 3. 准备数据映射
-    station_map = {s["station_id"]: s for s in req_data["stations"]}
+    # 绘制站点 - 使用 BeautifyIcon 替代 CircleMarker
+    for i, (st, (st_wgs, static)) in enumerate(zip(data["stations"], prep.resolved)):
+        # 判断类型
+        is_pickup = st["demands"] >= 0
+        color = COLOR_PICKUP if is_pickup else COLOR_DELIVERY
+        target_layer = layer_pickup if is_pickup else layer_delivery
+
+        target_layer.add(
+            st_wgs,
+            color,
+            ("station", i),
+            lambda st=st, static=static: MapTemplate.render_station(st, static=static),
+        )
+
+
+# 未指派站点按原因分图层 (顺序即图层控制器中的顺序)，不在表中的原因归入 other
+REASON_COLORS = {
+    "为优化总成本而被放弃 (惩罚项生效)": "#dc3545",
+    "预剪枝: 需求为零的站点": "#fd7e14",
+    "预剪枝: 未启用储车区": "#6f42c1",
+    "引擎内部删除 / 未返回": "#000000",
+    "other": "#6c757d",
+}
+MISSING_REASON = "引擎内部删除 / 未返回"
+
+
+def plan_output(prep, response_data):
+    """
+    结果地图的内容 (folium 地图和数据文件共用):
+      stops:      [(station_id, stop_info, new_demand)]，按路线顺序编号，只包含请求中存在的站点
+      unassigned: 未指派任务列表，补回了响应中缺失的站点 (不修改调用方传入的响应)
+    """
+    data = response_data["data"]
+    station_map = prep.station_map
 
     # --- 数据补全：找出被引擎内部删除或未返回的站点 ---
+    routes = data.get("routes", [])
+    unassigned_tasks = list(data.get("unassigned_tasks", []))
     handled_sids = set()
     # 统计已指派的
-    for route in response_data.get("data", {}).get("routes", []):
+    for route in routes:
         for stop in route.get("stops", []):
             handled_sids.add(stop["location_id"])
     # 统计已在未指派列表中的
-    for un in response_data.get("data", {}).get("unassigned_tasks", []):
+    for un in unassigned_tasks:
         handled_sids.add(un["location_id"])
 
     # 找出缺失的站点并补回
-    missing_reason = "引擎内部删除 / 未返回"
     for sid in station_map:
         if sid not in handled_sids:
-            if "unassigned_tasks" not in response_data["data"]:
-                response_data["data"]["unassigned_tasks"] = []
-            response_data["data"]["unassigned_tasks"].append(
-                {"location_id": sid, "reason": missing_reason}
-            )
+            unassigned_tasks.append({"location_id": sid, "reason": MISSING_REASON})
     # ----------------------------------------------
 
-    route_coords = [vehicle_wgs]
-
-    # 4. 绘制已指派站点
+    stops = []
     stop_idx = 1
-    for route in response_data["data"]["routes"]:
+    for route in routes:
         for stop in route["stops"]:
             sid = stop["location_id"]
             if sid in station_map:
-                st = station_map[sid]
-                st_wgs = bd09_to_wgs84(st["longitude"], st["latitude"])
-                route_coords.append(st_wgs)
-
-                # 使用模板渲染 Popup
-                popup_content = MapTemplate.render_station(
-                    st,
-                    stop_info={
-                        "index": stop_idx,
-                        "arrival_time": stop["arrival_time"],
-                        "load_after_service": stop["load_after_service"],
-                    },
-                    new_demand=stop.get("demand", 0),
-                )
-
-                # 绘制 Marker
-                folium.Marker(
-                    location=st_wgs,
-                    popup=folium.Popup(popup_content, max_width=350),
-                    icon=BeautifyIcon(
-                        icon_shape="circle",
-                        number=stop_idx,
-                        background_color="#52c41a" if st["demands"] >= 0 else "#fa8c16",
-                        text_color="white",
-                        border_color="white",
-                    ),
-                ).add_to(assigned_group)
+                stop_info = {
+                    "index": stop_idx,
+                    "arrival_time": stop["arrival_time"],
+                    "load_after_service": stop["load_after_service"],
+                }
+                stops.append((sid, stop_info, stop.get("demand", 0)))
                 stop_idx += 1
 
-    # 5. 绘制动态路径
+    unassigned = [un for un in unassigned_tasks if un["location_id"] in station_map]
+    return stops, unassigned
+
+
+def draw_output_layers(m, popups, prep, response_data):
+    """路径规划结果图层: 已指派路线 + 按原因分组的未指派站点"""
+    station_map = prep.station_map
+
+    # 图层定义
+    assigned_group = folium.FeatureGroup(name="✅ 已指派路线").add_to(m)
+    unassigned_layers = {
+        r: StationLayer(m, f"❌ 未指派 - {r}", prep.mode, popups) for r in REASON_COLORS
+    }
+
+    # 绘制车辆起步点
+    vehicle_marker = folium.Marker(
+        prep.vehicle_wgs,
+        icon=folium.Icon(color="blue", icon="truck", prefix="fa"),
+    ).add_to(assigned_group)
+    popups.bind(
+        vehicle_marker,
+        ("vehicle",),
+        lambda: MapTemplate.render_vehicle(prep.data["vehicle"]),
+    )
+
+    stops, unassigned_tasks = plan_output(prep, response_data)
+    route_coords = [prep.vehicle_wgs]
+
+    # 绘制已指派站点
+    for sid, stop_info, new_demand in stops:
+        st = station_map[sid]
+        st_wgs, static = prep.resolved_map[sid]
+        route_coords.append(st_wgs)
+
+        # 绘制 Marker
+        marker = folium.Marker(
+            location=st_wgs,
+            icon=BeautifyIcon(
+                icon_shape="circle",
+                number=stop_info["index"],
+                background_color="#52c41a" if st["demands"] >= 0 else "#fa8c16",
+                text_color="white",
+                border_color="white",
+            ),
+        ).add_to(assigned_group)
+
+        # 使用模板渲染 Popup
+        def render_stop(st=st, info=stop_info, nd=new_demand, static=static):
+            return MapTemplate.render_station(
+                st, stop_info=info, new_demand=nd, static=static
+            )
+
+        popups.bind(
+            marker,
+            popups.add_stop(prep.station_index[sid], stop_info, new_demand),
+            render_stop,
+        )
+
+    # 绘制动态路径
     if len(route_coords) > 1:
         AntPath(locations=route_coords, delay=1000, color="#007bff", weight=5).add_to(
             assigned_group
         )
 
-    # 6. 绘制未指派站点
-    for un in response_data["data"]["unassigned_tasks"]:
+    # 绘制未指派站点
+    for un in unassigned_tasks:
         sid = un["location_id"]
-        if sid in station_map:
-            st = station_map[sid]
-            st_wgs = bd09_to_wgs84(st["longitude"], st["latitude"])
-            reason = un.get("reason", "other")
-            target_group = unassigned_layers.get(reason, unassigned_layers["other"])
-
-            popup_content = MapTemplate.render_station(
-                st, unassigned_reason=un["reason"]
-            )
+        st = station_map[sid]
+        st_wgs, static = prep.resolved_map[sid]
+        reason = un.get("reason", "other")
+        target_group = unassigned_layers.get(reason, unassigned_layers["other"])
+
+        target_group.add(
+            st_wgs,
+            REASON_COLORS.get(reason, "#6c757d"),
+            popups.add_unassigned(prep.station_index[sid], un["reason"]),
+            lambda st=st, un=un, static=static: MapTemplate.render_station(
+                st, unassigned_reason=un["reason"], static=static
+            ),
+        )
 
-            folium.CircleMarker(
-                location=st_wgs,
-                radius=7,
-                fill=True,
-                color=reason_colors.get(reason, "#6c757d"),
-                popup=folium.Popup(popup_content, max_width=350),
-            ).add_to(target_group)
 
+def _walk_elements(root):
+    """按深度优先顺序遍历元素树 (包含 Popup 等元素挂在 header/html/script 上的内容)"""
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        yield element
+        children = []
+        if not isinstance(element, Figure):
+            for attr in ("header", "html", "script"):
+                sub = getattr(element, attr, None)
+                if isinstance(sub, Element):
+                    children.append(sub)
+        children.extend(element._children.values())
+        stack.extend(reversed(children))
+
+
+def stabilize_ids(m):
+    """
+    folium 默认用随机 uuid 作为元素 id (会出现在生成的 JS 变量名中)，
+    保存前按元素树的遍历顺序重新编号，使同样的输入总是生成完全相同的 HTML
+    """
+    elements = list(_walk_elements(m.get_root()))
+    old_names = {id(el): el.get_name() for el in elements}
+    for i, element in enumerate(elements):
+        element._id = f"{i:032x}"
+    # _children 以添加时的 get_name() 为键，部分模板 (如 Popup) 会直接输出这个键；
+    # 显式指定的键 (如 Figure 的 "header") 保持不变
+    for element in elements:
+        element._children = type(element._children)(
+            (child.get_name() if key == old_names[id(child)] else key, child)
+            for key, child in element._children.items()
+        )
+
+
+def save_map(m, output_file):
     folium.LayerControl(collapsed=False).add_to(m)
+    stabilize_ids(m)
     m.save(output_file)
-    print(f"✨ 可视化地图已生成: {output_file}")
+
+
+def write_input_map(prep, output_file, verbose=True):
+    m, popups = prep.new_map()
+    draw_input_layers(m, popups, prep)
+    save_map(m, output_file)
+    if verbose:
+        print(f"✅ 基础分布地图已生成 (样式已统一): {output_file}")
+
+
+def write_output_map(prep, response_data, output_file, verbose=True):
+    m, popups = prep.new_map()
+    draw_output_layers(m, popups, prep, normalize_response(response_data))
+    save_map(m, output_file)
+    if verbose:
+        print(f"✨ 可视化地图已生成: {output_file}")
+
+
+def write_combined_map(prep, response_data, output_file, verbose=True):
+    """
+    合并地图: 结果图层默认显示，输入视图作为一组默认隐藏、可在图层控制器中切换的图层
+    没有响应时只包含输入视图 (默认显示)
+    """
+    m, popups = prep.new_map()
+    if response_data is not None:
+        draw_output_layers(m, popups, prep, normalize_response(response_data))
+        draw_input_layers(m, popups, prep, name_prefix="📥 输入 - ", show=False)
+    else:
+        draw_input_layers(m, popups, prep)
+    save_map(m, output_file)
+    if verbose:
+        print(f"🗺️ 合并地图已生成: {output_file}")
+
+
+def _pick(d, fields):
+    return {k: d[k] for k in fields if k in d}
+
+
+def _latlon(wgs):
+    # 7 位小数约 1 厘米
+    return [round(wgs[0], 7), round(wgs[1], 7)]
+
+
+def build_map_data(prep, response_data=None):
+    """
+    数据文件的内容: 弹窗数据 (结构与 PopupStore 相同，map_popup.js 直接使用，只保留弹窗用到的字段)、
+    WGS84 坐标，以及结果视图的已指派顺序 / 未指派原因 (由 plan_output 计算，与 folium 地图一致)
+    response_data 为 None 时只有输入视图
+    """
+    data = prep.data
+    out = {
+        "version": MAP_DATA_VERSION,
+        "mode": prep.mode,
+        "has_response": response_data is not None,
+        "depot": _pick(data["depot"], DEPOT_FIELDS),
+        "vehicle": _pick(data["vehicle"], VEHICLE_FIELDS),
+        "stations": [_pick(st, STATION_FIELDS) for st in data["stations"]],
+        "wgs": {
+            "depot": _latlon(prep.depot_wgs),
+            "vehicle": _latlon(prep.vehicle_wgs),
+            "stations": [_latlon(wgs) for wgs, _ in prep.resolved],
+        },
+        "stops": [],
+        "unassigned": [],
+        "reasons": [[r, c] for r, c in REASON_COLORS.items()],
+    }
+    if response_data is not None:
+        stops, unassigned = plan_output(prep, normalize_response(response_data))
+        out["stops"] = [
+            {"station": prep.station_index[sid], **stop_info, "demand": new_demand}
+            for sid, stop_info, new_demand in stops
+        ]
+        out["unassigned"] = [
+            {"station": prep.station_index[un["location_id"]], "reason": un["reason"]}
+            for un in unassigned
+        ]
+    return out
+
+
+def write_map_data(prep, response_data, output_file, verbose=True):
+    """
+    只写数据文件 (*.map.json)，由 static/map_viewer.html 在浏览器中绘制输入/结果/合并视图，
+    不生成 folium HTML (体积和耗时都只有完整地图的一小部分)
+    """
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(build_map_data(prep, response_data), f, ensure_ascii=False, separators=(",", ":"))
+    if verbose:
+        print(f"🗂️ 地图数据已生成: {output_file}")
+
+
+def install_viewer(directory):
+    """把查看页和弹窗 JS 复制到 directory (内容相同时跳过)，返回查看页路径"""
+    os.makedirs(directory, exist_ok=True)
+    for src in (MAP_VIEWER_PATH, POPUP_JS_PATH):
+        dst = os.path.join(directory, os.path.basename(src))
+        with open(src, "rb") as f:
+            content = f.read()
+        if os.path.exists(dst):
+            with open(dst, "rb") as f:
+                if f.read() == content:
+                    continue
+        with open(dst, "wb") as f:
+            f.write(content)
+    return os.path.join(directory, os.path.basename(MAP_VIEWER_PATH))
+
+
+def render_request(
+    req_file,
+    response_file=None,
+    input_file=None,
+    output_file=None,
+    combined_file=None,
+    catalog=None,
+    verbose=True,
+    data_file=None,
+    **render_opts,
+):
+    """
+    单次读取请求，基于同一份预计算状态生成全部产物:
+      input_file    - 输入地图 (等价于 create_visualization)
+      output_file   - 结果地图 (等价于 create_output_visualization，需要响应)
+      combined_file - 合并地图 (输入视图为一组可切换的图层)
+      data_file     - 只含数据的 *.map.json，用 static/map_viewer.html 查看
+    req_file / response_file 可以是路径或已加载的 dict；响应缺少外层 "data" 时自动补齐
+    verbose: 为 False 时不打印生成信息 (多进程批量渲染时由调用方统一汇报进度)
+    render_opts: popup_mode / marker_mode / large_threshold
+    """
+    if data_file and not (input_file or output_file or combined_file):
+        # 只写数据文件时弹窗由查看页生成，不需要预渲染
+        render_opts = {**render_opts, "popup_mode": "lazy"}
+    prep = PreparedRequest(load_json(req_file), catalog=catalog, **render_opts)
+    response_data = load_json(response_file) if response_file is not None else None
+
+    if input_file:
+        write_input_map(prep, input_file, verbose)
+    if output_file and response_data is not None:
+        write_output_map(prep, response_data, output_file, verbose)
+    if combined_file:
+        write_combined_map(prep, response_data, combined_file, verbose)
+    if data_file:
+        write_map_data(prep, response_data, data_file, verbose)
+    return prep
+
+
+def create_visualization(
+    data_file="data/req.json",
+    output_file="input_map.html",
+    catalog=None,
+    popup_mode="inline",
+    marker_mode="auto",
+    large_threshold=LARGE_STATION_THRESHOLD,
+):
+    """
+    [升级版] 创建基础物流分布图
+    风格已与 create_output_visualization 统一，使用 BeautifyIcon 和 图层控制
+    catalog: 可选的 StationCatalog，用于复用站点坐标和弹窗片段
+    popup_mode: "inline" 预渲染弹窗 / "lazy" 点击时在浏览器中生成弹窗
+    marker_mode: 站点标记方式 (见 MARKER_MODES)，auto 时超过 large_threshold 个站点改用 canvas
+    """
+    prep = PreparedRequest(
+        load_json(data_file), catalog, popup_mode, marker_mode, large_threshold
+    )
+    write_input_map(prep, output_file)
+
+
+def create_output_visualization(
+    req_file="data/req.json",
+    response_file="data/response.json",
+    output_file="output_map.html",
+    catalog=None,
+    popup_mode="inline",
+    marker_mode="auto",
+    large_threshold=LARGE_STATION_THRESHOLD,
+):
+    """
+    创建路径规划结果地图
+    catalog / popup_mode / marker_mode 的含义同 create_visualization
+    marker_mode 只影响未指派站点，已指派路线上的编号标记始终逐个绘制
+    """
+    prep = PreparedRequest(
+        load_json(req_file), catalog, popup_mode, marker_mode, large_threshold
+    )
+    write_output_map(prep, load_json(response_file), output_file)
 
 
 if __name__ == "__main__":
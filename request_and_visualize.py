@@ -1,11 +1,17 @@
 import json
 import os
+import time
 import requests
 import argparse
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
 # 导入main.py中的可视化函数
-from main import create_visualization, create_output_visualization
+from main import PreparedRequest, add_render_args, install_viewer, load_json, render_options, renderer_version, write_combined_map, write_input_map, write_map_data, write_output_map
+from utils.latency_report import LatencyRecorder, print_summary
+from utils.manifest import MANIFEST_NAME, RenderManifest
+from utils.packed_store import INDEX_NAME, RidStore, is_packed, read_record
+from utils.station_catalog import DEFAULT_CATALOG_PATH, StationCatalog
 
 # 默认配置
 DEFAULT_INPUT_DIR = "./mylog_input/app_2026-01-21"
@@ -30,6 +36,17 @@ def send_request(input_data, api_url):
 
 # 获取所有的rid
 def get_all_rids(input_dir):
+    if is_packed(input_dir):
+        # rid_log_matcher --format packed 的输出: 从索引读取，record 中记录数据偏移
+        store = RidStore(input_dir)
+        records = store.query()
+        store.close()
+        rids = [
+            {"rid": r["rid"], "sub_dir": input_dir, "status": r["status"], "vehicle_id": r["vehicle_id"], "record": r}
+            for r in records
+        ]
+        return sorted(rids, key=lambda x: x["rid"])
+
     rids = []
     # 递归遍历目录结构，处理按 车辆ID/状态 分类的文件
     # 结构: input_dir / {vehicle_id} / {status} / {rid}_req.json
@@ -51,19 +68,43 @@ def get_all_rids(input_dir):
                     })
     return sorted(rids, key=lambda x: x["rid"])
 
+def item_source(item, kind="req"):
+    """
+    rid 的原始请求 (req) / 响应 (rsp) 来源，不存在时返回 None
+      - 目录格式: 文件路径
+      - 打包格式: (索引路径#vehicle_id/status/rid_kind, 内容 sha1)，用作增量清单的输入
+    """
+    record = item.get("record")
+    if record is None:
+        path = os.path.join(item["sub_dir"], f"{item['rid']}_{kind}.json")
+        return path if os.path.exists(path) else None
+    if record[f"{kind}_offset"] is None:
+        return None
+    name = f"{os.path.join(item['sub_dir'], INDEX_NAME)}#{item['vehicle_id']}/{item['status']}/{item['rid']}_{kind}"
+    return name, record[f"{kind}_sha1"]
+
+
+def load_item(item, kind="req"):
+    """读取 rid 的原始请求 (req) 或响应 (rsp)"""
+    record = item.get("record")
+    if record is None:
+        return load_json(os.path.join(item["sub_dir"], f"{item['rid']}_{kind}.json"))
+    return read_record(item["sub_dir"], record, kind)
+
+
 # 处理单个请求
-def process_one_request(item, log_new_rsp_dir, api_url):
+def process_one_request(item, log_new_rsp_dir, api_url, recorder=None):
     rid = item["rid"]
-    sub_dir = item["sub_dir"]
-    req_file = os.path.join(sub_dir, f"{rid}_req.json")
-    if not os.path.exists(req_file):
+    if item_source(item, "req") is None:
         return False
     
-    with open(req_file, "r", encoding="utf-8") as f:
-        req_data = json.load(f)
+    req_data = load_item(item, "req")
     
     print(f"正在请求 API [RID: {rid}]...")
+    start = time.perf_counter()
     new_rsp = send_request(req_data, api_url)
+    if recorder is not None:
+        recorder.add(rid, req_data, time.perf_counter() - start, new_rsp is not None, status=item["status"])
     
     if new_rsp:
         # 保持 vehicle_id 和 status 层级
@@ -77,7 +118,7 @@ def process_one_request(item, log_new_rsp_dir, api_url):
     return False
 
 # 1. 请求所有输入
-def request_all(input_dir, output_dir, api_url, max_count):
+def request_all(input_dir, output_dir, api_url, max_count, bench_out=None):
     log_name = os.path.basename(os.path.normpath(input_dir))
     log_new_rsp_dir = os.path.join(output_dir, log_name)
     ensure_dir(log_new_rsp_dir)
@@ -86,18 +127,28 @@ def request_all(input_dir, output_dir, api_url, max_count):
     items_to_process = all_items[:max_count]
     
     print(f"开始请求 API，日志: {log_name}, 数量: {len(items_to_process)}")
+    recorder = LatencyRecorder({"mode": "threads", "api_url": api_url, "input": input_dir, "concurrency": 5})
     
     with ThreadPoolExecutor(max_workers=5) as executor:
         futures = [
-            executor.submit(process_one_request, item, log_new_rsp_dir, api_url)
+            executor.submit(process_one_request, item, log_new_rsp_dir, api_url, recorder)
             for item in items_to_process
         ]
     
     results = [future.result() for future in futures]
     print(f"完成! 成功: {sum(results)}, 失败: {len(results) - sum(results)}")
 
+    # 接口耗时统计 (按站点数、车辆分组)
+    recorder.stop()
+    if recorder.records:
+        print_summary(recorder.summary())
+    if bench_out:
+        recorder.save(bench_out)
+        print(f"耗时记录已保存: {bench_out}")
+
 # 2. 可视化原始输入输出
-def visualize_original(input_dir, viz_dir, max_count):
+def visualize_original(input_dir, viz_dir, max_count, catalog=None, render_opts=None, combined=False,
+                       incremental=False, prune=False, data_only=False):
     log_name = os.path.basename(os.path.normpath(input_dir))
     log_viz_dir = os.path.join(viz_dir, log_name)
     ensure_dir(log_viz_dir)
@@ -106,80 +157,129 @@ def visualize_original(input_dir, viz_dir, max_count):
     items_to_visualize = all_items[:max_count]
     
     print(f"正在生成原始可视化，日志: {log_name}")
-    
-    for item in items_to_visualize:
-        rid = item["rid"]
-        sub_dir = item["sub_dir"]
-        status = item["status"]
-        vehicle_id = item["vehicle_id"]
-        
-        # 保持目录层级: viz_dir/log_name/vehicle_id/status/
-        vehicle_status_viz_dir = os.path.join(log_viz_dir, vehicle_id, status)
-        ensure_dir(vehicle_status_viz_dir)
-        
-        req_file = os.path.join(sub_dir, f"{rid}_req.json")
-        rsp_file = os.path.join(sub_dir, f"{rid}_rsp.json")
-        
-        if not os.path.exists(req_file):
+    if data_only:
+        # 只写数据文件，弹窗由查看页在浏览器中生成
+        render_opts = {**(render_opts or {}), "popup_mode": "lazy"}
+        viewer = install_viewer(log_viz_dir)
+        print(f"查看页: {viewer}?data=<vehicle_id>/<status>/<rid>.map.json (在 {log_viz_dir} 下运行 python -m http.server)")
+
+    # 增量模式: 清单记录每个 rid 的输入内容摘要、渲染器版本和参数，未变化的直接跳过
+    manifest = None
+    options = {**(render_opts or {}), "combined": combined, "data_only": data_only}
+    if incremental or prune:
+        manifest = RenderManifest(os.path.join(log_viz_dir, MANIFEST_NAME), renderer_version())
+    plans = [plan_original(item, log_viz_dir, combined, data_only) for item in items_to_visualize]
+    plans = [p for p in plans if p is not None]
+    if prune:
+        # 以全部 rid 为准 (不受 max_count 限制)，只删除输入确实已不存在的输出
+        live = [plan_original(item, log_viz_dir, combined, data_only) for item in all_items]
+        for path in manifest.prune({p["key"]: p["outputs"] for p in live if p is not None}):
+            print(f"🧹 已删除过期输出: {path}")
+    skipped = 0
+
+    for plan in plans:
+        if incremental and manifest.is_fresh(plan["key"], plan["inputs"], plan["outputs"], options):
+            skipped += 1
             continue
+        outputs = render_original(plan, catalog, render_opts, combined, data_only)
+        if manifest is not None:
+            manifest.record(plan["key"], plan["inputs"], outputs, options)
+
+    if manifest is not None:
+        manifest.save()
+    if incremental:
+        print(f"♻️ 增量模式: 跳过 {skipped}/{len(plans)} 个未变化的 rid")
+
+
+def plan_original(item, log_viz_dir, combined=False, data_only=False):
+    """确定单个 rid 的输入和应生成的输出文件，请求不存在时返回 None"""
+    rid = item["rid"]
+    status = item["status"]
+    vehicle_id = item["vehicle_id"]
+
+    # 保持目录层级: viz_dir/log_name/vehicle_id/status/
+    vehicle_status_viz_dir = os.path.join(log_viz_dir, vehicle_id, status)
+
+    req_source = item_source(item, "req")
+    if req_source is None:
+        return None
 
+    # 只有 normal, empty, error 状态可能存在原始响应
+    rsp_source = item_source(item, "rsp") if status in ["normal", "empty", "error"] else None
+
+    if data_only:
+        outputs = [os.path.join(vehicle_status_viz_dir, f"{rid}.map.json")]
+    elif combined:
+        outputs = [os.path.join(vehicle_status_viz_dir, f"{rid}_combined.html")]
+    else:
         # 可视化输入 (所有状态都有输入)
-        create_visualization(req_file, os.path.join(vehicle_status_viz_dir, f"{rid}_input.html"))
-        
-        # 只有 normal, empty, error 状态可能存在原始响应
-        if status in ["normal", "empty", "error"] and os.path.exists(rsp_file):
-            # 处理输出响应格式
-            with open(rsp_file, "r", encoding="utf-8") as f:
-                try:
-                    rsp_data = json.load(f)
-                except:
-                    continue
-            
-            output_html = os.path.join(vehicle_status_viz_dir, f"{rid}_output.html")
-            if "data" not in rsp_data:
-                temp_rsp = os.path.join(vehicle_status_viz_dir, f"temp_{rid}.json")
-                with open(temp_rsp, "w", encoding="utf-8") as f:
-                    json.dump({"data": rsp_data}, f)
-                create_output_visualization(req_file, temp_rsp, output_html)
-                os.remove(temp_rsp)
-            else:
-                create_output_visualization(req_file, rsp_file, output_html)
+        outputs = [os.path.join(vehicle_status_viz_dir, f"{rid}_input.html")]
+        if rsp_source:
+            outputs.append(os.path.join(vehicle_status_viz_dir, f"{rid}_output.html"))
+
+    return {
+        "item": item,
+        # 增量清单的键: 目录格式为请求文件相对清单目录 (log_viz_dir) 的路径，打包存储为记录名
+        "key": os.path.relpath(req_source, log_viz_dir) if isinstance(req_source, str) else req_source[0],
+        "has_rsp": rsp_source is not None,
+        "viz_dir": vehicle_status_viz_dir,
+        "inputs": [req_source, rsp_source],
+        "outputs": outputs,
+    }
+
+
+def render_original(plan, catalog=None, render_opts=None, combined=False, data_only=False):
+    """按 plan_original 的结果生成地图，返回实际生成的文件列表"""
+    ensure_dir(plan["viz_dir"])
+
+    # 请求只读取、转换一次，输入/输出地图共用
+    prep = PreparedRequest(load_item(plan["item"], "req"), catalog, **(render_opts or {}))
+
+    rsp_data = None
+    if plan["has_rsp"]:
+        try:
+            rsp_data = load_item(plan["item"], "rsp")
+        except Exception:
+            rsp_data = None
+
+    if data_only:
+        write_map_data(prep, rsp_data, plan["outputs"][0])
+        return plan["outputs"]
+    if combined:
+        write_combined_map(prep, rsp_data, plan["outputs"][0])
+        return plan["outputs"]
+
+    write_input_map(prep, plan["outputs"][0])
+    # 响应缺少外层 "data" 时由 write_output_map 自动补齐
+    if rsp_data is not None:
+        write_output_map(prep, rsp_data, plan["outputs"][1])
+        return plan["outputs"]
+    return plan["outputs"][:1]
+
 
 # 3. 可视化新旧对比
-def visualize_compare_one(item, log_new_rsp_base, log_viz_base):
+def visualize_compare_one(item, log_new_rsp_base, log_viz_base, catalog=None, render_opts=None):
     rid = item["rid"]
-    sub_dir = item["sub_dir"]
     status = item["status"]
     vehicle_id = item["vehicle_id"]
     
     vehicle_status_viz_dir = os.path.join(log_viz_base, vehicle_id, status)
     ensure_dir(vehicle_status_viz_dir)
     
-    req_file = os.path.join(sub_dir, f"{rid}_req.json")
-    orig_rsp_file = os.path.join(sub_dir, f"{rid}_rsp.json")
     # 这里的 new_rsp_file 路径也要对应上新的 vehicle_id/status 层级
     new_rsp_file = os.path.join(log_new_rsp_base, vehicle_id, status, f"{rid}_new_rsp.json")
     
-    if not all(os.path.exists(f) for f in [req_file, orig_rsp_file, new_rsp_file]):
+    if item_source(item, "req") is None or item_source(item, "rsp") is None or not os.path.exists(new_rsp_file):
         return False
 
-    # 生成 Original 和 New 的 HTML
-    for suffix, rsp_f in [("original", orig_rsp_file), ("new", new_rsp_file)]:
+    # 生成 Original 和 New 的 HTML (请求只读取、转换一次)
+    prep = PreparedRequest(load_item(item, "req"), catalog, **(render_opts or {}))
+    for suffix, rsp_data in [("original", load_item(item, "rsp")), ("new", load_json(new_rsp_file))]:
         out_html = os.path.join(vehicle_status_viz_dir, f"{rid}_{suffix}_output.html")
-        with open(rsp_f, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        if "data" not in data:
-            temp = os.path.join(vehicle_status_viz_dir, f"temp_{rid}_{suffix}.json")
-            with open(temp, "w", encoding="utf-8") as f:
-                json.dump({"data": data}, f)
-            create_output_visualization(req_file, temp, out_html)
-            os.remove(temp)
-        else:
-            create_output_visualization(req_file, rsp_f, out_html)
+        write_output_map(prep, rsp_data, out_html)
     return True
 
-def visualize_compare_all(input_dir, new_output_dir, viz_dir, max_count):
+def visualize_compare_all(input_dir, new_output_dir, viz_dir, max_count, catalog=None, render_opts=None):
     log_name = os.path.basename(os.path.normpath(input_dir))
     log_viz_base = os.path.join(viz_dir, log_name)
     log_new_rsp_base = os.path.join(new_output_dir, log_name)
@@ -191,7 +291,7 @@ def visualize_compare_all(input_dir, new_output_dir, viz_dir, max_count):
     
     with ThreadPoolExecutor(max_workers=5) as executor:
         futures = [
-            executor.submit(visualize_compare_one, item, log_new_rsp_base, log_viz_base)
+            executor.submit(visualize_compare_one, item, log_new_rsp_base, log_viz_base, catalog, render_opts)
             for item in items_to_viz
         ]
     
@@ -207,30 +307,48 @@ if __name__ == "__main__":
         p.add_argument("--input-dir", default=DEFAULT_INPUT_DIR)
         p.add_argument("--max-count", type=int, default=DEFAULT_MAX_COUNT)
 
+    # 可视化命令共用: 站点坐标/弹窗缓存、渲染方式
+    def add_viz_args(p):
+        p.add_argument("--catalog", default=DEFAULT_CATALOG_PATH)
+        p.add_argument("--no-catalog", action="store_true")
+        add_render_args(p)
+
     # request
     req_p = subparsers.add_parser("request")
     add_common_args(req_p)
     req_p.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
     req_p.add_argument("--api-url", default=DEFAULT_API_URL)
+    req_p.add_argument("--bench-out", default=None, help="保存每个请求的接口耗时 (JSON，可用 dispatch_bench.py diff 对比)")
 
     # visualize-original
     viz_orig_p = subparsers.add_parser("visualize-original")
     add_common_args(viz_orig_p)
     viz_orig_p.add_argument("--viz-dir", default="./mylog_output")
+    viz_orig_p.add_argument("--combined", action="store_true", help="输入/输出合并为一张地图")
+    viz_orig_p.add_argument("--incremental", action="store_true", help="跳过输入和渲染器都未变化的 rid")
+    viz_orig_p.add_argument("--prune", action="store_true", help="删除输入已不存在的旧地图")
+    viz_orig_p.add_argument("--data-only", action="store_true",
+                            help="每个 rid 只写一个 <rid>.map.json，用 <viz-dir>/<日志名>/map_viewer.html 查看")
+    add_viz_args(viz_orig_p)
 
     # visualize-compare
     viz_comp_p = subparsers.add_parser("visualize-compare")
     add_common_args(viz_comp_p)
     viz_comp_p.add_argument("--new-output-dir", default=DEFAULT_OUTPUT_DIR)
     viz_comp_p.add_argument("--viz-dir", default="./mylog_output/visualization/compare")
+    add_viz_args(viz_comp_p)
 
     args = parser.parse_args()
     
     if args.command == "request":
-        request_all(args.input_dir, args.output_dir, args.api_url, args.max_count)
+        request_all(args.input_dir, args.output_dir, args.api_url, args.max_count, args.bench_out)
     elif args.command == "visualize-original":
-        visualize_original(args.input_dir, args.viz_dir, args.max_count)
+        with (nullcontext() if args.no_catalog else StationCatalog(args.catalog)) as catalog:
+            visualize_original(args.input_dir, args.viz_dir, args.max_count, catalog, render_options(args),
+                               args.combined, args.incremental, args.prune, args.data_only)
     elif args.command == "visualize-compare":
-        visualize_compare_all(args.input_dir, args.new_output_dir, args.viz_dir, args.max_count)
+        with (nullcontext() if args.no_catalog else StationCatalog(args.catalog)) as catalog:
+            visualize_compare_all(args.input_dir, args.new_output_dir, args.viz_dir, args.max_count, catalog,
+                                  render_options(args))
     else:
         parser.print_help()
\ No newline at end of file
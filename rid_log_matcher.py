@@ -1,72 +1,121 @@
 import json
 import os
 import re
+import sys
+import time
+import signal
 import argparse
 from collections import defaultdict
+from datetime import datetime
+from itertools import chain
 
-# 解析命令行参数
-parser = argparse.ArgumentParser(description='匹配日志中的请求和响应，并按vehicle_id分类保存')
-parser.add_argument('log_file', type=str, help='日志文件名，必须位于mylog_input目录下')
-args = parser.parse_args()
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
-# 构建完整的日志文件路径
-log_file_name = args.log_file
-log_file_path = os.path.join('./mylog_input', log_file_name)
+from utils.batch_pool import default_workers, run_tasks
+from utils.json_keys import request_keys
+from utils.log_follow import LogFollower
+from utils.log_input import compression_suffix, expand_log_paths, iter_log_lines, log_stem
+from utils.packed_store import RidStore, reset_store
+from utils.pending_spill import PendingSpill
 
-# 验证日志文件是否存在且在mylog_input目录下
-if not os.path.exists(log_file_path):
-    print(f"错误: 日志文件 {log_file_path} 不存在")
-    exit(1)
+# 调度日志行的标记 (先用子串预筛，只有包含标记的行才做进一步解析)
+REQ_MARKER = "接收到调度请求详情"
+RSP_MARKER = "调度算法输出详情"
+MARKERS = (REQ_MARKER, RSP_MARKER)
 
-# 确保日志文件确实在mylog_input目录下
-abs_log_path = os.path.abspath(log_file_path)
-abs_mylog_dir = os.path.abspath('./mylog_input')
-if not abs_log_path.startswith(abs_mylog_dir):
-    print(f"错误: 日志文件必须位于mylog_input目录下")
-    exit(1)
+# 正则表达式 (完整匹配规则，快速路径无法确定时回退使用)
+req_pattern = r"rid=([a-f0-9\-]+).*?接收到调度请求详情[\s:]+(\{.*)"
+rsp_pattern = r"rid=([a-f0-9\-]+).*?调度算法输出详情[\s:]+(\{.*)"
+req_regex = re.compile(req_pattern)
+rsp_regex = re.compile(rsp_pattern)
+rid_regex = re.compile(r"rid=([a-f0-9\-]+)")
+# 行首的日志时间戳，如 "2026-01-21 10:23:45.123" / "[2026-01-21T10:23:45,123]"
+ts_pattern = re.compile(r"^\W{0,3}(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:[.,](\d{1,6}))?")
 
-# 设置输出目录
-base_dir = os.path.dirname(log_file_path)
-log_name = os.path.splitext(os.path.basename(log_file_path))[0]
-output_dir = os.path.join(base_dir, log_name)
+# 请求时间线 (回放用): 每个保存下来的 rid 一行
+TIMELINE_NAME = "timeline.jsonl"
 
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+# 并行模式下每个分块的大小 (MB)
+DEFAULT_CHUNK_MB = 64
 
-# 正则表达式
-req_pattern = r"rid=([a-f0-9\-]+).*?接收到调度请求详情[\s:]+(\{.*)"
-rsp_pattern = r"rid=([a-f0-9\-]+).*?调度算法输出详情[\s:]+(\{.*)"
+# 跟踪模式 (--follow): 检查点文件 (输出目录中)、轮询间隔、请求等待响应的最长日志时间、检查点最短间隔 (秒)
+CHECKPOINT_NAME = ".follow_checkpoint.json"
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_UNMATCHED_AFTER = 3600.0
+CHECKPOINT_INTERVAL = 5.0
 
-def find_key_recursive(data, key):
-    """
-    深度优先搜索：在嵌套字典或列表中查找指定的 key
-    """
-    if isinstance(data, dict):
-        if key in data:
-            return data[key]
-        for v in data.values():
-            result = find_key_recursive(v, key)
-            if result is not None:
-                return result
-    elif isinstance(data, list):
-        for item in data:
-            result = find_key_recursive(item, key)
-            if result is not None:
-                return result
+# 分隔标记与 JSON 的字符，与正则中的 [\s:]+ 一致
+_SEPARATORS = frozenset(" \t\n\r\f\v:")
+
+def parse_log_time(line):
+    """解析行首时间戳为 epoch 秒，没有时间戳时返回 None"""
+    m = ts_pattern.match(line)
+    if not m:
+        return None
+    date, clock, frac = m.groups()
+    ts = datetime.strptime(f"{date} {clock}", "%Y-%m-%d %H:%M:%S").timestamp()
+    if frac:
+        ts += int(frac) / 10 ** len(frac)
+    return ts
+
+def _fast_match(line, marker):
+    """
+    快速路径: 第一个标记之前有 rid=，标记后紧跟 [\\s:]+ 和 "{"
+    返回 (rid, 第一个 rid 的位置, JSON 起始位置)；结构不符合时返回 None，由调用方回退到正则
+    """
+    m = line.find(marker)
+    rid_match = rid_regex.search(line, 0, m)
+    if rid_match is None:
+        return None
+    j = m + len(marker)
+    k = j
+    n = len(line)
+    while k < n and line[k] in _SEPARATORS:
+        k += 1
+    if k == j or k >= n or line[k] != "{":
+        return None
+    return rid_match.group(1), k
+
+def scan_line(line):
+    """
+    识别一行日志，与原来逐行执行 req_pattern / rsp_pattern 的结果完全一致:
+      ("req", rid, 请求 JSON 文本) / ("rsp", rid, 响应 JSON 文本) / None
+    不包含标记的行只做一次子串查找
+    """
+    if REQ_MARKER in line:
+        fast = _fast_match(line, REQ_MARKER)
+        if fast is not None or req_regex.search(line):
+            # rid 取整行第一个 rid=，内容取第一个标记之后的文本 (与原实现一致)
+            rid = fast[0] if fast is not None else rid_regex.search(line).group(1)
+            content = line.split(REQ_MARKER, 1)[1].strip()
+            if content.startswith(":") or content.startswith("："):
+                content = content[1:].strip()
+            return "req", rid, content
+
+    if RSP_MARKER in line:
+        fast = _fast_match(line, RSP_MARKER)
+        if fast is not None:
+            rid, k = fast
+            return "rsp", rid, line[k:].split("\n", 1)[0].strip()
+        rsp_match = rsp_regex.search(line)
+        if rsp_match:
+            rid, rsp_json_str = rsp_match.groups()
+            return "rsp", rid, rsp_json_str.strip()
     return None
 
-def extract_logs():
-    pending_requests = {} # rid -> {"content": str, "v_id": str, "d_type": int, "p_type": int}
-    stats = {
-        "total_req_found": 0,
-        "success_pairs": 0,        
-        "ignored_by_filter": 0,    
-        "failed_json": 0,
-        "empty_routes": 0,
-        "algorithm_error": 0
-    }
-    combination_counts = defaultdict(int)
-    vehicle_stats = defaultdict(lambda: {
+def peak_rss_mb():
+    """当前进程的峰值常驻内存 (MB)，不支持的平台返回 None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def new_vehicle_stats():
+    return {
         "total_req": 0,
         "target_req": 0,
         "normal": 0,
@@ -75,126 +124,639 @@ def extract_logs():
         "unmatched": 0,
         "filtered": 0,
         "failed_json": 0
-    })
-
-    with open(log_file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            # 1. 匹配请求行
-            req_match = re.search(req_pattern, line)
-            if req_match:
-                req_id_match = re.search(r"rid=([a-f0-9\-]+)", line)
-                if req_id_match:
-                    rid = req_id_match.group(1)
-                    req_content = line.split("接收到调度请求详情", 1)[1].strip()
-                    if req_content.startswith(":") or req_content.startswith("："):
-                        req_content = req_content[1:].strip()
-                    
-                    v_id = "unknown"
-                    d_type = None
-                    p_type = None
-                    try:
-                        req_data = json.loads(req_content)
-                        v_id = find_key_recursive(req_data, "vehicle_id") or "unknown"
-                        d_type = find_key_recursive(req_data, "decision_type")
-                        p_type = find_key_recursive(req_data, "plan_type")
-                    except:
-                        pass
-                    
-                    pending_requests[rid] = {
-                        "content": req_content,
-                        "v_id": v_id,
-                        "d_type": d_type,
-                        "p_type": p_type
-                    }
-                    vehicle_stats[v_id]["total_req"] += 1
-                    stats["total_req_found"] += 1
-                continue
-
-            # 2. 匹配响应行
-            rsp_match = re.search(rsp_pattern, line)
-            if rsp_match:
-                rid, rsp_json_str = rsp_match.groups()
-
-                if rid in pending_requests:
-                    req_info = pending_requests[rid]
-                    v_id = req_info["v_id"]
-                    d_type = req_info["d_type"]
-                    p_type = req_info["p_type"]
-                    
-                    combination_counts[(d_type, p_type)] += 1
-                    
-                    try:
-                        req_data = json.loads(req_info["content"])
-                        rsp_data = json.loads(rsp_json_str.strip())
-                        
-                        # 过滤逻辑 (1,0)
-                        if d_type == 1 and p_type == 0:
-                            vehicle_stats[v_id]["target_req"] += 1
-                            # 判断健康度
-                            if rsp_data.get("status") != "Success":
-                                status_label = "error"
-                                stats["algorithm_error"] += 1
-                                vehicle_stats[v_id]["error"] += 1
-                            else:
-                                routes = rsp_data.get("data", {}).get("routes", []) if "data" in rsp_data else rsp_data.get("routes", [])
-                                if not routes:
-                                    status_label = "empty"
-                                    stats["empty_routes"] += 1
-                                    vehicle_stats[v_id]["empty"] += 1
-                                else:
-                                    status_label = "normal"
-                                    stats["success_pairs"] += 1
-                                    vehicle_stats[v_id]["normal"] += 1
-                            
-                            save_to_file(rid, req_data, "req", v_id, status_label)
-                            save_to_file(rid, rsp_data, "rsp", v_id, status_label)
-                        else:
-                            stats["ignored_by_filter"] += 1
-                            vehicle_stats[v_id]["filtered"] += 1
-                            
-                    except json.JSONDecodeError:
-                        stats["failed_json"] += 1
-                        vehicle_stats[v_id]["failed_json"] += 1
-                    
-                    del pending_requests[rid]
-
-    # 处理只有请求没有响应的情况 (unmatched)
-    for rid, req_info in pending_requests.items():
+    }
+
+class RidMatcher:
+    """
+    按 rid 配对请求和响应，统计并保存 (1,0) 目标请求
+
+    feed(line) 逐行输入；finish() 处理只有请求没有响应的 rid 并写出 timeline.jsonl
+    每个请求在到达时只解析一次 JSON，解析结果保存在 pending 中，响应到达时直接使用
+    write_files=False 时只统计不写文件 (用于基准测试)
+
+    待配对表的内存上限:
+      - pending_ttl: 日志时间超过该秒数仍未收到响应的请求移出内存
+      - max_pending: 内存中最多保留的请求数，超出时移出最早的请求
+    移出的请求写入磁盘 (PendingSpill)，之后到达的响应仍能从磁盘取回配对，
+    文件结束时与内存中剩余的请求一起按 unmatched 处理，因此统计结果与不设上限时一致
+
+    store_format: "dir" 每个请求/响应一个 JSON 文件 (vehicle_id/status/rid_req.json)；
+    "packed" 写入 output_dir 下的打包存储 (utils.packed_store.RidStore)，seq 决定重复 rid 的覆盖顺序
+    """
+
+    def __init__(self, output_dir, write_files=True, pending_ttl=None, max_pending=None, store_format="dir",
+                 segment="main"):
+        self.output_dir = output_dir
+        self.write_files = write_files
+        self.store_format = store_format
+        self.segment = segment
+        self.store = None
+        # 分块子进程不写索引，由主进程合并时写入
+        self.index_store = True
+        self.seq_base = 0
+        self._seq = 0
+        self.chunks_done = 0
+        # rid -> {"data": dict|None, "ok": bool, "v_id": str, "d_type": int, "p_type": int, "ts": float}
+        # 按到达顺序排列 (重复的 rid 会移到末尾)，淘汰时从头部开始
+        self.pending = {}
+        self.pending_ttl = pending_ttl
+        self.max_pending = max_pending
+        self.spill = PendingSpill(output_dir if write_files else None)
+        self.log_time = None
+        self.peak_pending = 0
+        self.evictions = 0
+        self.late_responses = 0
+        self.spilled_unmatched = 0
+        self.timeline = []
+        self.stats = {
+            "total_req_found": 0,
+            "success_pairs": 0,
+            "ignored_by_filter": 0,
+            "failed_json": 0,
+            "empty_routes": 0,
+            "algorithm_error": 0
+        }
+        self.combination_counts = defaultdict(int)
+        self.vehicle_stats = defaultdict(new_vehicle_stats)
+        self.unmatched_total = 0
+
+    def feed(self, line):
+        event = scan_line(line)
+        if event is None:
+            return
+        kind, rid, text = event
+        if kind == "req":
+            self.add_request(rid, text, parse_log_time(line))
+        else:
+            self.add_response(rid, text, parse_log_time(line))
+
+    def add_request(self, rid, content, ts):
+        v_id = "unknown"
+        d_type = None
+        p_type = None
+        req_data = None
+        ok = False
+        try:
+            req_data = json.loads(content)
+            ok = True
+            # 一次遍历取出三个字段 (结果与分别调用 find_key_recursive 相同)
+            v_id, d_type, p_type = request_keys(req_data)
+            v_id = v_id or "unknown"
+        except Exception:
+            pass
+
+        self.discard(rid)
+        self.pending[rid] = {
+            "data": req_data,
+            "ok": ok,
+            "v_id": v_id,
+            "d_type": d_type,
+            "p_type": p_type,
+            "ts": ts
+        }
+        self.vehicle_stats[v_id]["total_req"] += 1
+        self.stats["total_req_found"] += 1
+
+        if ts is not None:
+            self.log_time = ts
+        self.evict()
+
+    def discard(self, rid):
+        """丢弃 rid 的待配对请求 (被同 rid 的新请求覆盖)"""
+        if self.pending.pop(rid, None) is None:
+            self.spill.discard(rid)
+
+    def evict(self):
+        """把超过 pending_ttl 或超出 max_pending 的最早请求移到磁盘"""
+        pending = self.pending
+        self.peak_pending = max(self.peak_pending, len(pending))
+        if self.pending_ttl is None and self.max_pending is None:
+            return
+        cutoff = self.log_time - self.pending_ttl if self.pending_ttl is not None and self.log_time is not None else None
+        while pending:
+            rid = next(iter(pending))
+            req_ts = pending[rid]["ts"]
+            expired = cutoff is not None and req_ts is not None and req_ts < cutoff
+            if not expired and (self.max_pending is None or len(pending) <= self.max_pending):
+                break
+            self.spill.put(rid, pending.pop(rid))
+            self.evictions += 1
+
+    def take_pending(self, rid):
+        req_info = self.pending.pop(rid, None)
+        if req_info is None and rid in self.spill:
+            req_info = self.spill.pop(rid)
+            self.late_responses += 1
+        return req_info
+
+    def add_response(self, rid, rsp_json_str, ts):
+        req_info = self.take_pending(rid)
+        if req_info is None:
+            return
+        stats = self.stats
+        vehicle_stats = self.vehicle_stats
         v_id = req_info["v_id"]
         d_type = req_info["d_type"]
         p_type = req_info["p_type"]
-        
+
+        self.combination_counts[(d_type, p_type)] += 1
+
+        try:
+            if not req_info["ok"]:
+                raise json.JSONDecodeError("request is not valid JSON", "", 0)
+            req_data = req_info["data"]
+            rsp_data = json.loads(rsp_json_str)
+
+            # 过滤逻辑 (1,0)
+            if d_type == 1 and p_type == 0:
+                vehicle_stats[v_id]["target_req"] += 1
+                # 判断健康度
+                if rsp_data.get("status") != "Success":
+                    status_label = "error"
+                    stats["algorithm_error"] += 1
+                    vehicle_stats[v_id]["error"] += 1
+                else:
+                    routes = rsp_data.get("data", {}).get("routes", []) if "data" in rsp_data else rsp_data.get("routes", [])
+                    if not routes:
+                        status_label = "empty"
+                        stats["empty_routes"] += 1
+                        vehicle_stats[v_id]["empty"] += 1
+                    else:
+                        status_label = "normal"
+                        stats["success_pairs"] += 1
+                        vehicle_stats[v_id]["normal"] += 1
+
+                self.save(rid, req_info, rsp_data, v_id, status_label, ts)
+                self.timeline.append(timeline_entry(rid, req_info, v_id, status_label, ts))
+            else:
+                stats["ignored_by_filter"] += 1
+                vehicle_stats[v_id]["filtered"] += 1
+
+        except json.JSONDecodeError:
+            stats["failed_json"] += 1
+            vehicle_stats[v_id]["failed_json"] += 1
+
+    def add_unmatched(self, rid, req_info):
+        """只有请求没有响应的 rid: (1,0) 目标请求按 unmatched 保存"""
+        v_id = req_info["v_id"]
+        d_type = req_info["d_type"]
+        p_type = req_info["p_type"]
+
         if d_type == 1 and p_type == 0:
-            vehicle_stats[v_id]["target_req"] += 1
-            vehicle_stats[v_id]["unmatched"] += 1
-            try:
-                req_data = json.loads(req_info["content"])
-                save_to_file(rid, req_data, "req", v_id, "unmatched")
-            except:
-                pass
+            self.vehicle_stats[v_id]["target_req"] += 1
+            self.vehicle_stats[v_id]["unmatched"] += 1
+            self.save(rid, req_info, None, v_id, "unmatched")
+            self.timeline.append(timeline_entry(rid, req_info, v_id, "unmatched", None))
         else:
             # 非目标请求的丢失，通常不关心，但也计入 filtered
-            vehicle_stats[v_id]["filtered"] += 1
+            self.vehicle_stats[v_id]["filtered"] += 1
+
+    def expire_unmatched(self, max_age):
+        """
+        跟踪模式: 日志时间超过 max_age 秒仍没有响应的请求不再等待，按 unmatched 处理
+        (文件没有结束，finish 不会被调用)；没有时间戳的请求一直保留，返回处理的条数
+        """
+        if self.log_time is None:
+            return 0
+        cutoff = self.log_time - max_age
+        expired = []
+        # 磁盘和内存中的请求都按到达顺序排列，遇到第一个未过期的即可停止
+        for rid, req_info in self.spill.items():
+            if req_info["ts"] is not None and req_info["ts"] >= cutoff:
+                break
+            if req_info["ts"] is not None:
+                expired.append((rid, req_info))
+        for rid, _ in expired:
+            self.spill.discard(rid)
+        for rid, req_info in list(self.pending.items()):
+            if req_info["ts"] is not None and req_info["ts"] >= cutoff:
+                break
+            if req_info["ts"] is not None:
+                expired.append((rid, self.pending.pop(rid)))
+
+        for rid, req_info in expired:
+            self.add_unmatched(rid, req_info)
+        self.unmatched_total += len(expired)
+        return len(expired)
+
+    def finish(self):
+        """处理只有请求没有响应的情况 (unmatched)，返回 print_report 所需的统计"""
+        self.unmatched_total += len(self.pending) + len(self.spill)
+        # 丢失的请求在文件结束时才写入，覆盖顺序排在所有配对之后
+        self.seq_base = 1 << 62
+        for rid, req_info in chain(self.spill.items(), self.pending.items()):
+            self.add_unmatched(rid, req_info)
+        self.pending = {}
+        self.spilled_unmatched = len(self.spill)
+        self.spill.close()
+        self.close_store()
+
+        if self.write_files:
+            save_timeline(self.output_dir, self.timeline)
+        return self.report()
+
+    def flush(self):
+        """跟踪模式: 提交打包存储，新的时间线条目追加到 timeline.jsonl (按完成顺序，不排序)"""
+        if self.store is not None:
+            self.store.commit()
+        if self.write_files and self.timeline:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(os.path.join(self.output_dir, TIMELINE_NAME), "a", encoding="utf-8") as f:
+                for entry in self.timeline:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.timeline = []
+
+    def close(self):
+        """跟踪模式退出: 释放磁盘溢出文件和打包存储 (待配对请求已保存在检查点中)"""
+        self.spill.close()
+        self.close_store()
+
+    def state(self):
+        """跟踪模式的检查点: 待配对请求 (含磁盘中的部分，按到达顺序) 和累计统计，可 JSON 序列化"""
+        return {
+            "pending": [[rid, info] for rid, info in chain(self.spill.items(), self.pending.items())],
+            "log_time": self.log_time,
+            "seq": self._seq,
+            "stats": self.stats,
+            "combination_counts": [[d, p, n] for (d, p), n in self.combination_counts.items()],
+            # vehicle_id 可能是整数，不能直接作为 JSON 对象的键
+            "vehicle_stats": [[v_id, counts] for v_id, counts in self.vehicle_stats.items()],
+            "unmatched_total": self.unmatched_total,
+            "peak_pending": self.peak_pending,
+            "evictions": self.evictions,
+            "late_responses": self.late_responses,
+        }
+
+    def restore(self, state):
+        """从 state() 的结果恢复 (新建的 matcher 上调用)"""
+        self.log_time = state["log_time"]
+        self._seq = state["seq"]
+        self.stats.update(state["stats"])
+        for d_type, p_type, n in state["combination_counts"]:
+            self.combination_counts[(d_type, p_type)] = n
+        for v_id, counts in state["vehicle_stats"]:
+            self.vehicle_stats[v_id].update(counts)
+        self.unmatched_total = state["unmatched_total"]
+        self.peak_pending = state["peak_pending"]
+        self.evictions = state["evictions"]
+        self.late_responses = state["late_responses"]
+        for rid, info in state["pending"]:
+            self.pending[rid] = info
+        self.evict()
+
+    def memory_report(self):
+        return {
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_pending": self.peak_pending,
+            "evictions": self.evictions,
+            "late_responses": self.late_responses,
+            "spilled_unmatched": self.spilled_unmatched,
+        }
+
+    def report(self):
+        return self.stats, self.combination_counts, self.unmatched_total, self.vehicle_stats, self.memory_report()
 
-    print_report(stats, combination_counts, len(pending_requests), vehicle_stats)
+    def save(self, rid, req_info, rsp_data, vehicle_id, status_label, rsp_ts=None):
+        """保存请求 (及响应)，丢失的请求 rsp_data 为 None"""
+        if not self.write_files:
+            return
+        if self.store_format == "packed":
+            self._seq += 1
+            self.open_store().add(
+                rid, vehicle_id, status_label, req_info["data"], rsp_data, req_info["d_type"], req_info["p_type"],
+                req_info["ts"], rsp_ts, self.seq_base + self._seq,
+            )
+            return
+        save_to_file(self.output_dir, rid, req_info["data"], "req", vehicle_id, status_label)
+        if rsp_data is not None:
+            save_to_file(self.output_dir, rid, rsp_data, "rsp", vehicle_id, status_label)
 
-def save_to_file(rid, data, suffix, vehicle_id, status_label):
+    def open_store(self):
+        if self.store is None:
+            self.store = RidStore(self.output_dir, self.segment, self.index_store)
+        return self.store
+
+    def close_store(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+def as_path_list(log_paths):
+    return [log_paths] if isinstance(log_paths, (str, os.PathLike)) else list(log_paths)
+
+def new_matcher(output_dir, write_files, pending_ttl, max_pending, store_format):
+    """新一轮匹配: 打包格式先清空输出目录中已有的存储"""
+    if write_files and store_format == "packed":
+        reset_store(output_dir)
+    return RidMatcher(output_dir, write_files, pending_ttl, max_pending, store_format)
+
+def extract_logs(log_paths, output_dir, write_files=True, pending_ttl=None, max_pending=None, store_format="dir"):
+    """
+    按顺序扫描一个或多个日志文件 (支持压缩文件)，跨文件的请求/响应同样可以配对
+    返回 (stats, combination_counts, unmatched_total, vehicle_stats, memory)
+    """
+    matcher = new_matcher(output_dir, write_files, pending_ttl, max_pending, store_format)
+    for path in as_path_list(log_paths):
+        for line in iter_log_lines(path, MARKERS):
+            matcher.feed(line)
+    return matcher.finish()
+
+class ChunkMatcher(RidMatcher):
+    """
+    并行模式下单个分块的匹配器: 块内能配对的请求/响应直接处理，
+    另外记录与其它分块相关的边界状态，供 merge_chunks 按块顺序合并:
+      - head_responses: 块内此前没有同 rid 请求的第一个响应 (可能与前面分块遗留的请求配对)
+      - requested: 块内出现过请求的 rid (会覆盖前面分块遗留的同 rid 请求)
+      - pending: 块结束时仍未配对的请求
+    目录格式的块内配对不直接写文件，记录在 saved 中由主进程按块顺序写入，
+    重复 rid 的文件覆盖顺序因此与串行扫描一致 (打包格式由 seq 决定顺序)
+    """
+
+    def __init__(self, output_dir, write_files=True, store_format="dir", idx=0):
+        super().__init__(output_dir, write_files, store_format=store_format, segment=f"chunk{idx:05d}")
+        self.seq_base = (idx + 1) << 32
+        self.index_store = False
+        self.head_responses = []
+        self.requested = set()
+        self._head_rids = set()
+        self.saved = []
+
+    def add_request(self, rid, content, ts):
+        self.requested.add(rid)
+        super().add_request(rid, content, ts)
+
+    def add_response(self, rid, rsp_json_str, ts):
+        if rid not in self.pending:
+            if rid not in self.requested and rid not in self._head_rids:
+                self.head_responses.append((rid, rsp_json_str, ts))
+                self._head_rids.add(rid)
+            return
+        super().add_response(rid, rsp_json_str, ts)
+
+    def save(self, rid, req_info, rsp_data, vehicle_id, status_label, rsp_ts=None):
+        if self.write_files and self.store_format == "dir":
+            self.saved.append((rid, req_info["data"], rsp_data, vehicle_id, status_label))
+            return
+        super().save(rid, req_info, rsp_data, vehicle_id, status_label, rsp_ts)
+
+    def result(self):
+        records = self.store.rows if self.store is not None else []
+        self.close_store()
+        return {
+            "records": records,
+            "saved": self.saved,
+            "log_time": self.log_time,
+            "stats": self.stats,
+            "combination_counts": dict(self.combination_counts),
+            "vehicle_stats": {k: dict(v) for k, v in self.vehicle_stats.items()},
+            "timeline": self.timeline,
+            "head_responses": self.head_responses,
+            "requested": self.requested,
+            "pending": self.pending,
+        }
+
+def chunk_ranges(log_file_path, chunk_size):
+    """按 chunk_size 字节切分文件，每个分块的边界对齐到行首，返回 [(start, end), ...]"""
+    size = os.path.getsize(log_file_path)
+    bounds = [0]
+    with open(log_file_path, "rb") as f:
+        offset = chunk_size
+        while offset < size:
+            # 从 offset-1 读到行尾: 若 offset 恰好是行首则不会跳过该行
+            f.seek(offset - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+            offset = max(pos, offset) + chunk_size
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+def scan_chunk(task):
+    """worker: 解析一个字节范围内的日志行，返回块内配对 (打包格式已写入数据文件)、边界状态和统计"""
+    matcher = ChunkMatcher(task["output_dir"], task["write_files"], task["store_format"], task["idx"])
+    for line in iter_log_lines(task["log_file_path"], MARKERS, task["start"], task["end"]):
+        matcher.feed(line)
+    return matcher.result()
+
+def merge_chunks(matcher, result, idx):
+    """按文件顺序把一个分块的结果合并进 matcher (matcher.pending 为此前分块遗留的请求)"""
+    # 跨块配对的覆盖顺序排在该分块内的配对之前
+    matcher.seq_base = ((idx + 1) << 32) - (1 << 31)
+    for rid, rsp_json_str, ts in result["head_responses"]:
+        matcher.add_response(rid, rsp_json_str, ts)
+    # 同一 rid 的跨块配对一定早于块内配对 (块内的请求在该响应之后)，目录格式按此顺序写文件
+    if result["records"]:
+        matcher.open_store().insert_rows(result["records"])
+    for rid, req_data, rsp_data, vehicle_id, status_label in result["saved"]:
+        save_to_file(matcher.output_dir, rid, req_data, "req", vehicle_id, status_label)
+        if rsp_data is not None:
+            save_to_file(matcher.output_dir, rid, rsp_data, "rsp", vehicle_id, status_label)
+    for rid in result["requested"]:
+        matcher.discard(rid)
+    for rid, req_info in result["pending"].items():
+        matcher.pending[rid] = req_info
+    # 与串行扫描一致: 日志时间为该分块最后一个带时间戳的请求
+    if result["log_time"] is not None:
+        matcher.log_time = result["log_time"]
+    matcher.evict()
+
+    for k, v in result["stats"].items():
+        matcher.stats[k] += v
+    for k, v in result["combination_counts"].items():
+        matcher.combination_counts[k] += v
+    for v_id, counts in result["vehicle_stats"].items():
+        target = matcher.vehicle_stats[v_id]
+        for k, v in counts.items():
+            target[k] += v
+    matcher.timeline.extend(result["timeline"])
+
+def match_parallel(matcher, log_file_path, workers, chunk_mb=DEFAULT_CHUNK_MB):
+    """多进程解析日志并把结果按文件顺序合并进 matcher (之后由调用方 finish)"""
+    # 分块编号在多个文件之间连续，用于打包格式的数据文件名和覆盖顺序
+    first = matcher.chunks_done
+    tasks = [
+        {
+            "idx": first + i,
+            "log_file_path": log_file_path,
+            "start": start,
+            "end": end,
+            "output_dir": matcher.output_dir,
+            "write_files": matcher.write_files,
+            "store_format": matcher.store_format,
+        }
+        for i, (start, end) in enumerate(chunk_ranges(log_file_path, int(chunk_mb * 1024 * 1024)))
+    ]
+    matcher.chunks_done += len(tasks)
+    done = {}
+    next_idx = first
+    for task, ok, result in run_tasks(scan_chunk, tasks, workers, chunksize=1):
+        if not ok:
+            raise RuntimeError(f"分块 {task['idx']} ({task['start']}-{task['end']}) 解析失败:\n{result}")
+        done[task["idx"]] = result
+        # 分块按完成顺序返回，合并必须按文件顺序进行
+        while next_idx in done:
+            merge_chunks(matcher, done.pop(next_idx), next_idx)
+            next_idx += 1
+
+def extract_logs_parallel(
+    log_paths, output_dir, workers, chunk_mb=DEFAULT_CHUNK_MB, write_files=True, pending_ttl=None, max_pending=None,
+    store_format="dir",
+):
+    """
+    多进程版 extract_logs: 按行对齐的字节范围分块解析，再按块顺序合并跨块的 rid 配对，
+    统计结果与串行扫描完全一致；压缩文件无法按字节分块，在主进程中流式扫描
+    """
+    matcher = new_matcher(output_dir, write_files, pending_ttl, max_pending, store_format)
+    for path in as_path_list(log_paths):
+        if compression_suffix(path):
+            for line in iter_log_lines(path, MARKERS):
+                matcher.feed(line)
+        else:
+            match_parallel(matcher, path, workers, chunk_mb)
+    return matcher.finish()
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path, follower, matcher):
+    """先提交输出再写检查点 (临时文件 + 替换)，检查点中的偏移之前的内容一定已经输出"""
+    matcher.flush()
+    timeline = os.path.join(matcher.output_dir, TIMELINE_NAME)
+    checkpoint = {
+        "format": matcher.store_format,
+        "log": follower.state(),
+        "timeline_bytes": os.path.getsize(timeline) if os.path.exists(timeline) else 0,
+        "matcher": matcher.state(),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def print_progress(follower, matcher):
+    """跟踪模式的滚动统计 (一行)"""
+    s = matcher.stats
+    print(
+        f"[{datetime.now():%H:%M:%S}] {os.path.basename(follower.path)} @ {follower.offset / 1024 / 1024:.1f} MB | "
+        f"请求 {s['total_req_found']} | 正常 {s['success_pairs']} 空 {s['empty_routes']} 报错 {s['algorithm_error']} "
+        f"过滤 {s['ignored_by_filter']} 解析失败 {s['failed_json']} | 丢失 {matcher.unmatched_total} | "
+        f"待配对 {len(matcher.pending) + len(matcher.spill)}",
+        flush=True,
+    )
+
+def follow_log(
+    log_file_path, output_dir, poll_interval=DEFAULT_POLL_INTERVAL, once=False, unmatched_after=DEFAULT_UNMATCHED_AFTER,
+    report_interval=10.0, pending_ttl=None, max_pending=None, store_format="dir",
+):
+    """
+    跟踪模式: 持续读取正在写入的日志，配对完成的 rid 立即写入输出目录 (以及 timeline.jsonl)
+      - 日志偏移 / inode、待配对请求和累计统计保存在 output_dir/.follow_checkpoint.json，重启后从断点继续
+      - 日志轮转 (重命名或截断) 后继续跟踪新文件 (utils.log_follow.LogFollower)
+      - 日志时间超过 unmatched_after 秒仍没有响应的请求按 unmatched 处理
+      - once=True 时读到当前文件末尾即退出 (用于定时任务)；否则直到 Ctrl+C / SIGTERM
+    返回 (stats, combination_counts, unmatched_total, vehicle_stats, memory)，未配对的请求仍在检查点中等待
+    """
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_NAME)
+    checkpoint = load_checkpoint(checkpoint_path)
+    timeline = os.path.join(output_dir, TIMELINE_NAME)
+    if checkpoint is None:
+        matcher = new_matcher(output_dir, True, pending_ttl, max_pending, store_format)
+        if os.path.exists(timeline):
+            os.remove(timeline)
+        follower = LogFollower(log_file_path, markers=MARKERS)
+    else:
+        if checkpoint["format"] != store_format:
+            raise SystemExit(f"错误: 检查点 {checkpoint_path} 使用 --format {checkpoint['format']}，请保持一致或删除检查点")
+        matcher = RidMatcher(output_dir, True, pending_ttl, max_pending, store_format)
+        matcher.restore(checkpoint["matcher"])
+        # 检查点之后追加的时间线条目会在重新读取时再次产生
+        if os.path.exists(timeline):
+            with open(timeline, "r+b") as f:
+                f.truncate(checkpoint["timeline_bytes"])
+        log = checkpoint["log"]
+        follower = LogFollower(log_file_path, log["offset"], log["inode"], MARKERS)
+        print(f"♻️ 从检查点继续: {log['path']} @ {log['offset']} 字节, 待配对 {len(checkpoint['matcher']['pending'])} 个请求")
+
+    # 信号只设置标志，当前一批行处理完并写入检查点后再退出
+    stop = []
+    handlers = {sig: signal.signal(sig, lambda signum, frame: stop.append(signum)) for sig in (signal.SIGINT, signal.SIGTERM)}
+    last_checkpoint = last_report = time.monotonic()
+    dirty = False
+    try:
+        while True:
+            n = 0
+            for line in follower.poll():
+                matcher.feed(line)
+                n += 1
+            if n:
+                matcher.expire_unmatched(unmatched_after)
+                matcher.flush()
+                dirty = True
+            now = time.monotonic()
+            if n and now - last_report >= report_interval:
+                print_progress(follower, matcher)
+                last_report = now
+            if dirty and (once or stop or now - last_checkpoint >= CHECKPOINT_INTERVAL):
+                save_checkpoint(checkpoint_path, follower, matcher)
+                dirty = False
+                last_checkpoint = now
+            if once or stop:
+                break
+            deadline = now + poll_interval
+            while not stop and time.monotonic() < deadline:
+                time.sleep(min(0.2, poll_interval))
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+        follower.close()
+        matcher.close()
+
+    print_progress(follower, matcher)
+    return matcher.report()
+
+def timeline_entry(rid, req_info, vehicle_id, status_label, rsp_ts):
+    """req_ts / rsp_ts 为日志时间 (epoch 秒)，log_latency 为线上实际耗时"""
+    req_ts = req_info["ts"]
+    return {
+        "rid": rid,
+        "vehicle_id": vehicle_id,
+        "status": status_label,
+        "req_ts": req_ts,
+        "rsp_ts": rsp_ts,
+        "log_latency": round(rsp_ts - req_ts, 6) if req_ts is not None and rsp_ts is not None else None,
+    }
+
+def save_timeline(output_dir, timeline):
+    """按请求时间排序写入 output_dir/timeline.jsonl，供 dispatch_bench.py replay 按原始节奏回放"""
+    timeline.sort(key=lambda e: (e["req_ts"] is None, e["req_ts"] or 0, e["rid"]))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, TIMELINE_NAME), "w", encoding="utf-8") as f:
+        for entry in timeline:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+def save_to_file(output_dir, rid, data, suffix, vehicle_id, status_label):
     # 路径结构: output_dir/vehicle_id/status_label/rid_suffix.json
     target_dir = os.path.join(output_dir, str(vehicle_id), status_label)
     if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-    
+        os.makedirs(target_dir, exist_ok=True)
+
     filename = f"{rid}_{suffix}.json"
     path = os.path.join(target_dir, filename)
     with open(path, "w", encoding="utf-8") as jf:
         json.dump(data, jf, indent=4, ensure_ascii=False)
 
-def print_report(stats, combination_counts, unmatched_total, vehicle_stats):
+def print_report(log_name, stats, combination_counts, unmatched_total, vehicle_stats, memory=None):
     total = stats["total_req_found"]
     print("\n" + "="*85)
-    print(f"          调度业务分析报告 ({os.path.basename(log_file_path)})")
+    print(f"          调度业务分析报告 ({log_name})")
     print("="*85)
-    
+
     print(f"1. 全局流量统计:")
     print(f"   - 总扫描请求数: {total}")
     print(f"   - [Normal]    成功配对且有路径 (1,0): {stats['success_pairs']}")
@@ -203,7 +765,7 @@ def print_report(stats, combination_counts, unmatched_total, vehicle_stats):
     print(f"   - [Unmatched] 有请求无响应 (丢失): {unmatched_total}")
     print(f"   - [Filtered]  非目标决策类型 (非1,0): {stats['ignored_by_filter']}")
     print(f"   - [Fail]      JSON解析失败: {stats['failed_json']}")
-    
+
     print(f"\n2. (Decision, Plan) 组合分布:")
     paired_total = sum(combination_counts.values())
     if paired_total > 0:
@@ -212,23 +774,97 @@ def print_report(stats, combination_counts, unmatched_total, vehicle_stats):
             label = f"({d}, {p})"
             mark = " [Target]" if d == 1 and p == 0 else ""
             print(f"   - {label:<15}: {count:>4} 次 ({percentage:>6.2f}%){mark}")
-    
+
     print(f"\n3. 车辆明细统计:")
     # 表头增加 Target 和 Filtered 列
     header = f"{'车辆ID':<12} {'总请求':>6} | {'目标(1,0)':>9} {'Normal':>7} {'Empty':>6} {'Error':>6} {'丢失':>5} | {'过滤':>5}"
     print(f"   {header}")
     print(f"   {'-'*82}")
-    
+
     for v_id in sorted(vehicle_stats.keys()):
         v = vehicle_stats[v_id]
         row = f"{v_id:<12} {v['total_req']:>6} | {v['target_req']:>9} {v['normal']:>7} {v['empty']:>6} {v['error']:>6} {v['unmatched']:>5} | {v['filtered']:>5}"
         print(f"   {row}")
-    
+
+    if memory is not None:
+        print(f"\n4. 内存与待配对表:")
+        if memory["peak_rss_mb"] is not None:
+            print(f"   - 进程峰值内存 (RSS): {memory['peak_rss_mb']:.1f} MB")
+        print(f"   - 内存中待配对请求峰值: {memory['peak_pending']}")
+        print(f"   - 移到磁盘的请求 (TTL/上限淘汰): {memory['evictions']}")
+        print(f"   - 淘汰后才收到响应 (从磁盘取回配对): {memory['late_responses']}")
+        print(f"   - 磁盘中的丢失请求: {memory['spilled_unmatched']}")
+
     target_total = sum(v["target_req"] for v in vehicle_stats.values())
     success_rate = (stats["success_pairs"] / target_total * 100) if target_total > 0 else 0
     print("\n" + "-" * 85)
     print(f"目标业务 (1,0) 完结率 (Normal/Target): {success_rate:.2f}%")
     print("="*85)
 
+def resolve_log_paths(patterns, since=None, until=None, name=None):
+    """
+    日志文件必须位于 mylog_input 目录下 (可以是 glob 模式，如 'app_2026-01-*.log.gz')，
+    返回 (按日期排序的日志路径列表, 输出目录)；不合法时退出
+    输出目录默认为单个日志去掉扩展名后的名字，多个日志时为 '首个__末个'
+    """
+    mylog_dir = './mylog_input'
+    log_paths = expand_log_paths([os.path.join(mylog_dir, p) for p in patterns], since, until)
+
+    # 验证日志文件是否存在且在mylog_input目录下
+    if not log_paths:
+        print(f"错误: mylog_input 下没有匹配 {' '.join(patterns)} 的日志文件")
+        exit(1)
+
+    # 确保日志文件确实在mylog_input目录下
+    abs_mylog_dir = os.path.abspath(mylog_dir)
+    for log_file_path in log_paths:
+        if not os.path.abspath(log_file_path).startswith(abs_mylog_dir):
+            print(f"错误: 日志文件必须位于mylog_input目录下")
+            exit(1)
+
+    # 设置输出目录
+    if name is None:
+        stems = [log_stem(p) for p in log_paths]
+        name = stems[0] if len(stems) == 1 else f"{stems[0]}__{stems[-1]}"
+    output_dir = os.path.join(os.path.dirname(log_paths[0]), name)
+    return log_paths, output_dir
+
 if __name__ == "__main__":
-    extract_logs()
\ No newline at end of file
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='匹配日志中的请求和响应，并按vehicle_id分类保存')
+    parser.add_argument('log_files', type=str, nargs='+', help='日志文件名或 glob 模式，必须位于mylog_input目录下 (支持 .gz/.bz2/.xz/.zst)')
+    parser.add_argument('--since', default=None, help='只处理文件名日期不早于该日期的日志 (YYYY-MM-DD)')
+    parser.add_argument('--until', default=None, help='只处理文件名日期不晚于该日期的日志 (YYYY-MM-DD)')
+    parser.add_argument('--name', default=None, help='输出目录名 (与日志文件同目录，默认由日志文件名生成)')
+    parser.add_argument('--workers', type=int, default=1, help=f'并行解析的进程数 (0 表示全部 {default_workers()} 个核心，默认 1 即串行)')
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_MB, help='并行模式下每个分块的大小 (MB)')
+    parser.add_argument('--pending-ttl', type=float, default=None, help='日志时间超过该秒数仍未收到响应的请求移到磁盘 (默认不限)')
+    parser.add_argument('--max-pending', type=int, default=None, help='内存中最多保留的待配对请求数 (默认不限)')
+    parser.add_argument('--format', choices=('dir', 'packed'), default='dir', help='输出格式: dir 每个 rid 一组 JSON 文件；packed 打包为 rids.sqlite 索引 + JSONL 数据文件')
+    parser.add_argument('--follow', action='store_true', help='跟踪模式: 持续读取正在写入的日志 (支持轮转)，断点保存在输出目录的检查点中')
+    parser.add_argument('--once', action='store_true', help='跟踪模式下从检查点读到当前文件末尾后退出 (用于定时刷新)')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='跟踪模式的轮询间隔 (秒)')
+    parser.add_argument('--unmatched-after', type=float, default=DEFAULT_UNMATCHED_AFTER, help='跟踪模式下请求等待响应的最长日志时间 (秒)，超过后按丢失处理')
+    parser.add_argument('--report-interval', type=float, default=10.0, help='跟踪模式下打印滚动统计的间隔 (秒)')
+    args = parser.parse_args()
+
+    log_paths, output_dir = resolve_log_paths(args.log_files, args.since, args.until, args.name)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    workers = args.workers or default_workers()
+    limits = {"pending_ttl": args.pending_ttl, "max_pending": args.max_pending, "store_format": args.format}
+    if args.follow or args.once:
+        if len(log_paths) != 1 or compression_suffix(log_paths[0]):
+            print("错误: 跟踪模式只支持单个未压缩的日志文件")
+            exit(1)
+        report = follow_log(
+            log_paths[0], output_dir, args.poll_interval, args.once, args.unmatched_after, args.report_interval, **limits
+        )
+    elif workers > 1:
+        report = extract_logs_parallel(log_paths, output_dir, workers, args.chunk_mb, **limits)
+    else:
+        report = extract_logs(log_paths, output_dir, **limits)
+    names = [os.path.basename(p) for p in log_paths]
+    log_name = names[0] if len(names) == 1 else f"{names[0]} ... {names[-1]}, 共 {len(names)} 个文件"
+    print_report(log_name, *report)
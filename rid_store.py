@@ -0,0 +1,144 @@
+"""
+rid_log_matcher --format packed 输出的查询 / 导出工具
+
+    # 概况: 每个 vehicle_id / status 的条数和数据文件大小
+    python rid_store.py info mylog_input/app_2026-01-21
+
+    # 按条件列出 rid (可组合，同一参数可重复)
+    python rid_store.py query mylog_input/app_2026-01-21 --vehicle-id 1001 --status error
+    python rid_store.py query mylog_input/app_2026-01-21 --since "2026-01-21 10:00:00" --until "2026-01-21 11:00:00"
+
+    # 打印单个 rid 的请求 / 响应
+    python rid_store.py show mylog_input/app_2026-01-21 <rid> --kind rsp
+
+    # 导出为原来的目录格式 ({vehicle_id}/{status}/{rid}_req.json)，可加与 query 相同的过滤条件
+    python rid_store.py export mylog_input/app_2026-01-21 --out mylog_input/app_2026-01-21_dir --status error
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from datetime import datetime
+
+from rid_log_matcher import TIMELINE_NAME
+from utils.packed_store import DATA_PATTERN, INDEX_NAME, RidStore, is_packed
+
+
+def parse_time(value):
+    """YYYY-MM-DD[ HH:MM:SS] -> epoch 秒 (与 rid_log_matcher 解析日志时间的方式相同)"""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def add_filter_args(p):
+    p.add_argument("--rid", action="append", default=None)
+    p.add_argument("--vehicle-id", action="append", default=None)
+    p.add_argument("--status", action="append", default=None, help="normal / empty / error / unmatched")
+    p.add_argument("--decision-type", type=int, action="append", default=None)
+    p.add_argument("--plan-type", type=int, action="append", default=None)
+    p.add_argument("--since", default=None, help="请求日志时间下限，如 '2026-01-21 10:00:00'")
+    p.add_argument("--until", default=None, help="请求日志时间上限")
+
+
+def filters_from_args(args):
+    return {
+        "rid": args.rid,
+        "vehicle_id": args.vehicle_id,
+        "status": args.status,
+        "decision_type": args.decision_type,
+        "plan_type": args.plan_type,
+        "since": parse_time(args.since),
+        "until": parse_time(args.until),
+    }
+
+
+def format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] if ts is not None else "-"
+
+
+def print_info(store):
+    counts = store.counts()
+    total = sum(n for _, _, n in counts)
+    data_files = glob.glob(os.path.join(store.directory, DATA_PATTERN.format(segment="*")))
+    data_size = sum(os.path.getsize(p) for p in data_files)
+    index_size = os.path.getsize(os.path.join(store.directory, INDEX_NAME))
+
+    print(f"目录: {store.directory}")
+    print(f"记录数: {total}, 数据文件: {len(data_files)} 个 ({data_size / 1024 / 1024:.2f} MB), 索引: {index_size / 1024 / 1024:.2f} MB")
+    print(f"{'车辆ID':<15} | {'状态':<10} | {'条数':>8}")
+    print("-" * 40)
+    for vehicle_id, status, n in counts:
+        print(f"{vehicle_id:<15} | {status:<10} | {n:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询 / 导出 rid_log_matcher 的打包存储 (rids.sqlite + rids-*.jsonl)")
+    sub = parser.add_subparsers(dest="command")
+
+    info_p = sub.add_parser("info", help="按车辆和状态统计条数")
+    info_p.add_argument("store_dir")
+
+    query_p = sub.add_parser("query", help="按条件列出 rid")
+    query_p.add_argument("store_dir")
+    add_filter_args(query_p)
+    query_p.add_argument("--limit", type=int, default=None)
+
+    show_p = sub.add_parser("show", help="打印单个 rid 的请求或响应")
+    show_p.add_argument("store_dir")
+    show_p.add_argument("rid")
+    show_p.add_argument("--kind", choices=("req", "rsp"), default="req")
+
+    export_p = sub.add_parser("export", help="导出为 {vehicle_id}/{status}/{rid}_req.json 目录格式")
+    export_p.add_argument("store_dir")
+    export_p.add_argument("--out", required=True, help="导出目录")
+    add_filter_args(export_p)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    if not is_packed(args.store_dir):
+        print(f"错误: {args.store_dir} 下没有 {INDEX_NAME}，请先用 rid_log_matcher.py --format packed 匹配日志")
+        return 1
+
+    store = RidStore(args.store_dir)
+    try:
+        if args.command == "info":
+            print_info(store)
+        elif args.command == "query":
+            records = store.query(limit=args.limit, **filters_from_args(args))
+            for r in records:
+                latency = f"{r['rsp_ts'] - r['req_ts']:.3f}s" if r["rsp_ts"] is not None and r["req_ts"] is not None else "-"
+                print(f"{r['rid']}  {r['vehicle_id']:<10} {r['status']:<9} ({r['decision_type']},{r['plan_type']})  {format_ts(r['req_ts'])}  {latency}")
+            print(f"共 {len(records)} 条")
+        elif args.command == "show":
+            records = store.query(rid=args.rid)
+            if not records:
+                print(f"错误: 没有 rid {args.rid}")
+                return 1
+            for r in records:
+                data = store.load(r, args.kind)
+                if data is None:
+                    print(f"# {r['vehicle_id']}/{r['status']}: 没有响应")
+                    continue
+                if len(records) > 1:
+                    print(f"# {r['vehicle_id']}/{r['status']}")
+                print(json.dumps(data, indent=4, ensure_ascii=False))
+        elif args.command == "export":
+            n = store.export(args.out, **filters_from_args(args))
+            # 时间线与存储放在一起，一并复制，导出后的目录可直接用于 dispatch_bench replay
+            timeline = os.path.join(args.store_dir, TIMELINE_NAME)
+            if os.path.exists(timeline) and not any(filters_from_args(args).values()):
+                os.makedirs(args.out, exist_ok=True)
+                with open(timeline, "rb") as src, open(os.path.join(args.out, TIMELINE_NAME), "wb") as dst:
+                    dst.write(src.read())
+            print(f"✅ 已导出 {n} 个 rid -> {args.out}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
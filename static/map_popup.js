@@ -0,0 +1,111 @@
+// 地图弹窗的 JavaScript 版本，布局与 main.py 中的 MapTemplate 保持一致
+// 修改 MapTemplate 的弹窗结构时需要同步修改这里
+var MapPopup = (function () {
+    // 模拟 Python str() 的输出，保证与服务端渲染的文本一致
+    function pyStr(v) {
+        if (v === null || v === undefined) return "None";
+        if (v === true) return "True";
+        if (v === false) return "False";
+        if (typeof v === "object") return JSON.stringify(v);
+        return String(v);
+    }
+
+    // 模拟 dict.get(key, default)
+    function get(obj, key, dflt) {
+        return Object.prototype.hasOwnProperty.call(obj, key) ? obj[key] : dflt;
+    }
+
+    // 模拟 f"{v:+}"
+    function signed(v) {
+        return (v >= 0 ? "+" : "") + pyStr(v);
+    }
+
+    function row(label, value, valueStyle) {
+        var style = valueStyle ? ' style="' + valueStyle + '"' : "";
+        return '<div class="info-row"><span class="info-label">' + label +
+            '</span><span class="info-value"' + style + '>' + value + '</span></div>';
+    }
+
+    function depot(d) {
+        return '<div class="map-popup">' +
+            '<div class="map-header"><h3 style="color: #d9534f;">🏠 仓库信息</h3></div>' +
+            row("名称:", pyStr(d.station_name)) +
+            row("ID:", pyStr(d.station_id)) +
+            row("区域:", pyStr(get(d, "area", "N/A"))) +
+            row("详细地址:", pyStr(get(d, "location", "N/A"))) +
+            '</div>';
+    }
+
+    function vehicle(v) {
+        var wh = v.work_hours || {};
+        return '<div class="map-popup">' +
+            '<div class="map-header"><h3 style="color: #0275d8;">🚚 车辆信息</h3></div>' +
+            row("车牌:", pyStr(v.vehicle_id)) +
+            row("类型:", pyStr(v.vehicle_type)) +
+            row("载重能力:", pyStr(v.current_load) + " / " + pyStr(v.capacity) + " 箱") +
+            row("工作时间:", pyStr(wh.start) + " - " + pyStr(wh.end)) +
+            '<div class="divider"></div>' +
+            '<div class="info-row"><span class="info-label">运行状态:</span>' +
+            '<span class="status-tag" style="background:#0275d8">' + pyStr(v.vehicle_status) + '</span></div>' +
+            '</div>';
+    }
+
+    function station(st, stopInfo, reason, newDemand) {
+        var d = get(st, "demands", 0);
+        var dColor = d >= 0 ? "#52c41a" : "#fa8c16";
+        var icon = d >= 0 ? "📈" : "📉";
+        var html = '<div class="map-popup">' +
+            '<div class="map-header"><h3 style="color: ' + dColor + ';">' + icon + " " +
+            pyStr(get(st, "station_name", "未知站点")) + '</h3></div>' +
+            row("ID:", pyStr(get(st, "station_id", "N/A"))) +
+            row("详细地址:", pyStr(get(st, "location", get(st, "address", "N/A")))) +
+            row("区域:", pyStr(get(st, "area", "N/A"))) +
+            row("需求量:", signed(d) + " 箱", "color:" + dColor);
+
+        if (newDemand !== null && newDemand !== undefined) {
+            html += '<div class="info-row"><span class="info-label" style="color:#096dd9;">新需求:</span>' +
+                '<span class="info-value" style="color:#096dd9; font-weight:bold;">' + signed(newDemand) + ' 箱</span></div>';
+        }
+
+        html += row("锁柜(空闲/总数):", pyStr(get(st, "available_nums", 0)) + "/" + pyStr(get(st, "locker_nums", 0))) +
+            row("服务耗时:", pyStr(get(st, "service_time", 0)) + " min") +
+            row("优先级:", pyStr(get(st, "priority", 0))) +
+            row("需求时间:", pyStr(get(st, "demand_time", "N/A")), "font-size:11px;") +
+            row("原始坐标:", pyStr(st.longitude) + ", " + pyStr(st.latitude));
+
+        if (stopInfo) {
+            html += '<div class="divider"></div>' +
+                '<div class="info-row" style="color:#096dd9;"><span class="info-label">配送顺序:</span>' +
+                '<span class="info-value">第 ' + pyStr(stopInfo.index) + ' 站</span></div>' +
+                row("预计到达:", pyStr(stopInfo.arrival_time)) +
+                row("服务后负载:", pyStr(stopInfo.load_after_service) + " 箱");
+        }
+
+        if (reason) {
+            html += '<div class="reason-box"><strong>未指派原因:</strong><br>' + pyStr(reason) + '</div>';
+        }
+        return html + '</div>';
+    }
+
+    // ref: ["depot"] / ["vehicle"] / ["station", i] / ["stop", k] / ["unassigned", k]
+    // store 的结构见 main.py 中的 PopupBinder (数据文件 *.map.json 使用相同结构，见 build_map_data)
+    function render(store, ref) {
+        switch (ref[0]) {
+            case "depot":
+                return depot(store.depot);
+            case "vehicle":
+                return vehicle(store.vehicle);
+            case "station":
+                return station(store.stations[ref[1]], null, null, null);
+            case "stop":
+                var stop = store.stops[ref[1]];
+                return station(store.stations[stop.station], stop, null, stop.demand);
+            case "unassigned":
+                var un = store.unassigned[ref[1]];
+                return station(store.stations[un.station], null, un.reason, null);
+        }
+        return "";
+    }
+
+    return { depot: depot, vehicle: vehicle, station: station, render: render };
+})();
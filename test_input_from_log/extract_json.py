@@ -1,59 +1,190 @@
+"""
+从日志中提取全部 '请求调度参数:' 之后的 JSON，输出为 batch_test.py 可直接使用的编号文件
+
+    # 在仓库根目录运行 (默认处理 test_input_from_log/*.txt，输出到同一目录)
+    uv run python -m test_input_from_log.extract_json
+
+    # 指定日志 (支持 glob、.gz/.bz2/.xz/.zst 压缩日志)、输出目录和进程数
+    uv run python -m test_input_from_log.extract_json 'logs/app_2026-01-*.log.gz' --out test_input_from_log --workers 4
+
+输出: <日志名>_0001.json, <日志名>_0002.json ... (按在日志中出现的顺序编号)，结束时打印每个文件的数量和失败明细
+"""
+import argparse
 import json
 import os
-import glob
 
-def extract_json_from_logs():
-    # 1. 获取当前目录下所有的 .txt 文件
-    txt_files = glob.glob('*.txt')
-    
-    if not txt_files:
-        print("当前目录下没有找到 .txt 文件。")
-        return
+from utils.batch_pool import Progress, default_workers, run_tasks
+from utils.log_input import expand_log_paths, log_stem, open_log
+
+KEYWORD = '请求调度参数:'
+DEFAULT_INPUTS = ['test_input_from_log/*.txt']
+DEFAULT_OUT = 'test_input_from_log'
+
+# 每次读取的字符数
+READ_CHUNK = 1024 * 1024
+# 单个 JSON 的最大长度 (字符)，超过后放弃该处，继续查找下一处
+MAX_JSON_CHARS = 32 * 1024 * 1024
+# 解析错误位于缓冲区末尾这么多字符以内时视为数据不完整 (被截断的字面量如 "Infinit" 报错位置在字面量开头)
+INCOMPLETE_TAIL = len('Infinity')
+
 
-    keyword = "请求调度参数:"
+def is_incomplete(e, buf):
+    """
+    raw_decode 的错误是因为缓冲区在 JSON 中间结束 (需要继续读取)，而不是 JSON 本身不合法
+    字符串中途结束时报错位置是字符串开头，但只有读到缓冲区末尾才会报 Unterminated string
+    (字符串中的换行等控制字符会先报 Invalid control character)
+    """
+    return e.pos >= len(buf) - INCOMPLETE_TAIL or e.msg.startswith('Unterminated string')
+
+
+def iter_json_after(f, keyword=KEYWORD, chunk_size=READ_CHUNK, max_chars=MAX_JSON_CHARS):
+    """
+    在文本流 f 中查找全部 keyword，按出现顺序产出 (序号, obj, None) 或 (序号, None, 错误信息)
+
+    滑动缓冲区: 只保留尚未处理的内容，读取新数据前丢弃已处理的部分，内存占用只取决于单个 JSON 的大小。
+    keyword 之后第一个 '{' 起用 raw_decode 解析 (忽略 JSON 之后的剩余字符)；
+    只有 JSON 在缓冲区末尾被截断时才追加读取后重试 (追加量不小于已缓冲的长度，大对象不会被反复从头解析)；
+    不合法的 JSON (如日志中被截断的行) 立即报告失败，从下一处继续，不会因此读入后面的内容
+    """
     decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    n = 0
+
+    def read_more(size):
+        nonlocal buf, pos, eof
+        buf = buf[pos:]
+        pos = 0
+        data = f.read(size)
+        if data:
+            buf += data
+        else:
+            eof = True
+
+    while True:
+        # 1. 查找下一处关键字 (未找到时保留末尾可能被截断的半个关键字)
+        key_index = buf.find(keyword, pos)
+        if key_index == -1:
+            if eof:
+                return
+            pos = max(pos, len(buf) - len(keyword) + 1)
+            read_more(chunk_size)
+            continue
+        n += 1
+        pos = key_index + len(keyword)
+
+        # 2. 关键字之后的第一个 '{' (遇到下一处关键字或文件结束则该处没有 JSON)
+        while True:
+            start_index = buf.find('{', pos)
+            next_key = buf.find(keyword, pos)
+            if start_index != -1 and (next_key == -1 or start_index < next_key):
+                break
+            if next_key != -1 or eof:
+                start_index = None
+                break
+            pos = max(pos, len(buf) - len(keyword) + 1)
+            read_more(chunk_size)
+        if start_index is None:
+            yield n, None, "包含关键字，但未找到 JSON 起始括号 '{'"
+            continue
+        pos = start_index
+
+        # 3. 解析 JSON，数据不完整时追加读取
+        while True:
+            try:
+                obj, end_index = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof or not is_incomplete(e, buf) or len(buf) - pos >= max_chars:
+                    yield n, None, f'解析 JSON 时出错: {e.msg} (第 {e.pos - pos} 个字符)'
+                    pos += 1
+                    break
+                read_more(max(chunk_size, len(buf) - pos))
+                continue
+            yield n, obj, None
+            pos = end_index
+            break
+
+
+def extract_file(task):
+    """
+    提取单个日志文件中的全部请求，写入 <out_dir>/<stem>_<序号>.json
+    返回 {"found": 关键字出现次数, "written": 成功写入数, "failures": [(序号, 错误信息), ...]}
+    """
+    stem = task['stem']
+    found = 0
+    written = 0
+    failures = []
+    with open_log(task['path']) as f:
+        for n, obj, error in iter_json_after(f):
+            found = n
+            if error is not None:
+                failures.append((n, error))
+                continue
+            json_filename = os.path.join(task['out_dir'], f'{stem}_{n:04d}.json')
+            with open(json_filename, 'w', encoding='utf-8') as f_out:
+                # ensure_ascii=False 保证中文正常显示，indent=4 用于美化格式
+                json.dump(obj, f_out, ensure_ascii=False, indent=4)
+            written += 1
+    return {'found': found, 'written': written, 'failures': failures}
+
+
+def extract_json_from_logs(patterns=None, out_dir=DEFAULT_OUT, workers=None):
+    """
+    多进程并行提取多个日志文件 (每个文件一个任务，单个文件出错只记录不中断)，结束时打印汇总
+    返回出错的文件数 + 解析失败的条数
+    """
+    log_files = expand_log_paths(patterns or DEFAULT_INPUTS)
+    if not log_files:
+        print(f"没有找到日志文件: {' '.join(patterns or DEFAULT_INPUTS)}")
+        return 0
+    os.makedirs(out_dir, exist_ok=True)
+    workers = default_workers() if workers is None else workers
+
+    print(f"🚀 {len(log_files)} 个日志 -> {out_dir} (workers={workers})")
+    progress = Progress(len(log_files), unit='files')
+    results = {}
+    errors = {}
+    # 日志名相同 (如 a.txt 和 a.txt.gz) 时改用完整文件名，避免输出互相覆盖
+    stems = [log_stem(p) for p in log_files]
+    tasks = [
+        {'path': p, 'out_dir': out_dir, 'stem': stem if stems.count(stem) == 1 else os.path.basename(p)}
+        for p, stem in zip(log_files, stems)
+    ]
+    for task, ok, result in run_tasks(extract_file, tasks, workers=workers):
+        progress.update(ok, 1 if ok else 0)
+        if ok:
+            results[task['path']] = result
+        else:
+            errors[task['path']] = result
+
+    print('-' * 70)
+    print(f"{'日志文件':<40} {'找到':>8} {'成功':>8} {'失败':>8}")
+    for path in log_files:
+        if path in errors:
+            print(f"{path:<40} {'-':>8} {'-':>8} {'出错':>8}")
+            continue
+        r = results[path]
+        print(f"{path:<40} {r['found']:>8} {r['written']:>8} {len(r['failures']):>8}")
+    found = sum(r['found'] for r in results.values())
+    written = sum(r['written'] for r in results.values())
+    failed = sum(len(r['failures']) for r in results.values())
+    print('-' * 70)
+    print(f"🎉 共找到 {found} 处 '{KEYWORD}'，写入 {written} 个 JSON，解析失败 {failed} 处，出错文件 {len(errors)} 个")
+
+    for path in log_files:
+        for n, error in results.get(path, {}).get('failures', []):
+            print(f"[失败] {path} 第 {n} 处: {error}")
+        if path in errors:
+            print(f"[错误] 处理文件 {path} 时发生错误:\n{errors[path]}")
+    return failed + len(errors)
 
-    for txt_file in txt_files:
-        try:
-            with open(txt_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 2. 查找关键字的位置
-            key_index = content.find(keyword)
-            
-            if key_index != -1:
-                # 从关键字之后寻找第一个 '{'
-                start_index = content.find('{', key_index)
-                
-                if start_index != -1:
-                    # 截取从 '{' 开始到文件末尾的所有内容
-                    potential_json = content[start_index:]
-                    
-                    # 3. 核心步骤：利用 raw_decode 解析 JSON
-                    # 它会解析出一个合法的 JSON 对象，并忽略后面的剩余字符
-                    try:
-                        json_obj, end_index = decoder.raw_decode(potential_json)
-                        
-                        # 4. 构造输出文件名 (同名，但后缀改为 .json)
-                        json_filename = os.path.splitext(txt_file)[0] + '.json'
-                        
-                        # 5. 保存为 JSON 文件
-                        with open(json_filename, 'w', encoding='utf-8') as f_out:
-                            # ensure_ascii=False 保证中文正常显示，indent=4 用于美化格式
-                            json.dump(json_obj, f_out, ensure_ascii=False, indent=4)
-                            
-                        print(f"[成功] 已提取: {txt_file} -> {json_filename}")
-                        
-                    except json.JSONDecodeError as e:
-                        print(f"[失败] {txt_file} 包含关键字，但在解析 JSON 时出错: {e}")
-                else:
-                    print(f"[跳过] {txt_file} 包含关键字，但未找到 JSON 起始括号 '{{'")
-            else:
-                print(f"[跳过] {txt_file} 未包含关键字 '{keyword}'")
-
-        except Exception as e:
-            print(f"[错误] 处理文件 {txt_file} 时发生未知错误: {e}")
 
 if __name__ == "__main__":
-    extract_json_from_logs()
-    input("\n处理完成，按回车键退出...")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="从日志提取全部请求调度参数 JSON (batch_test.py 的输入)")
+    parser.add_argument('logs', nargs='*', default=DEFAULT_INPUTS, help="日志文件或 glob 模式，默认 test_input_from_log/*.txt")
+    parser.add_argument('--out', default=DEFAULT_OUT, help="输出目录")
+    parser.add_argument('--workers', type=int, default=None, help="进程数 (默认全部 CPU 核心，1 为单进程顺序执行)")
+    args = parser.parse_args()
+
+    raise SystemExit(1 if extract_json_from_logs(args.logs, args.out, args.workers) else 0)
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import deque
+
+
+def default_workers():
+    """默认使用全部 CPU 核心 (folium/Jinja 渲染是 CPU 密集型)"""
+    return os.cpu_count() or 1
+
+
+def auto_chunksize(n_tasks, workers):
+    """
+    每次派发给 worker 的任务数: 任务多时合并派发以减少进程间通信，
+    同时保证每个 worker 大约能分到 4 批，避免尾部负载不均
+    """
+    if workers <= 1:
+        return 1
+    return max(1, n_tasks // (workers * 4))
+
+
+class Progress:
+    """批处理进度: 已完成数、失败数和吞吐量 (unit/s)"""
+
+    def __init__(self, total, unit="maps", stream=None):
+        self.total = total
+        self.unit = unit
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self.failed = 0
+        self.units = 0
+        self.start = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def rate(self):
+        return self.units / self.elapsed if self.elapsed > 0 else 0.0
+
+    def update(self, ok, units=0):
+        self.done += 1
+        self.units += units
+        if not ok:
+            self.failed += 1
+        end = "\n" if self.done == self.total else ""
+        self.stream.write(
+            f"\r⏳ [{self.done}/{self.total}] 失败 {self.failed} | "
+            f"{self.rate:.1f} {self.unit}/s | {self.elapsed:.1f}s{end}"
+        )
+        self.stream.flush()
+
+
+def _call_isolated(func, task):
+    """在 worker 中执行单个任务，异常只记录不向外抛，保证一个任务失败不影响整批"""
+    try:
+        return True, func(task)
+    except Exception:
+        return False, traceback.format_exc(limit=3)
+
+
+class _Isolated:
+    """可 pickle 的包装器 (multiprocessing 不能直接传 lambda/闭包)"""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, task):
+        return task, _call_isolated(self.func, task)
+
+
+def run_tasks(func, tasks, workers=None, chunksize=None, initializer=None, initargs=()):
+    """
+    并行执行 func(task)，按完成顺序产出 (task, ok, result_or_traceback)
+
+    - workers <= 1 时在当前进程中顺序执行 (便于调试)，行为与并行一致
+    - func / initializer 必须是模块级函数 (可被 pickle)
+    - initializer 在每个 worker 进程启动时调用一次，用于打开缓存等进程级资源
+    """
+    tasks = list(tasks)
+    workers = default_workers() if workers is None else workers
+    workers = max(1, min(workers, len(tasks) or 1))
+    if chunksize is None:
+        chunksize = auto_chunksize(len(tasks), workers)
+    wrapped = _Isolated(func)
+
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for task in tasks:
+            yield (task, *wrapped(task)[1])
+        return
+
+    with multiprocessing.Pool(workers, initializer, initargs) as pool:
+        for task, (ok, result) in pool.imap_unordered(wrapped, tasks, chunksize):
+            yield task, ok, result
+
+
+def stream_tasks(func, tasks, workers=None, window=None, initializer=None, initargs=()):
+    """
+    与 run_tasks 相同，但按需从 tasks (可以是生成器) 取任务，最多 window 个任务在途，
+    按提交顺序产出 (task, ok, result_or_traceback)；任务很多或由流式解析产生时内存占用不随总数增长
+
+    - window 默认 workers * 4；workers <= 1 时在当前进程中顺序执行
+    """
+    workers = default_workers() if workers is None else max(1, workers)
+    window = window or workers * 4
+    wrapped = _Isolated(func)
+
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for task in tasks:
+            yield (task, *wrapped(task)[1])
+        return
+
+    pending = deque()
+    with multiprocessing.Pool(workers, initializer, initargs) as pool:
+        for task in tasks:
+            pending.append(pool.apply_async(wrapped, (task,)))
+            if len(pending) >= window:
+                done, (ok, result) = pending.popleft().get()
+                yield done, ok, result
+        while pending:
+            done, (ok, result) = pending.popleft().get()
+            yield done, ok, result
@@ -0,0 +1,113 @@
+import math
+
+DEFAULT_ERROR_BUDGET = 0.01
+DEFAULT_LATENCY_FACTOR = 2.0
+
+
+class AimdController:
+    """
+    并发数的 AIMD (加性增、乘性减) 控制器
+
+    每个观测窗口结束后调用 update(stats)，stats 为 latency_report.latency_stats 的结果:
+      - 拥塞: 错误率超过 error_budget，或 p90 超过延迟上限
+        延迟上限 = latency_slo (秒，显式指定时) 或 基线 p90 * latency_factor
+        基线 p90 取第一个窗口 (通常并发为 1) 的结果
+      - 未拥塞: concurrency += increase
+      - 拥塞:   concurrency = max(min_concurrency, floor(concurrency * decrease))
+    """
+
+    def __init__(
+        self,
+        start=1,
+        min_concurrency=1,
+        max_concurrency=256,
+        increase=1,
+        decrease=0.5,
+        error_budget=DEFAULT_ERROR_BUDGET,
+        latency_factor=DEFAULT_LATENCY_FACTOR,
+        latency_slo=None,
+    ):
+        self.concurrency = start
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.error_budget = error_budget
+        self.latency_factor = latency_factor
+        self.latency_slo = latency_slo
+        self.baseline_p90 = None
+        self.history = []
+        self.congestion_events = 0
+
+    @property
+    def latency_limit(self):
+        if self.latency_slo is not None:
+            return self.latency_slo
+        if self.baseline_p90 is None:
+            return None
+        return self.baseline_p90 * self.latency_factor
+
+    def is_congested(self, stats):
+        if stats["error_rate"] > self.error_budget:
+            return True
+        limit = self.latency_limit
+        return limit is not None and stats["p90"] is not None and stats["p90"] > limit
+
+    def update(self, stats):
+        """记录本窗口结果并返回下一个窗口的并发数"""
+        if self.baseline_p90 is None and stats["p90"] is not None:
+            self.baseline_p90 = stats["p90"]
+        congested = self.is_congested(stats)
+        self.history.append({"concurrency": self.concurrency, "congested": congested, **stats})
+
+        if congested:
+            self.congestion_events += 1
+            self.concurrency = max(self.min_concurrency, math.floor(self.concurrency * self.decrease))
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + self.increase)
+        return self.concurrency
+
+
+def analyze_capacity(history, plateau=0.05):
+    """
+    根据各窗口的结果给出容量结论:
+      - saturation: 吞吐量不再明显增长 (相对此前最佳提升 < plateau) 或首次拥塞时的并发数
+      - best_throughput: 未拥塞窗口中吞吐量最高的一个
+      - best_tradeoff: 未拥塞窗口中 power = 吞吐量 / p90 最大的一个 (吞吐量与延迟的平衡点)
+    同一并发数有多个窗口时 (AIMD 会回落重试) 取平均
+    """
+    by_c = {}
+    for h in history:
+        by_c.setdefault(h["concurrency"], []).append(h)
+
+    points = []
+    for c in sorted(by_c):
+        rows = by_c[c]
+        ok = [r for r in rows if r["p90"] is not None]
+        points.append({
+            "concurrency": c,
+            "windows": len(rows),
+            "throughput": sum(r["throughput"] for r in rows) / len(rows),
+            "p50": sum(r["p50"] for r in ok) / len(ok) if ok else None,
+            "p90": sum(r["p90"] for r in ok) / len(ok) if ok else None,
+            "error_rate": sum(r["error_rate"] for r in rows) / len(rows),
+            "congested": any(r["congested"] for r in rows),
+        })
+
+    saturation = None
+    best = 0.0
+    for p in points:
+        if p["congested"] or (best > 0 and p["throughput"] < best * (1 + plateau)):
+            saturation = p["concurrency"]
+            break
+        best = max(best, p["throughput"])
+
+    healthy = [p for p in points if not p["congested"] and p["p90"]]
+    best_throughput = max(healthy, key=lambda p: p["throughput"], default=None)
+    best_tradeoff = max(healthy, key=lambda p: p["throughput"] / p["p90"], default=None)
+    return {
+        "points": points,
+        "saturation": saturation,
+        "best_throughput": best_throughput,
+        "best_tradeoff": best_tradeoff,
+    }
@@ -1,4 +1,7 @@
 import math
+import warnings
+
+import numpy as np
 
 # ===== 坐标转换函数 (BD-09 -> WGS84) =====
 x_pi = 3.14159265358979324 * 3000.0 / 180.0
@@ -59,4 +62,198 @@ def gcj02_to_wgs84(lon, lat):
 
 def bd09_to_wgs84(bd_lon, bd_lat):
     lon, lat = bd09_to_gcj02(bd_lon, bd_lat)
-    return gcj02_to_wgs84(lon, lat)
\ No newline at end of file
+    return gcj02_to_wgs84(lon, lat)
+
+# ===== 批量坐标转换 (NumPy 向量化版本) =====
+# 与上面的标量函数逐步对应，运算顺序保持一致，保证结果逐位 (bit-for-bit) 相同。
+# 输入可以是标量、列表或 ndarray，输出为 float64 ndarray。
+
+def out_of_china_array(lon, lat):
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    return ~((73.66 < lon) & (lon < 135.05) & (3.86 < lat) & (lat < 53.55))
+
+def _transformlat_array(lon, lat):
+    ret = -100.0 + 2.0 * lon + 3.0 * lat + 0.2 * lat * lat + \
+          0.1 * lon * lat + 0.2 * np.sqrt(np.abs(lon))
+    ret += (20.0 * np.sin(6.0 * lon * pi) + 20.0 *
+            np.sin(2.0 * lon * pi)) * 2.0 / 3.0
+    ret += (20.0 * np.sin(lat * pi) + 40.0 *
+            np.sin(lat / 3.0 * pi)) * 2.0 / 3.0
+    ret += (160.0 * np.sin(lat / 12.0 * pi) + 320 *
+            np.sin(lat * pi / 30.0)) * 2.0 / 3.0
+    return ret
+
+def _transformlon_array(lon, lat):
+    ret = 300.0 + lon + 2.0 * lat + 0.1 * lon * lon + \
+          0.1 * lon * lat + 0.1 * np.sqrt(np.abs(lon))
+    ret += (20.0 * np.sin(6.0 * lon * pi) + 20.0 *
+            np.sin(2.0 * lon * pi)) * 2.0 / 3.0
+    ret += (20.0 * np.sin(lon * pi) + 40.0 *
+            np.sin(lon / 3.0 * pi)) * 2.0 / 3.0
+    ret += (150.0 * np.sin(lon / 12.0 * pi) + 300.0 *
+            np.sin(lon / 30.0 * pi)) * 2.0 / 3.0
+    return ret
+
+def _atan2_array(y, x):
+    y, x = np.broadcast_arrays(y, x)
+    flat = np.fromiter(
+        map(math.atan2, y.ravel().tolist(), x.ravel().tolist()),
+        dtype=np.float64,
+        count=y.size,
+    )
+    return flat.reshape(y.shape)
+
+def bd09_to_gcj02_array(bd_lon, bd_lat):
+    x = np.asarray(bd_lon, dtype=np.float64) - 0.0065
+    y = np.asarray(bd_lat, dtype=np.float64) - 0.006
+    z = np.sqrt(x * x + y * y) - 0.00002 * np.sin(y * x_pi)
+    # np.arctan2 的 SIMD 实现与 libm 的 atan2 在末位上可能不同，这里仍用 math.atan2
+    theta = _atan2_array(y, x) - 0.000003 * np.cos(x * x_pi)
+    gg_lon = z * np.cos(theta)
+    gg_lat = z * np.sin(theta)
+    return gg_lon, gg_lat
+
+def gcj02_to_wgs84_array(lon, lat):
+    """
+    与 gcj02_to_wgs84 一致: 国内的点返回 (lat, lon)，国外的点原样返回 (lon, lat)
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    outside = out_of_china_array(lon, lat)
+    dlat = _transformlat_array(lon - 105.0, lat - 35.0)
+    dlon = _transformlon_array(lon - 105.0, lat - 35.0)
+    radlat = lat / 180.0 * pi
+    magic = np.sin(radlat)
+    magic = 1 - ee * magic * magic
+    sqrtmagic = np.sqrt(magic)
+    dlat = (dlat * 180.0) / ((a * (1 - ee)) /
+           (magic * sqrtmagic) * pi)
+    dlon = (dlon * 180.0) / (a / sqrtmagic *
+           np.cos(radlat) * pi)
+    mglat = lat + dlat
+    mglon = lon + dlon
+    first = np.where(outside, lon, lat * 2 - mglat)
+    second = np.where(outside, lat, lon * 2 - mglon)
+    return first, second
+
+def bd09_to_wgs84_array(bd_lon, bd_lat):
+    lon, lat = bd09_to_gcj02_array(bd_lon, bd_lat)
+    return gcj02_to_wgs84_array(lon, lat)
+
+
+# ===== 逆向转换 (WGS84/GCJ-02 -> BD-09) =====
+# 上面的 gcj02_to_wgs84 / bd09_to_gcj02 本身都是近似反算，直接套用公开的正向公式
+# 再转回来会有米级误差。这里以正向公式为初值，对本模块的正向函数做不动点迭代:
+#     x_{k+1} = x_k - (f(x_k) - target)
+# 保证 bd09_to_wgs84(wgs84_to_bd09(p)) 与 p 的差在 tol 以内 (默认约 1 毫米)。
+# 参数与返回值统一为 (lon, lat) 顺序。
+
+INVERSE_TOL = 1e-8  # 度，约 1.1 毫米
+INVERSE_MAX_ITER = 10
+
+def _gcj02_encrypt_array(lon, lat):
+    """公开的 WGS84 -> GCJ-02 正向公式，作为迭代初值"""
+    dlat = _transformlat_array(lon - 105.0, lat - 35.0)
+    dlon = _transformlon_array(lon - 105.0, lat - 35.0)
+    radlat = lat / 180.0 * pi
+    magic = np.sin(radlat)
+    magic = 1 - ee * magic * magic
+    sqrtmagic = np.sqrt(magic)
+    dlat = (dlat * 180.0) / ((a * (1 - ee)) / (magic * sqrtmagic) * pi)
+    dlon = (dlon * 180.0) / (a / sqrtmagic * np.cos(radlat) * pi)
+    outside = out_of_china_array(lon, lat)
+    return np.where(outside, lon, lon + dlon), np.where(outside, lat, lat + dlat)
+
+def _bd09_encrypt_array(lon, lat):
+    """公开的 GCJ-02 -> BD-09 正向公式，作为迭代初值"""
+    z = np.sqrt(lon * lon + lat * lat) + 0.00002 * np.sin(lat * x_pi)
+    theta = np.arctan2(lat, lon) + 0.000003 * np.cos(lon * x_pi)
+    return z * np.cos(theta) + 0.0065, z * np.sin(theta) + 0.006
+
+def _gcj02_to_wgs84_lonlat_array(lon, lat):
+    """gcj02_to_wgs84_array 的 (lon, lat) 顺序版本"""
+    first, second = gcj02_to_wgs84_array(lon, lat)
+    outside = out_of_china_array(lon, lat)
+    return np.where(outside, first, second), np.where(outside, second, first)
+
+def _bd09_to_wgs84_lonlat_array(lon, lat):
+    return _gcj02_to_wgs84_lonlat_array(*bd09_to_gcj02_array(lon, lat))
+
+def _solve_inverse(forward, lon, lat, init, tol, max_iter):
+    """
+    对 forward 做向量化不动点迭代，只继续迭代尚未收敛的点
+    返回 (lon, lat, converged)
+    """
+    target_lon = np.asarray(lon, dtype=np.float64)
+    target_lat = np.asarray(lat, dtype=np.float64)
+    target_lon, target_lat = np.broadcast_arrays(target_lon, target_lat)
+    x_lon, x_lat = (np.array(v, dtype=np.float64) for v in init(target_lon, target_lat))
+    converged = np.zeros(target_lon.shape, dtype=bool)
+    active = np.flatnonzero(~converged.ravel())
+
+    flat_lon, flat_lat = x_lon.reshape(-1), x_lat.reshape(-1)
+    flat_tlon, flat_tlat = target_lon.reshape(-1), target_lat.reshape(-1)
+    flat_conv = converged.reshape(-1)
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        f_lon, f_lat = forward(flat_lon[active], flat_lat[active])
+        err_lon = f_lon - flat_tlon[active]
+        err_lat = f_lat - flat_tlat[active]
+        done = (np.abs(err_lon) <= tol) & (np.abs(err_lat) <= tol)
+        flat_conv[active[done]] = True
+        step = ~done
+        flat_lon[active[step]] -= err_lon[step]
+        flat_lat[active[step]] -= err_lat[step]
+        active = active[step]
+    return x_lon, x_lat, converged
+
+def _warn_unconverged(name, converged, tol, max_iter):
+    """有点未在 max_iter 次内收敛 (如 NaN 或远超有效范围的坐标) 时发出 RuntimeWarning，结果可能不满足 tol"""
+    if not converged.all():
+        warnings.warn(
+            f"{name}: {converged.size - int(converged.sum())}/{converged.size} 个点在 {max_iter} 次迭代内"
+            f"未收敛到 {tol}°，结果可能不准确",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+
+def gcj02_to_bd09_array(lon, lat, tol=INVERSE_TOL, max_iter=INVERSE_MAX_ITER):
+    """bd09_to_gcj02 的高精度反算"""
+    bd_lon, bd_lat, converged = _solve_inverse(
+        bd09_to_gcj02_array, lon, lat, _bd09_encrypt_array, tol, max_iter
+    )
+    _warn_unconverged("gcj02_to_bd09_array", converged, tol, max_iter)
+    return bd_lon, bd_lat
+
+def wgs84_to_gcj02_array(lon, lat, tol=INVERSE_TOL, max_iter=INVERSE_MAX_ITER):
+    """gcj02_to_wgs84 的高精度反算"""
+    gg_lon, gg_lat, converged = _solve_inverse(
+        _gcj02_to_wgs84_lonlat_array, lon, lat, _gcj02_encrypt_array, tol, max_iter
+    )
+    _warn_unconverged("wgs84_to_gcj02_array", converged, tol, max_iter)
+    return gg_lon, gg_lat
+
+def wgs84_to_bd09_array(lon, lat, tol=INVERSE_TOL, max_iter=INVERSE_MAX_ITER):
+    """bd09_to_wgs84 的高精度反算，用于把修正后的 GPS 位置写回调度请求"""
+    def init(lon, lat):
+        return _bd09_encrypt_array(*_gcj02_encrypt_array(lon, lat))
+
+    bd_lon, bd_lat, converged = _solve_inverse(
+        _bd09_to_wgs84_lonlat_array, lon, lat, init, tol, max_iter
+    )
+    _warn_unconverged("wgs84_to_bd09_array", converged, tol, max_iter)
+    return bd_lon, bd_lat
+
+def gcj02_to_bd09(lon, lat):
+    bd_lon, bd_lat = gcj02_to_bd09_array(lon, lat)
+    return float(bd_lon), float(bd_lat)
+
+def wgs84_to_gcj02(lon, lat):
+    gg_lon, gg_lat = wgs84_to_gcj02_array(lon, lat)
+    return float(gg_lon), float(gg_lat)
+
+def wgs84_to_bd09(lon, lat):
+    bd_lon, bd_lat = wgs84_to_bd09_array(lon, lat)
+    return float(bd_lon), float(bd_lat)
@@ -0,0 +1,130 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+
+# 这些状态码通常是服务端暂时不可用，值得重试；其他 4xx/5xx 直接视为失败
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class DispatchClient:
+    """
+    调度接口的异步客户端
+
+    - 单个 requests.Session (keep-alive 连接池，大小与并发数一致)
+    - asyncio.Semaphore 限制同时在途的请求数
+    - 每个请求独立超时，连接错误/超时/RETRY_STATUS 按指数退避 (带抖动) 重试
+    阻塞的 HTTP 调用放在专用线程池 (大小同并发数) 中执行，不需要额外的异步 HTTP 依赖
+
+    用法:
+        async with DispatchClient(url, concurrency=8) as client:
+            result = await client.post(payload)
+    """
+
+    def __init__(
+        self,
+        api_url,
+        concurrency=DEFAULT_CONCURRENCY,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+    ):
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _post_once(self, payload):
+        response = self.session.post(
+            self.api_url,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.status_code, response.json()
+
+    def _should_retry(self, exc):
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+            return exc.response.status_code in RETRY_STATUS
+        return False
+
+    async def post(self, payload):
+        """
+        发送一个请求，返回 dict:
+          ok / data / error / status_code / latency (最后一次尝试的耗时，秒) / attempts /
+          total_latency (首次发出到完成的端到端耗时，含失败的尝试和退避等待，秒) /
+          started (首次真正发出请求的 time.perf_counter()，用于计算排队延迟)
+        不抛异常，失败信息放在 error 中，便于批量统计
+        """
+        if self._semaphore is None:
+            # Semaphore 需要在事件循环中创建
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        attempts = 0
+        started = None
+        while True:
+            attempts += 1
+            async with self._semaphore:
+                start = time.perf_counter()
+                if started is None:
+                    started = start
+                try:
+                    status_code, data = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, self._post_once, payload
+                    )
+                    end = time.perf_counter()
+                    return {
+                        "ok": True,
+                        "data": data,
+                        "error": None,
+                        "status_code": status_code,
+                        "latency": end - start,
+                        "total_latency": end - started,
+                        "attempts": attempts,
+                        "started": started,
+                    }
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    latency = time.perf_counter() - start
+                    error = e
+            if attempts > self.retries or not self._should_retry(error):
+                response = getattr(error, "response", None)
+                return {
+                    "ok": False,
+                    "data": None,
+                    "error": str(error),
+                    "status_code": response.status_code if response is not None else None,
+                    "latency": latency,
+                    "total_latency": time.perf_counter() - started,
+                    "attempts": attempts,
+                    "started": started,
+                }
+            # 指数退避 + 抖动，避免所有失败请求同时重试
+            await asyncio.sleep(self.backoff * (2 ** (attempts - 1)) * (0.5 + random.random()))
@@ -0,0 +1,86 @@
+"""
+在嵌套的 dict / list 中按深度优先顺序查找键 (日志中的请求结构不固定，字段可能出现在任意层级)
+"""
+
+# 调度请求中用于分类的字段
+REQUEST_KEYS = ("vehicle_id", "decision_type", "plan_type")
+
+
+def find_key_recursive(data, key):
+    """
+    深度优先搜索：在嵌套字典或列表中查找指定的 key
+    """
+    if isinstance(data, dict):
+        if key in data:
+            return data[key]
+        for v in data.values():
+            result = find_key_recursive(v, key)
+            if result is not None:
+                return result
+    elif isinstance(data, list):
+        for item in data:
+            result = find_key_recursive(item, key)
+            if result is not None:
+                return result
+    return None
+
+
+def _collect(data, keys, found):
+    """
+    在 data 中查找 keys (list)，把非 None 的结果写入 found，返回仍未找到的键
+    与对每个键分别调用 find_key_recursive 的结果一致: 某个 dict 含有该键时，
+    该子树的结果就是对应的值 (为 None 时由上层继续查找后面的兄弟节点)
+    """
+    if isinstance(data, dict):
+        pending = []
+        for k in keys:
+            if k in data:
+                v = data[k]
+                if v is not None:
+                    found[k] = v
+            else:
+                pending.append(k)
+        children = data.values() if pending else ()
+    else:
+        pending = keys
+        children = data
+
+    for v in children:
+        if isinstance(v, (dict, list)):
+            remaining = _collect(v, pending, found)
+            if len(remaining) != len(pending):
+                pending = remaining
+                if not pending:
+                    break
+    return [k for k in keys if k not in found]
+
+
+def find_keys(data, keys):
+    """
+    一次遍历同时查找多个键，返回 {key: value}，找不到的键为 None
+    结果与 {k: find_key_recursive(data, k) for k in keys} 相同，所有键都找到后立即停止遍历
+    """
+    found = {}
+    if isinstance(data, dict):
+        pending = []
+        for k in keys:
+            if k in data:
+                # 顶层命中时即使值为 None 也不再向下查找 (与 find_key_recursive 一致)
+                found[k] = data[k]
+            else:
+                pending.append(k)
+        if pending:
+            for v in data.values():
+                if isinstance(v, (dict, list)):
+                    pending = _collect(v, pending, found)
+                    if not pending:
+                        break
+    elif isinstance(data, list):
+        _collect(data, list(keys), found)
+    return {k: found.get(k) for k in keys}
+
+
+def request_keys(req_data):
+    """调度请求的 (vehicle_id, decision_type, plan_type)，找不到时为 None"""
+    found = find_keys(req_data, REQUEST_KEYS)
+    return found["vehicle_id"], found["decision_type"], found["plan_type"]
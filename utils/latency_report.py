@@ -0,0 +1,209 @@
+import json
+import math
+import threading
+import time
+from datetime import datetime
+
+# 按站点数分桶 (左闭右开)，最后一个桶没有上限
+STATION_BUCKETS = (0, 50, 100, 200, 500, 1000)
+# 对比两次运行时检查的指标 (除 HIGHER_IS_BETTER 外都是越小越好)
+DIFF_METRICS = ("p50", "p90", "p99", "max", "error_rate", "throughput")
+HIGHER_IS_BETTER = ("throughput",)
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def station_bucket(n):
+    for low, high in zip(STATION_BUCKETS, STATION_BUCKETS[1:]):
+        if low <= n < high:
+            return f"{low}-{high - 1}"
+    return f"{STATION_BUCKETS[-1]}+"
+
+
+def percentile(sorted_values, q):
+    """线性插值百分位 (与 numpy.percentile 默认方式一致)，q 取 0~100"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def latency_stats(records, wall_time=None):
+    """
+    一组请求的统计: 延迟只统计成功的请求，错误率按全部请求计算
+    吞吐量只对整次运行有意义 (按站点数/车辆分组时不传 wall_time，吞吐量为 None)
+    """
+    latencies = sorted(r["latency"] for r in records if r["ok"])
+    count = len(records)
+    errors = count - len(latencies)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput": None if wall_time is None else count / wall_time if wall_time > 0 else 0.0,
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1] if latencies else None,
+    }
+
+
+class LatencyRecorder:
+    """
+    记录每个请求的耗时 (线程安全，可在线程池/事件循环中共用)
+
+    每条记录: name / vehicle_id / stations / latency (秒) / ok / status_code / attempts / sent_at
+    额外字段 (如含重试的端到端耗时、回放模式的排队延迟) 通过 add(**extra) 一并保存
+    """
+
+    def __init__(self, meta=None):
+        self.meta = dict(meta or {})
+        self.records = []
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._stop = None
+
+    def add(self, name, req_data, latency, ok, status_code=None, attempts=1, **extra):
+        vehicle = req_data.get("vehicle") or {}
+        record = {
+            "name": name,
+            "vehicle_id": vehicle.get("vehicle_id"),
+            "stations": len(req_data.get("stations") or []),
+            "latency": latency,
+            "ok": ok,
+            "status_code": status_code,
+            "attempts": attempts,
+            "sent_at": time.time() - latency,
+            **extra,
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def stop(self):
+        self._stop = time.perf_counter()
+
+    @property
+    def wall_time(self):
+        return (self._stop or time.perf_counter()) - self._start
+
+    def summary(self):
+        with self._lock:
+            records = list(self.records)
+        wall = self.wall_time
+        by_stations = {}
+        by_vehicle = {}
+        for r in records:
+            by_stations.setdefault(station_bucket(r["stations"]), []).append(r)
+            by_vehicle.setdefault(str(r["vehicle_id"]), []).append(r)
+        summary = {
+            "overall": latency_stats(records, wall),
+            "by_stations": {
+                k: latency_stats(v)
+                for k, v in sorted(by_stations.items(), key=lambda kv: int(kv[0].split("-")[0].rstrip("+")))
+            },
+            "by_vehicle": {k: latency_stats(v) for k, v in sorted(by_vehicle.items())},
+        }
+        # 含重试和退避等待的端到端耗时 (latency 只是最后一次尝试)、
+        # 回放模式额外记录的排队延迟 (计划发送时间 -> 实际发出) 和线上原始耗时
+        for field in ("total_latency", "queue_delay", "log_latency"):
+            values = sorted(r[field] for r in records if r.get(field) is not None)
+            if values:
+                summary[field] = {
+                    "p50": percentile(values, 50),
+                    "p90": percentile(values, 90),
+                    "p99": percentile(values, 99),
+                    "max": values[-1],
+                }
+        return summary
+
+    def save(self, path):
+        """保存为 JSON: meta + summary + 每个请求的原始记录"""
+        if self._stop is None:
+            self.stop()
+        report = {
+            "meta": {
+                **self.meta,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "wall_time": self.wall_time,
+            },
+            "summary": self.summary(),
+            "records": self.records,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fmt(v, metric):
+    if v is None:
+        return "-"
+    if metric in ("error_rate",):
+        return f"{v * 100:.1f}%"
+    if metric == "throughput":
+        return f"{v:.2f}/s"
+    return f"{v * 1000:.0f}ms"
+
+
+def print_summary(summary):
+    cols = ("count", "error_rate", "throughput", "p50", "p90", "p99", "max")
+    print(f"{'分组':<24}" + "".join(f"{c:>12}" for c in cols))
+
+    def line(label, stats):
+        cells = [str(stats["count"])] + [_fmt(stats[c], c) for c in cols[1:]]
+        print(f"{label:<24}" + "".join(f"{c:>12}" for c in cells))
+
+    line("overall", summary["overall"])
+    for k, v in summary["by_stations"].items():
+        line(f"站点 {k}", v)
+    for k, v in summary["by_vehicle"].items():
+        line(f"车辆 {k}", v)
+
+    labels = {"total_latency": "端到端耗时 (含重试)", "queue_delay": "排队延迟", "log_latency": "线上原始耗时"}
+    for field, label in labels.items():
+        if field in summary:
+            stats = summary[field]
+            cells = "  ".join(f"{q}={_fmt(stats[q], q)}" for q in ("p50", "p90", "p99", "max"))
+            print(f"{label}: {cells}")
+
+
+def diff_reports(base, new, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    对比两次运行的 summary，返回行列表:
+      (分组, 指标, 基线值, 新值, 相对变化, 是否回退)
+    延迟类指标相对变化超过 threshold 视为回退；吞吐量相对下降超过 threshold 视为回退；
+    错误率按绝对差值与 threshold 比较；只对比两次运行中都存在的分组 (和指标)
+    """
+    rows = []
+    groups = [("overall", base["summary"]["overall"], new["summary"]["overall"])]
+    for section, label in (("by_stations", "站点"), ("by_vehicle", "车辆")):
+        for key, stats in base["summary"][section].items():
+            if key in new["summary"][section]:
+                groups.append((f"{label} {key}", stats, new["summary"][section][key]))
+
+    for group, b, n in groups:
+        for metric in DIFF_METRICS:
+            bv, nv = b.get(metric), n.get(metric)
+            if bv is None or nv is None:
+                continue
+            if metric == "error_rate":
+                change = nv - bv
+            else:
+                change = (nv - bv) / bv if bv > 0 else 0.0
+            regressed = change < -threshold if metric in HIGHER_IS_BETTER else change > threshold
+            rows.append((group, metric, bv, nv, change, regressed))
+    return rows
+
+
+def print_diff(rows):
+    print(f"{'分组':<24}{'指标':>12}{'基线':>12}{'新':>12}{'变化':>10}")
+    for group, metric, bv, nv, change, regressed in rows:
+        change_str = f"{change * 100:+.1f}%" if metric != "error_rate" else f"{change * 100:+.1f}pt"
+        flag = "  ❌ 回退" if regressed else ""
+        print(f"{group:<24}{metric:>12}{_fmt(bv, metric):>12}{_fmt(nv, metric):>12}{change_str:>10}{flag}")
@@ -0,0 +1,134 @@
+import os
+
+from utils.log_input import decode_lines, iter_marker_lines
+
+# 每次最多读取的字节数 (追赶大文件时分块处理，内存占用不随文件大小增长)
+READ_CHUNK = 16 * 1024 * 1024
+
+
+def find_by_inode(directory, inode):
+    """在目录中查找 inode 相同的文件 (轮转后被重命名的旧日志)，找不到时返回 None"""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return None
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.inode() == inode:
+                return entry.path
+        except OSError:
+            continue
+    return None
+
+
+class LogFollower:
+    """
+    跟踪持续写入的日志文件 (类似 tail -F)，poll() 产出自上次以来新增的完整行 (str)
+
+    - offset / inode 可以从检查点恢复 (state())，只消费到最后一个换行符，写了一半的行留到下次
+    - 轮转 (rename + 新建): 路径指向新文件时先读完旧文件剩余的内容，再从新文件开头读取；
+      重启时如果检查点中的文件已被轮转，按 inode 在同一目录中找到旧文件补读
+    - 截断 (copytruncate): 文件小于 offset 时从头读取
+    markers 不为空时只产出包含任一标记的行 (按字节查找，其余行不解码)
+    """
+
+    def __init__(self, path, offset=0, inode=None, markers=None):
+        self.path = path
+        self.markers = [m.encode("utf-8") for m in markers] if markers else None
+        self.offset = offset
+        self.inode = inode
+        self.rotations = 0
+        self._file = None
+        # 重启时发现的已轮转旧文件: (路径, offset)
+        self._rotated = None
+        st = self._stat()
+        if st is not None and inode is not None and st.st_ino != inode:
+            old = find_by_inode(os.path.dirname(os.path.abspath(path)), inode)
+            if old is not None:
+                self._rotated = (old, offset)
+            self.offset = 0
+            self.inode = None
+
+    def state(self):
+        return {"path": self.path, "inode": self.inode, "offset": self.offset}
+
+    def _stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _open(self):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        inode = os.fstat(f.fileno()).st_ino
+        if self.inode is not None and inode != self.inode:
+            self.offset = 0
+        self._file = f
+        self.inode = inode
+        return True
+
+    def _lines(self, raw):
+        chunks = iter_marker_lines(raw, self.markers) if self.markers else [raw]
+        for chunk in chunks:
+            yield from decode_lines(chunk)
+
+    def _drain(self, f, offset, final=False):
+        """
+        从 offset 开始按块读取 f，产出 (新的 offset, 以换行符结尾的完整行 bytes)
+        final=True 时文件已不再写入，最后一行没有换行符也产出
+        """
+        f.seek(offset)
+        tail = b""
+        while True:
+            data = f.read(READ_CHUNK)
+            if not data:
+                if final and tail:
+                    yield offset + len(tail), tail
+                return
+            tail += data
+            end = tail.rfind(b"\n") + 1
+            if end:
+                offset += end
+                yield offset, tail[:end]
+                tail = tail[end:]
+
+    def poll(self):
+        """产出当前可读的新增完整行；生成器结束后 state() 与已产出的行一致"""
+        if self._rotated is not None:
+            path, offset = self._rotated
+            self._rotated = None
+            with open(path, "rb") as f:
+                for _, raw in self._drain(f, offset, final=True):
+                    yield from self._lines(raw)
+            self.rotations += 1
+
+        if self._file is None and not self._open():
+            return
+
+        st = self._stat()
+        if st is not None and st.st_ino != self.inode:
+            # 已轮转: 读完旧文件 (仍然打开着) 的剩余内容，再切换到新文件
+            for _, raw in self._drain(self._file, self.offset, final=True):
+                yield from self._lines(raw)
+            self._file.close()
+            self._file = None
+            self.offset = 0
+            self.rotations += 1
+            if not self._open():
+                return
+        elif st is not None and st.st_size < self.offset:
+            # 被截断
+            self.offset = 0
+            self.rotations += 1
+
+        for offset, raw in self._drain(self._file, self.offset):
+            self.offset = offset
+            yield from self._lines(raw)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
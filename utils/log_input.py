@@ -0,0 +1,131 @@
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import mmap
+import os
+import re
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 按扩展名透明解压 (流式读取，不落盘)
+COMPRESSED_OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+    ".lzma": lzma.open,
+}
+ZSTD_SUFFIXES = (".zst", ".zstd")
+# 日志文件名中的日期，如 app_2026-01-21.log.gz
+date_pattern = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+
+def compression_suffix(path):
+    """返回压缩扩展名 (如 ".gz")，未压缩时返回 None"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in COMPRESSED_OPENERS or ext in ZSTD_SUFFIXES:
+        return ext
+    return None
+
+
+def log_stem(path):
+    """去掉压缩扩展名和日志扩展名后的文件名: app_2026-01-21.log.gz -> app_2026-01-21"""
+    name = os.path.basename(path)
+    if compression_suffix(name):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0]
+
+
+def open_log(path):
+    """以文本方式打开日志 (utf-8，通用换行)，压缩文件按扩展名流式解压"""
+    ext = compression_suffix(path)
+    if ext is None:
+        return open(path, "r", encoding="utf-8")
+    if ext in ZSTD_SUFFIXES:
+        if zstandard is None:
+            raise RuntimeError(f"读取 {path} 需要 zstandard 包: uv pip install zstandard")
+        return zstandard.open(path, "rt", encoding="utf-8")
+    return COMPRESSED_OPENERS[ext](path, "rt", encoding="utf-8")
+
+
+def iter_marker_lines(buf, markers, start=0, end=None):
+    """
+    在 bytes / mmap 的 [start, end) 范围内查找包含任一标记 (bytes) 的行，按文件顺序产出行的 bytes (含换行符)
+    只对命中标记的行做切片，其余行不解码、不复制；start 必须是行首
+    """
+    end = len(buf) if end is None else end
+    next_hit = {m: buf.find(m, start, end) for m in markers}
+    while True:
+        hits = [i for i in next_hit.values() if i != -1]
+        if not hits:
+            return
+        hit = min(hits)
+        line_start = buf.rfind(b"\n", start, hit) + 1 or start
+        line_end = buf.find(b"\n", hit, end)
+        line_end = end if line_end == -1 else line_end + 1
+        yield buf[line_start:line_end]
+        # 同一行内的其它标记已随本行产出，从下一行开始重新查找
+        start = line_end
+        for m, i in next_hit.items():
+            if i != -1 and i < start:
+                next_hit[m] = buf.find(m, start, end)
+
+
+def decode_lines(raw):
+    """按 open(..., "r") 的规则解码: utf-8 + 通用换行 (\\r / \\r\\n 都视为换行)"""
+    text = raw.decode("utf-8")
+    if "\r" not in text:
+        yield text
+        return
+    yield from io.StringIO(text, newline=None)
+
+
+def iter_log_lines(path, markers=None, start=0, end=None):
+    """
+    逐行读取日志 (str)
+      - markers 为 None 或文件是压缩文件时: 流式读取全部行 (压缩文件不支持 start/end)
+      - 否则: mmap 整个文件，只产出包含标记的行，其余行跳过解码
+    """
+    if markers is None or compression_suffix(path):
+        with open_log(path) as f:
+            yield from f
+        return
+
+    encoded = [m.encode("utf-8") for m in markers]
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter_marker_lines(mm, encoded, start, end):
+                for line in decode_lines(raw):
+                    if any(m in line for m in markers):
+                        yield line
+
+
+def file_date(path):
+    m = date_pattern.search(os.path.basename(path))
+    return m.group(1) if m else None
+
+
+def expand_log_paths(patterns, since=None, until=None):
+    """
+    展开文件名 / glob 模式，按 (日期, 文件名) 排序并去重
+    since / until (YYYY-MM-DD，含端点) 按文件名中的日期过滤，指定时不含日期的文件被跳过
+    """
+    paths = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+        paths.update(p for p in matches if os.path.isfile(p))
+
+    selected = []
+    for p in paths:
+        date = file_date(p)
+        if since or until:
+            if date is None or (since and date < since) or (until and date > until):
+                continue
+        selected.append(p)
+    return sorted(selected, key=lambda p: (file_date(p) or "", p))
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".render_manifest.json"
+# 清单格式版本: 2 起文件路径统一记录为相对清单所在目录的路径，旧格式的记录直接丢弃 (不删除任何文件)
+MANIFEST_VERSION = 2
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def options_digest(options):
+    """渲染参数 (popup_mode / marker_mode / combined ...) 的摘要，参数变化同样需要重新生成"""
+    payload = json.dumps(options or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class RenderManifest:
+    """
+    增量渲染清单 (JSON 文件，放在输出目录中)
+
+    每个任务 (key) 记录:
+      - inputs:   输入文件 -> 内容 sha1 (同时记录 size / mtime，未变化时不重新读取文件)
+      - renderer: 渲染器版本，渲染代码变化后全部失效
+      - options:  渲染参数摘要
+      - outputs:  生成的 HTML 文件
+    输入、渲染器、参数都没变且输出文件仍存在时跳过该任务
+    文件路径统一转为相对清单所在目录的路径后保存和比较，同一目录写成 ./dir、dir 或绝对路径都视为相同；
+    key 由调用方决定，为文件路径时同样应传入相对清单目录的路径
+    """
+
+    def __init__(self, path, renderer_version):
+        self.path = path
+        self.renderer_version = renderer_version
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.entries = {}
+        self._stats = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data.get("entries", {})
+                self._stats = data.get("stats", {})
+
+    def relpath(self, path):
+        """相对清单所在目录的规范化路径"""
+        return os.path.relpath(os.path.abspath(path), self.base_dir)
+
+    def _abspath(self, rel):
+        return os.path.normpath(os.path.join(self.base_dir, rel))
+
+    def digest(self, path):
+        """输入文件的内容摘要；size 和 mtime 都没变时直接复用上次的结果"""
+        st = os.stat(path)
+        rel = self.relpath(path)
+        cached = self._stats.get(rel)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha1"]
+        sha1 = file_sha1(path)
+        self._stats[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": sha1}
+        return sha1
+
+    def _inputs(self, inputs):
+        """inputs 中的元素为文件路径，或已知内容摘要的 (名称, sha1) (如打包存储中的一条记录)"""
+        digests = {}
+        for p in inputs:
+            if isinstance(p, tuple):
+                digests[p[0]] = p[1]
+            elif p:
+                digests[self.relpath(p)] = self.digest(p)
+        return digests
+
+    def is_fresh(self, key, inputs, outputs, options=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        return (
+            entry["renderer"] == self.renderer_version
+            and entry["options"] == options_digest(options)
+            and entry["inputs"] == self._inputs(inputs)
+            and sorted(entry["outputs"]) == sorted(self.relpath(p) for p in outputs)
+            and all(os.path.exists(p) for p in outputs)
+        )
+
+    def record(self, key, inputs, outputs, options=None):
+        self.entries[key] = {
+            "inputs": self._inputs(inputs),
+            "renderer": self.renderer_version,
+            "options": options_digest(options),
+            "outputs": [self.relpath(p) for p in outputs],
+        }
+
+    def prune(self, live):
+        """
+        live: {key: 本次应当存在的输出列表}
+        删除输入已不存在的任务的输出，以及任务不再生成的旧输出 (例如 rsp 被删除后的结果地图)
+        返回被删除的文件列表
+        """
+        removed = []
+        for key in list(self.entries):
+            keep = {self.relpath(p) for p in live.get(key, ())}
+            for rel in self.entries[key]["outputs"]:
+                path = self._abspath(rel)
+                if rel not in keep and os.path.exists(path):
+                    os.remove(path)
+                    removed.append(path)
+            if key not in live:
+                del self.entries[key]
+            else:
+                self.entries[key]["outputs"] = [p for p in self.entries[key]["outputs"] if p in keep]
+        # 已删除输入的 stat 缓存一并清理
+        self._stats = {p: s for p, s in self._stats.items() if os.path.exists(self._abspath(p))}
+        return removed
+
+    def save(self):
+        """先写临时文件再替换，中途中断不会留下损坏的清单"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "entries": self.entries, "stats": self._stats},
+                f,
+                ensure_ascii=False,
+                indent=1,
+                sort_keys=True,
+            )
+        os.replace(tmp, self.path)
@@ -0,0 +1,202 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+
+# 打包格式: 同一目录下一个 sqlite 索引 + 若干只追加的 JSONL 数据文件 (每个写入进程一个)
+INDEX_NAME = "rids.sqlite"
+DATA_PATTERN = "rids-{segment}.jsonl"
+
+COLUMNS = (
+    "rid", "vehicle_id", "status", "decision_type", "plan_type", "req_ts", "rsp_ts",
+    "file", "req_offset", "req_length", "req_sha1", "rsp_offset", "rsp_length", "rsp_sha1", "seq",
+)
+# 可用于 query 过滤的列
+FILTERS = ("rid", "vehicle_id", "status", "decision_type", "plan_type")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    rid TEXT NOT NULL,
+    vehicle_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    decision_type,
+    plan_type,
+    req_ts REAL,
+    rsp_ts REAL,
+    file TEXT NOT NULL,
+    req_offset INTEGER NOT NULL,
+    req_length INTEGER NOT NULL,
+    req_sha1 TEXT NOT NULL,
+    rsp_offset INTEGER,
+    rsp_length INTEGER,
+    rsp_sha1 TEXT,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (rid, vehicle_id, status)
+);
+CREATE INDEX IF NOT EXISTS idx_vehicle ON records (vehicle_id, status);
+CREATE INDEX IF NOT EXISTS idx_status ON records (status);
+CREATE INDEX IF NOT EXISTS idx_type ON records (decision_type, plan_type);
+CREATE INDEX IF NOT EXISTS idx_req_ts ON records (req_ts);
+"""
+
+
+def _scalar(v):
+    """decision_type / plan_type 通常是整数，其它结构按 JSON 文本保存"""
+    if v is None or isinstance(v, (int, float, str)):
+        return v
+    return json.dumps(v, ensure_ascii=False, sort_keys=True)
+
+
+def is_packed(directory):
+    return os.path.exists(os.path.join(directory, INDEX_NAME))
+
+
+def reset_store(directory):
+    """删除目录中已有的索引和数据文件 (重新匹配日志前调用)"""
+    for path in [os.path.join(directory, INDEX_NAME)] + glob.glob(os.path.join(directory, DATA_PATTERN.format(segment="*"))):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_record(directory, record, kind="req"):
+    """按索引中的偏移读取 rid 的请求 (req) 或响应 (rsp)，不存在时返回 None；不需要打开 sqlite"""
+    offset = record[f"{kind}_offset"]
+    if offset is None:
+        return None
+    with open(os.path.join(directory, record["file"]), "rb") as f:
+        f.seek(offset)
+        return json.loads(f.read(record[f"{kind}_length"]))
+
+
+class RidStore:
+    """
+    rid 请求/响应的打包存储，替代 {vehicle_id}/{status}/{rid}_req.json 的大量小文件
+
+    - 数据文件 rids-{segment}.jsonl: 每个请求/响应一行紧凑 JSON，只追加
+    - 索引 rids.sqlite: (rid, vehicle_id, status) 唯一，记录决策/计划类型、日志时间和数据偏移
+      同一 (rid, vehicle_id, status) 重复写入时保留 seq 较大的一条 (对应目录格式中后写的文件覆盖先写的)
+
+    多进程写入: 子进程使用不同的 segment 并设置 index=False，只追加数据文件，
+    索引行保存在 rows 中交给主进程用 insert_rows 写入 (避免多个进程争用 sqlite 写锁)
+    """
+
+    def __init__(self, directory, segment="main", index=True):
+        self.directory = directory
+        self.segment = segment
+        os.makedirs(directory, exist_ok=True)
+        self.db = None
+        if index:
+            self.db = sqlite3.connect(os.path.join(directory, INDEX_NAME))
+            self.db.executescript(SCHEMA)
+        self.rows = []
+        self._data = None
+        self._offset = 0
+
+    @property
+    def data_file(self):
+        return DATA_PATTERN.format(segment=self.segment)
+
+    def _append(self, data):
+        if self._data is None:
+            self._data = open(os.path.join(self.directory, self.data_file), "ab")
+            self._offset = self._data.seek(0, os.SEEK_END)
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        offset = self._offset
+        self._data.write(payload + b"\n")
+        self._offset += len(payload) + 1
+        return offset, len(payload), hashlib.sha1(payload).hexdigest()
+
+    def add(self, rid, vehicle_id, status, req_data, rsp_data=None, decision_type=None, plan_type=None,
+            req_ts=None, rsp_ts=None, seq=0):
+        req_offset, req_length, req_sha1 = self._append(req_data)
+        rsp_offset = rsp_length = rsp_sha1 = None
+        if rsp_data is not None:
+            rsp_offset, rsp_length, rsp_sha1 = self._append(rsp_data)
+        values = (
+            rid, str(vehicle_id), status, _scalar(decision_type), _scalar(plan_type), req_ts, rsp_ts,
+            self.data_file, req_offset, req_length, req_sha1, rsp_offset, rsp_length, rsp_sha1, seq,
+        )
+        if self.db is None:
+            self.rows.append(values)
+        else:
+            self.insert_rows([values])
+
+    def insert_rows(self, rows):
+        """写入索引行 (COLUMNS 顺序的 tuple)，冲突时保留 seq 较大的一条"""
+        updates = ", ".join(f"{c} = excluded.{c}" for c in COLUMNS[3:])
+        self.db.executemany(
+            f"INSERT INTO records ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+            f"ON CONFLICT (rid, vehicle_id, status) DO UPDATE SET {updates} WHERE excluded.seq >= records.seq",
+            rows,
+        )
+
+    def commit(self):
+        if self._data is not None:
+            self._data.flush()
+        if self.db is not None:
+            self.db.commit()
+
+    def close(self):
+        """提交并关闭，重复调用时什么也不做 (index=False 时只有数据文件)"""
+        self.commit()
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def query(self, since=None, until=None, limit=None, **filters):
+        """
+        按 rid / vehicle_id / status / decision_type / plan_type 过滤 (值为列表时匹配任一)，
+        since / until 为请求的日志时间 (epoch 秒)；按 vehicle_id, status, rid 排序返回 dict 列表
+        """
+        where, params = [], []
+        for name, value in filters.items():
+            if name not in FILTERS:
+                raise ValueError(f"不支持的过滤字段: {name}")
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if name == "vehicle_id":
+                values = [str(v) for v in values]
+            where.append(f"{name} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        if since is not None:
+            where.append("req_ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("req_ts <= ?")
+            params.append(until)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM records"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY vehicle_id, status, rid"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(COLUMNS, row)) for row in self.db.execute(sql, params)]
+
+    def counts(self):
+        """按 (vehicle_id, status) 统计条数"""
+        sql = "SELECT vehicle_id, status, COUNT(*) FROM records GROUP BY vehicle_id, status ORDER BY vehicle_id, status"
+        return [tuple(row) for row in self.db.execute(sql)]
+
+    def load(self, record, kind="req"):
+        if self._data is not None:
+            self._data.flush()
+        return read_record(self.directory, record, kind)
+
+    def export(self, out_dir, **filters):
+        """导出为原来的目录格式: out_dir/{vehicle_id}/{status}/{rid}_req.json (与 rid_log_matcher.save_to_file 相同)，返回导出的 rid 数"""
+        records = self.query(**filters)
+        for record in records:
+            target_dir = os.path.join(out_dir, record["vehicle_id"], record["status"])
+            os.makedirs(target_dir, exist_ok=True)
+            for kind in ("req", "rsp"):
+                if record[f"{kind}_offset"] is None:
+                    continue
+                data = self.load(record, kind)
+                with open(os.path.join(target_dir, f"{record['rid']}_{kind}.json"), "w", encoding="utf-8") as jf:
+                    json.dump(data, jf, indent=4, ensure_ascii=False)
+        return len(records)
@@ -0,0 +1,71 @@
+import json
+import os
+import sqlite3
+import tempfile
+
+
+class PendingSpill:
+    """
+    待配对请求的磁盘存储 (sqlite)，用于把长时间没有响应的请求移出内存
+
+    - put / pop / discard 按 rid 存取，值为可 JSON 序列化的 dict
+    - rid 集合保存在内存中，判断是否存在时不访问磁盘
+    - items() 按写入顺序返回全部剩余条目；close() 删除临时文件
+    数据库文件在第一次 put 时才创建
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.path = None
+        self._db = None
+        self._rids = set()
+
+    def _connect(self):
+        if self._db is None:
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+            fd, self.path = tempfile.mkstemp(prefix=".pending_spill_", suffix=".sqlite", dir=self.directory)
+            os.close(fd)
+            self._db = sqlite3.connect(self.path)
+            # 只是临时溢出，不需要崩溃安全
+            self._db.execute("PRAGMA journal_mode=OFF")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute("CREATE TABLE pending (seq INTEGER PRIMARY KEY AUTOINCREMENT, rid TEXT UNIQUE, info TEXT)")
+        return self._db
+
+    def __contains__(self, rid):
+        return rid in self._rids
+
+    def __len__(self):
+        return len(self._rids)
+
+    def put(self, rid, info):
+        db = self._connect()
+        db.execute("DELETE FROM pending WHERE rid = ?", (rid,))
+        db.execute("INSERT INTO pending (rid, info) VALUES (?, ?)", (rid, json.dumps(info, ensure_ascii=False)))
+        self._rids.add(rid)
+
+    def pop(self, rid):
+        if rid not in self._rids:
+            return None
+        row = self._db.execute("SELECT info FROM pending WHERE rid = ?", (rid,)).fetchone()
+        self.discard(rid)
+        return json.loads(row[0])
+
+    def discard(self, rid):
+        if rid in self._rids:
+            self._db.execute("DELETE FROM pending WHERE rid = ?", (rid,))
+            self._rids.discard(rid)
+
+    def items(self):
+        if self._db is None:
+            return
+        for rid, info in self._db.execute("SELECT rid, info FROM pending ORDER BY seq"):
+            yield rid, json.loads(info)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self.path)
+        self._rids = set()
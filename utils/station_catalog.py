@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 默认缓存位置 (相对于仓库根目录运行脚本)
+DEFAULT_CATALOG_PATH = "./.cache/station_catalog.sqlite"
+
+
+def station_key(station_id):
+    """station_id 在不同日志里可能是字符串或数字，统一序列化后作为主键"""
+    return json.dumps(station_id, ensure_ascii=False)
+
+
+def entry_key(st):
+    """
+    缓存条目的键: (station_key, 经度, 纬度)
+    坐标统一转为 float，日志里写成字符串的坐标与数字坐标命中同一条目
+    """
+    return station_key(st.get("station_id")), float(st["longitude"]), float(st["latitude"])
+
+
+def station_fingerprint(st, template_version):
+    """站点全部属性 + 模板版本的指纹，任一属性变化都会让弹窗缓存失效"""
+    payload = json.dumps(st, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(f"{template_version}|{payload}".encode("utf-8")).hexdigest()
+
+
+class StationCatalog:
+    """
+    站点坐标目录 (磁盘持久化，跨请求、跨批次复用)
+
+    以 (station_id, 原始坐标) 为键，每个 station_id 只保留最近写入的一组坐标；保存:
+      - 原始 BD-09 坐标 (longitude, latitude)
+      - 转换后的 WGS84 坐标 (与 bd09_to_wgs84 的返回值顺序一致)
+      - 站点弹窗中只依赖站点属性的静态 HTML 片段 (popup_head / popup_tail)
+
+    失效规则:
+      - 原始坐标变化 -> 不同的键，坐标与弹窗全部重新计算，并删除该站点旧坐标的记录 (缓存不会无限增长)
+      - 其他属性或模板版本变化 (fingerprint 不同) -> 复用坐标，只重新渲染弹窗
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        # station_key -> 当前缓存的 (经度, 纬度)
+        self._coords = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 多个批处理脚本/进程可能同时写同一个目录文件
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 旧版本只以 station_id 为键的表，坐标不同的同名站点会互相覆盖，直接丢弃
+        self._conn.execute("DROP TABLE IF EXISTS stations")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS station_entries (
+                station_key TEXT NOT NULL,
+                longitude REAL NOT NULL,
+                latitude REAL NOT NULL,
+                wgs_first REAL,
+                wgs_second REAL,
+                fingerprint TEXT,
+                popup_head TEXT,
+                popup_tail TEXT,
+                updated_at REAL,
+                PRIMARY KEY (station_key, longitude, latitude)
+            )
+            """
+        )
+        self._conn.commit()
+        # 站点数量通常只有几百个，启动时整体载入内存 (同一站点有多组坐标时保留最近写入的一组)
+        for row in self._conn.execute(
+            "SELECT station_key, longitude, latitude, wgs_first, wgs_second, "
+            "fingerprint, popup_head, popup_tail FROM station_entries ORDER BY updated_at"
+        ):
+            self._replace_coords(row[0], (row[1], row[2]))
+            self._entries[row[0], row[1], row[2]] = {
+                "wgs": (row[3], row[4]),
+                "fingerprint": row[5],
+                "popup": (row[6], row[7]),
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, st):
+        """返回站点 (同一 station_id 和坐标) 对应的缓存条目，不存在时返回 None"""
+        with self._lock:
+            return self._entries.get(entry_key(st))
+
+    def _replace_coords(self, skey, coords):
+        """记录站点的当前坐标，丢弃内存中该站点旧坐标的条目"""
+        old = self._coords.get(skey)
+        if old is not None and old != coords:
+            self._entries.pop((skey, *old), None)
+        self._coords[skey] = coords
+
+    def put_many(self, items):
+        """items: [(station, wgs, fingerprint, (popup_head, popup_tail)), ...]"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for st, wgs, fingerprint, popup in items:
+                key = entry_key(st)
+                self._replace_coords(key[0], key[1:])
+                self._entries[key] = {
+                    "wgs": tuple(wgs),
+                    "fingerprint": fingerprint,
+                    "popup": tuple(popup),
+                }
+                rows.append((*key, *wgs, fingerprint, *popup, now))
+            self._conn.executemany(
+                "DELETE FROM station_entries WHERE station_key = ? AND (longitude != ? OR latitude != ?)",
+                [row[:3] for row in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO station_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,38 @@
+import random
+
+UNASSIGNED_REASONS = [
+    "为优化总成本而被放弃 (惩罚项生效)",
+    "预剪枝: 需求为零的站点",
+    "预剪枝: 未启用储车区",
+]
+
+
+def make_response(req, assigned_ratio=0.1, seed=0):
+    """前 assigned_ratio 的站点进入路线，其余大部分标记为未指派，少量不返回"""
+    rng = random.Random(seed)
+    stations = req["stations"]
+    n_assigned = int(len(stations) * assigned_ratio)
+    stops = []
+    load = req["vehicle"]["current_load"]
+    for i, st in enumerate(stations[:n_assigned]):
+        load += st["demands"]
+        stops.append(
+            {
+                "location_id": st["station_id"],
+                "arrival_time": f"2026-01-21 {9 + i // 60:02d}:{i % 60:02d}:00",
+                "load_after_service": load,
+                "demand": st["demands"],
+            }
+        )
+    unassigned = [
+        {"location_id": st["station_id"], "reason": rng.choice(UNASSIGNED_REASONS)}
+        for st in stations[n_assigned:]
+        if rng.random() < 0.95
+    ]
+    return {
+        "status": "Success",
+        "data": {
+            "routes": [{"vehicle_id": req["vehicle"]["vehicle_id"], "stops": stops}],
+            "unassigned_tasks": unassigned,
+        },
+    }
@@ -1,11 +1,19 @@
+import argparse
 import json
 import os
 import platform
 import re
 import shutil
 import subprocess
+from bisect import bisect_left
 from pathlib import Path
 
+from utils.log_input import expand_log_paths, iter_log_lines, log_stem
+
+# 参数/结果行的标记 (只有包含标记的行才会被解码和匹配)
+PARAMS_MARKER = "请求调度参数:"
+RESULT_MARKER = "计划调度结果:"
+
 
 def open_html(file_path):
     """
@@ -49,82 +57,138 @@ def open_html(file_path):
         print(f"尝试打开文件失败: {e}")
 
 
-def parse_java_object_to_dict(s, key_context=None):
+# 强制将这些键对应的值视为字符串，不转为数字
+FORCE_STR_KEYS = {
+    "location_id",
+    "trace_id",
+    "request_id",
+    "vehicle_id",
+    "node_index",
+}
+
+# Java toString 中的结构字符: 括号决定嵌套深度，逗号 / 等号是分隔符 (换行只用于判断对象格式)
+_java_special = re.compile(r"[\[\]()=,\n]")
+# 对象类名允许的字符 (与 ^[a-zA-Z0-9.]+\( 相同)
+_java_name_chars = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.")
+
+
+class _JavaToStringParser:
     """
-    内部辅助函数：将 Java toString 格式转换为 Python 字典
-    key_context: 传入当前的键名，用于决定是否强制转换类型
+    Java toString 格式的单遍解析器
+
+    先用一次扫描建立索引: 每个括号之后的嵌套深度，以及按深度分组的逗号 / 等号位置。
+    某一层 (对象括号或列表方括号内) 的 "顶层" 分隔符就是全局深度等于该层起始深度的分隔符，
+    与逐层截取子串后重新计数深度的结果完全相同 (括号不配对时也一样)，但每个字符只扫描一次、不复制子串
     """
-    s = s.strip()
 
-    # 1. 处理列表 [...]
-    if s.startswith("[") and s.endswith("]"):
-        content = s[1:-1]
-        parts = []
+    def __init__(self, s):
+        self.s = s
+        self.depth_after = {}
+        self.seps = {}
+        self.newlines = []
         depth = 0
-        start = 0
-        for i, char in enumerate(content):
-            if char in "([":
+        # 当前深度的分隔符列表 (深度变化时切换)
+        current = self.seps.setdefault(depth, [])
+        for m in _java_special.finditer(s):
+            i = m.start()
+            char = s[i]
+            if char == "(" or char == "[":
                 depth += 1
-            elif char in ")]":
+                self.depth_after[i] = depth
+                current = self.seps.setdefault(depth, [])
+            elif char == ")" or char == "]":
                 depth -= 1
-            elif char == "," and depth == 0:
-                parts.append(content[start:i].strip())
-                start = i + 1
-        parts.append(content[start:].strip())
-        # 列表中的元素递归解析
-        return [parse_java_object_to_dict(p) for p in parts if p]
-
-    # 2. 处理对象 ClassName(key=value)
-    obj_match = re.match(r"^[a-zA-Z0-9.]+\((.*)\)$", s)
-    if obj_match:
-        content = obj_match.group(1)
-        kv_pairs = {}
-        depth = 0
-        start = 0
-        current_key = None
-        for i, char in enumerate(content):
-            if char in "([":
-                depth += 1
-            elif char in ")]":
-                depth -= 1
-            elif char == "=" and depth == 0:
-                current_key = content[start:i].strip()
-                start = i + 1
-            elif char == "," and depth == 0:
-                if current_key:
-                    val_str = content[start:i].strip()
-                    parsed_val = parse_java_object_to_dict(val_str, current_key)
-                    # 只有当值不是 None 时才加入字典（模拟你期望的 JSON 行为）
+                current = self.seps.setdefault(depth, [])
+            elif char == "\n":
+                self.newlines.append(i)
+            else:
+                current.append(i)
+
+    def _strip(self, start, end):
+        s = self.s
+        while start < end and s[start].isspace():
+            start += 1
+        while end > start and s[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def _top_level(self, start, end):
+        """[start, end) 内的顶层分隔符位置 (start 紧跟在开括号之后)"""
+        positions = self.seps.get(self.depth_after[start - 1], ())
+        i = bisect_left(positions, start)
+        while i < len(positions) and positions[i] < end:
+            yield positions[i]
+            i += 1
+
+    def _object_content(self, start, end):
+        """ClassName(...) 返回括号内容的起点，不是对象格式时返回 None"""
+        s = self.s
+        p = start
+        while p < end and s[p] in _java_name_chars:
+            p += 1
+        if p == start or p >= end - 1 or s[p] != "(" or s[end - 1] != ")":
+            return None
+        # 正则中的 . 不匹配换行
+        i = bisect_left(self.newlines, p + 1)
+        if i < len(self.newlines) and self.newlines[i] < end - 1:
+            return None
+        return p + 1
+
+    def value(self, start, end, key_context=None):
+        s = self.s
+        start, end = self._strip(start, end)
+
+        # 1. 列表 [...]: 元素递归解析 (不带键名)
+        if end - start >= 2 and s[start] == "[" and s[end - 1] == "]":
+            items = []
+            item_start = start + 1
+            for i in self._top_level(start + 1, end - 1):
+                if s[i] == ",":
+                    items.append((item_start, i))
+                    item_start = i + 1
+            items.append((item_start, end - 1))
+            parsed = []
+            for a, b in items:
+                a, b = self._strip(a, b)
+                if a < b:
+                    parsed.append(self.value(a, b))
+            return parsed
+
+        # 2. 对象 ClassName(key=value, ...)
+        content = self._object_content(start, end)
+        if content is not None:
+            kv_pairs = {}
+            value_start = content
+            current_key = None
+            for i in self._top_level(content, end - 1):
+                if s[i] == "=":
+                    current_key = s[value_start:i].strip()
+                elif current_key:
+                    parsed_val = self.value(value_start, i, current_key)
+                    # 只有当值不是 None 时才加入字典
                     if parsed_val is not None:
                         kv_pairs[current_key] = parsed_val
-                start = i + 1
-
-        # 处理最后一对 KV
-        if current_key:
-            val_str = content[start:].strip()
-            parsed_val = parse_java_object_to_dict(val_str, current_key)
-            if parsed_val is not None:
-                kv_pairs[current_key] = parsed_val
-        return kv_pairs
-
-    # 3. 基础类型转换逻辑
-    if s.lower() == "null":
+                value_start = i + 1
+            if current_key:
+                parsed_val = self.value(value_start, end - 1, current_key)
+                if parsed_val is not None:
+                    kv_pairs[current_key] = parsed_val
+            return kv_pairs
+
+        # 3. 基础类型
+        return _java_scalar(s[start:end], key_context)
+
+
+def _java_scalar(s, key_context=None):
+    lowered = s.lower()
+    if lowered == "null":
         return None
-    if s.lower() == "true":
+    if lowered == "true":
         return True
-    if s.lower() == "false":
+    if lowered == "false":
         return False
 
-    # 强制将这些键对应的值视为字符串，不转为数字
-    force_str_keys = {
-        "location_id",
-        "trace_id",
-        "request_id",
-        "vehicle_id",
-        "node_index",
-    }
-
-    if key_context in force_str_keys:
+    if key_context in FORCE_STR_KEYS:
         return s
 
     try:
@@ -136,46 +200,111 @@ def parse_java_object_to_dict(s, key_context=None):
         return s
 
 
-def extract_logs_as_json(file_path):
+def parse_java_object_to_dict(s, key_context=None):
     """
-    提取 '请求调度参数' 和 '计划调度结果'
+    将 Java toString 格式 (如 DispatchResponse(routes=[Route(...), ...])) 转换为 Python 字典 / 列表
+    key_context: 当前的键名，FORCE_STR_KEYS 中的键保持字符串；值为 null 的键不加入字典
+    单遍解析，耗时与字符串长度成线性
+    """
+    return _JavaToStringParser(s).value(0, len(s), key_context)
+
+
+# 匹配 JSON 格式的请求
+re_params = re.compile(r"请求调度参数:\s*(\{.*\})")
+# 匹配 Java toString 格式的结果
+re_result = re.compile(r"计划调度结果:\s*(DispatchResponse\(.*\))")
+
+
+def iter_log_records(file_path):
     """
-    final_data_list = []
-
-    # 匹配 JSON 格式的请求
-    re_params = re.compile(r"请求调度参数:\s*(\{.*\})")
-    # 匹配 Java toString 格式的结果
-    re_result = re.compile(r"计划调度结果:\s*(DispatchResponse\(.*\))")
-
-    if not os.path.exists(file_path):
-        print(f"错误：找不到文件 {file_path}")
-        return []
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            # 处理请求参数
-            param_match = re_params.search(line)
-            if param_match:
-                try:
-                    final_data_list.append(json.loads(param_match.group(1)))
-                except:
-                    pass
-
-            # 处理调度结果
-            result_match = re_result.search(line)
-            if result_match:
-                try:
-                    dict_data = parse_java_object_to_dict(result_match.group(1))
-                    final_data_list.append(dict_data)
-                except Exception as e:
-                    print(f"解析 Java 对象失败: {e}")
-
-    return final_data_list
-
-
-def process_log_file(input_file):
+    流式产出日志中的 ("params", dict) / ("result", dict)，顺序与日志一致，解析失败的记录跳过
+    支持 .gz/.bz2/.xz/.zst 压缩日志；未压缩的日志通过 mmap 只解码包含标记的行
     """
-    针对单个日志文件进行解析、目录创建和可视化生成
+    for line in iter_log_lines(file_path, (PARAMS_MARKER, RESULT_MARKER)):
+        # 处理请求参数
+        param_match = re_params.search(line)
+        if param_match:
+            try:
+                yield "params", json.loads(param_match.group(1))
+            except ValueError:
+                pass
+
+        # 处理调度结果
+        result_match = re_result.search(line)
+        if result_match:
+            try:
+                yield "result", parse_java_object_to_dict(result_match.group(1))
+            except Exception as e:
+                print(f"解析 Java 对象失败: {e}")
+
+
+def iter_dispatch_pairs(file_path, stats=None):
+    """
+    将每条 '请求调度参数' 与其后的第一条 '计划调度结果' 配对，流式产出 (req, rsp)
+      - 参数之后紧跟着另一条参数 (没有结果): 先产出 (req, None)，只生成输入地图
+      - 前面没有参数的结果无法对应请求，跳过
+    同一时刻只保留一条未配对的参数，内存占用与日志长度无关
+    stats: 可选 dict，累加 pairs / unpaired_params / orphan_results
+    """
+    if stats is None:
+        stats = {}
+    for key in ("pairs", "unpaired_params", "orphan_results"):
+        stats.setdefault(key, 0)
+
+    pending = None
+    for kind, data in iter_log_records(file_path):
+        if kind == "params":
+            if pending is not None:
+                stats["unpaired_params"] += 1
+                yield pending, None
+            pending = data
+        elif pending is not None:
+            stats["pairs"] += 1
+            yield pending, data
+            pending = None
+        else:
+            stats["orphan_results"] += 1
+    if pending is not None:
+        stats["unpaired_params"] += 1
+        yield pending, None
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+# 每组目录 (<日志名>/<序号>/) 中可能由本脚本生成的文件，本次不再生成的会被删除
+PAIR_FILES = ("req.json", "response.json", "input_map.html", "output_map.html", "map.json")
+pair_dir_pattern = re.compile(r"^\d{4,}$")
+
+
+def remove_stale_pair_files(pair_dir, task):
+    """删除组目录中上一次运行留下、本次不再生成的文件 (结果缺失、切换 --data-only 等)"""
+    from batch_viz import task_outputs
+
+    current = {os.path.basename(p) for p in (task["req"], task["rsp"], *task_outputs(task)) if p}
+    for name in PAIR_FILES:
+        path = pair_dir / name
+        if name not in current and path.exists():
+            path.unlink()
+
+
+def remove_stale_pair_dirs(target_dir, count):
+    """删除上一次运行留下的、序号超出本次组数的组目录"""
+    for entry in target_dir.iterdir():
+        if entry.is_dir() and pair_dir_pattern.match(entry.name) and int(entry.name) > count:
+            shutil.rmtree(entry)
+
+
+def iter_log_tasks(input_file, out_root="from_logs", summary=None, data_only=False):
+    """
+    针对单个日志文件: 每组 (参数, 结果) 写入 <out_root>/<日志名>/<序号>/ 下的 req.json / response.json，
+    产出对应的渲染任务 (与 batch_viz.render_task 的任务格式相同)
+    JSON 在主进程中立即写盘，任务只携带路径，worker 从文件读取
+    重复输出到同一目录时，上一次运行留下、本次不再生成的文件和多余的组目录会被删除
+    summary: 可选 list，日志处理完后追加 (日志名, 目录, stats)
+    data_only: 每组只写 map.json，用 <日志名>/map_viewer.html 查看
     """
     # 1. 获取不带后缀的文件名并创建对应目录
     log_path = Path(input_file)
@@ -183,64 +312,110 @@ def process_log_file(input_file):
         print(f"错误：找不到文件 {input_file}")
         return
 
-    base_name = log_path.stem
-    target_dir = Path("from_logs") / base_name
+    base_name = log_stem(log_path)
+    target_dir = Path(out_root) / base_name
     target_dir.mkdir(parents=True, exist_ok=True)
+    if data_only:
+        from main import install_viewer
+
+        install_viewer(str(target_dir))
 
     print(f"--- 正在处理: {base_name} ---")
 
-    # 2. 提取数据
-    results = extract_logs_as_json(str(log_path))
-
-    if len(results) < 2:
-        print(f"警告：{base_name} 提取到的数据不足（共 {len(results)} 条）。")
-
-    # 3. 定义并保存文件路径
-    req_json = target_dir / "req.json"
-    res_json = target_dir / "response.json"
-    input_map = target_dir / "input_map.html"
-    output_map = target_dir / "output_map.html"
-
-    # 保存 JSON 数据
-    files_to_save = [req_json, res_json]
-    for i, data in enumerate(results[:2]):
-        with open(files_to_save[i], "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"已生成: {files_to_save[i]}")
-
-    # 4. 调用可视化函数
-    if len(results) >= 2:
-        from main import create_output_visualization, create_visualization
-
-        try:
-            # 站点地图
-            create_visualization(data_file=str(req_json), output_file=str(input_map))
-            # 路线地图
-            create_output_visualization(
-                req_file=str(req_json),
-                response_file=str(res_json),
-                output_file=str(output_map),
-            )
-            print(f"成功保存 HTML 映射至: {target_dir}")
-
-            # --- 新增：使用 wslview 自动打开 HTML 文件 ---
-            for html_file in [input_map, output_map]:
-                if html_file.exists():
-                    print(f"正在打开可视化页面: {html_file}")
-                    open_html(html_file)
-            # ------------------------------------------
-
-        except Exception as e:
-            print(f"生成可视化地图或打开时出错: {e}")
+    # 2. 流式提取并保存每一组数据
+    stats = {}
+    n = 0
+    for n, (req, rsp) in enumerate(iter_dispatch_pairs(str(log_path), stats), start=1):
+        pair_dir = target_dir / f"{n:04d}"
+        pair_dir.mkdir(exist_ok=True)
+        req_json = pair_dir / "req.json"
+        res_json = pair_dir / "response.json"
+        write_json(req_json, req)
+        task = {"idx": f"{base_name}/{n:04d}", "req": str(req_json), "rsp": None}
+        if data_only:
+            task["data_file"] = str(pair_dir / "map.json")
+        else:
+            task["input_file"] = str(pair_dir / "input_map.html")
+        if rsp is not None:
+            write_json(res_json, rsp)
+            task["rsp"] = str(res_json)
+            if not data_only:
+                task["output_file"] = str(pair_dir / "output_map.html")
+        remove_stale_pair_files(pair_dir, task)
+        yield task
+    remove_stale_pair_dirs(target_dir, n)
+
+    total = stats["pairs"] + stats["unpaired_params"]
+    if total == 0:
+        print(f"警告：{base_name} 没有提取到请求调度参数。")
+    elif stats["unpaired_params"] or stats["orphan_results"]:
+        print(
+            f"警告：{base_name} 有 {stats['unpaired_params']} 条参数没有对应结果 (只生成输入地图)，"
+            f"{stats['orphan_results']} 条结果前面没有参数 (已跳过)。"
+        )
+    if summary is not None:
+        summary.append((base_name, target_dir, stats))
+
+
+def process_logs(log_files, out_root="from_logs", workers=None, open_single=True, data_only=False):
+    """
+    流式提取全部日志中的请求/结果组，边提取边并行渲染地图 (最多 workers * 4 组在途)
+    open_single: 全部日志只提取到一组时，与原来一样自动打开生成的页面
+    data_only: 只写数据文件 (不自动打开，查看页需要通过 http 访问)
+    返回渲染失败的任务列表
+    """
+    from batch_viz import init_worker, render_task, task_outputs
+    from utils.batch_pool import default_workers, stream_tasks
+
+    workers = default_workers() if workers is None else workers
+    summary = []
+    tasks = (task for log_file in log_files for task in iter_log_tasks(log_file, out_root, summary, data_only))
+
+    failures = []
+    last_task = None
+    for task, ok, result in stream_tasks(render_task, tasks, workers=workers, initializer=init_worker, initargs=(None, {})):
+        if ok:
+            last_task = task
+            print(f"已生成: {os.path.dirname(task_outputs(task)[0])} ({result} 个文件)")
+        else:
+            failures.append((task, result))
+            print(f"生成可视化地图时出错: [{task['idx']}]\n{result}")
+
+    print("-" * 50)
+    for base_name, target_dir, stats in summary:
+        print(f"{base_name}: {stats['pairs']} 组请求/结果, {stats['unpaired_params']} 条只有请求 -> {target_dir}")
+        if data_only:
+            print(f"  查看: 在 {target_dir} 下运行 python -m http.server，打开 map_viewer.html?data=0001/map.json")
+    if failures:
+        print(f"❌ {len(failures)} 组渲染失败")
+
+    n_tasks = sum(s["pairs"] + s["unpaired_params"] for _, _, s in summary)
+    if open_single and not data_only and n_tasks == 1 and last_task is not None:
+        for html_file in map(Path, task_outputs(last_task)):
+            if html_file.exists():
+                print(f"正在打开可视化页面: {html_file}")
+                open_html(html_file)
+    return failures
 
 
 if __name__ == "__main__":
-    target_log = ""
-
-    if os.path.exists(target_log):
-        process_log_file(target_log)
-    else:
-        # 备选：如果目录下有多个txt，可以批量处理
-        for txt_file in Path("./from_logs").glob("*.txt"):
-            process_log_file(txt_file)
-        print(f"未找到文件: {target_log}")
+    parser = argparse.ArgumentParser(description="从调度日志提取请求/结果并生成可视化地图")
+    parser.add_argument(
+        "logs",
+        nargs="*",
+        default=["./from_logs/*.txt", "./from_logs/*.txt.*"],
+        help="日志文件或 glob 模式 (支持 .gz/.bz2/.xz/.zst)，默认处理 from_logs 下的 txt",
+    )
+    parser.add_argument("--since", default=None, help="只处理文件名日期不早于该日期的日志 (YYYY-MM-DD)")
+    parser.add_argument("--until", default=None, help="只处理文件名日期不晚于该日期的日志 (YYYY-MM-DD)")
+    parser.add_argument("--out", default="from_logs", help="输出根目录，每组写入 <out>/<日志名>/<序号>/")
+    parser.add_argument("--workers", type=int, default=None, help="渲染进程数 (默认全部 CPU 核心，1 为单进程顺序执行)")
+    parser.add_argument("--no-open", action="store_true", help="只有一组结果时也不自动打开浏览器")
+    parser.add_argument("--data-only", action="store_true", help="每组只写 map.json，用 <日志名>/map_viewer.html 查看")
+    args = parser.parse_args()
+
+    log_files = expand_log_paths(args.logs, args.since, args.until)
+    if not log_files:
+        print(f"未找到文件: {' '.join(args.logs)}")
+    failures = process_logs(log_files, args.out, args.workers, not args.no_open, args.data_only)
+    raise SystemExit(1 if failures else 0)